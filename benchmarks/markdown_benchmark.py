@@ -0,0 +1,122 @@
+"""
+MarkdownFormatter 性能基准
+
+对比逐条 re.sub 的旧实现与单遍扫描的新实现，输入为 10 KB ~ 1 MB 的模拟回答。
+
+用法：python benchmarks/markdown_benchmark.py [--repeat 3]
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from markdown_formatter import MarkdownFormatter
+
+
+class LegacyMarkdownFormatter:
+    """旧版实现：十次顺序替换，每次调用重新编译标题规则"""
+
+    def format(self, text):
+        if not text:
+            return ""
+        text = re.sub(r'```([\s\S]*?)\n([\s\S]*?)```',
+                      lambda m: f'<div style="background-color: #1d1d20; border-radius: 8px; padding: 12px; margin: 8px 0;"><pre style="font-family: Consolas, Monospace; font-size: 13px; color: #e4e4e7; margin: 0; white-space: pre-wrap; overflow-x: auto;"><code>{m.group(2)}</code></pre></div>',
+                      text, flags=re.MULTILINE | re.DOTALL)
+        text = re.sub(r'^\s*([-*_]{3,})\s*$',
+                      lambda m: '<hr style="border: none; border-top: 1px solid #27272a; margin: 16px 0;">',
+                      text, flags=re.MULTILINE)
+        text = re.sub(r'`([^`]+)`',
+                      lambda m: f'<span style="background-color: #27272a; color: #e4e4e7; font-family: Consolas, Monospace; font-size: 13px; padding: 2px 6px; border-radius: 4px;">{m.group(1)}</span>',
+                      text)
+        text = re.sub(r'\*\*([^*]+)\*\*', lambda m: f'<span style="font-weight: bold;">{m.group(1)}</span>', text)
+        text = re.sub(r'\*([^*]+)\*', lambda m: f'<span style="font-style: italic;">{m.group(1)}</span>', text)
+        for i in range(6, 0, -1):
+            font_size = 24 - (i - 1) * 3
+            text = re.sub(rf'^\s*{"#" * i} (.*)$',
+                          lambda m: f'<div style="font-size: {font_size}px; font-weight: bold; color: #e4e4e7; margin: 16px 0 8px 0;">{m.group(1)}</div>',
+                          text, flags=re.MULTILINE)
+        text = re.sub(r'^\s*[-*+] (.*)$',
+                      lambda m: f'<div style="margin: 4px 0; padding-left: 24px;">• {m.group(1)}</div>',
+                      text, flags=re.MULTILINE)
+        text = re.sub(r'^\s*\d+\. (.*)$',
+                      lambda m: f'<div style="margin: 4px 0; padding-left: 24px;">{m.group(0).split(" ")[0]} {m.group(1)}</div>',
+                      text, flags=re.MULTILINE)
+        text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)',
+                      lambda m: f'<a href="{m.group(2)}" style="color: #3b82f6; text-decoration: underline;">{m.group(1)}</a>',
+                      text)
+        text = re.sub(r'(?<!\])(https?://[^\s<>"{}|\\^`\[\]]+)',
+                      lambda m: f'<a href="{m.group(1)}" style="color: #3b82f6; text-decoration: underline;">{m.group(1)}</a>',
+                      text)
+        return text.replace('\n', '<br>')
+
+
+# 结构密集：几乎每行都是标题、列表或代码
+DENSE_SAMPLE = """## 第{n}部分：核心概念
+
+视频中讲解了**检索增强生成**的基本流程，先用 `embedding` 把文档切片向量化，再按相似度召回。
+更多细节见 [官方文档](https://example.com/docs/{n}) 或 https://example.com/video/{n} 。
+
+- 第一步：*切分*文档
+- 第二步：建立索引
+1. 召回
+2. 重排
+
+```python
+def retrieve(query, top_k=5):
+    return index.search(query, top_k)
+```
+
+---
+"""
+
+# 段落为主：常见的长段落回答，只有少量行内格式
+PROSE_SAMPLE = """根据知识库中第{n}个视频的内容，检索增强生成的关键在于切分粒度与召回质量之间的平衡。\
+切片过大时召回结果包含大量无关内容，模型容易被干扰；切片过小时上下文不完整，回答缺少依据。\
+视频作者建议按语义段落切分，并保留 **时间戳** 以便回到原视频核对，同时对召回结果做一次重排。\
+在实践中还需要关注向量模型的选择、索引的更新频率以及提示词中引用来源的格式，\
+这些细节共同决定了最终回答的可靠性。详细讨论见 https://example.com/video/{n} 。
+
+"""
+
+
+def make_message(size, sample=DENSE_SAMPLE):
+    parts, total, n = [], 0, 0
+    while total < size:
+        part = sample.format(n=n)
+        parts.append(part)
+        total += len(part.encode('utf-8'))
+        n += 1
+    return "".join(parts)
+
+
+def measure(formatter, text, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        formatter.format(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MarkdownFormatter 性能基准")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    legacy = LegacyMarkdownFormatter()
+    current = MarkdownFormatter()
+    for name, sample in (("结构密集", DENSE_SAMPLE), ("段落为主", PROSE_SAMPLE)):
+        print(f"\n[{name}]")
+        print(f"{'大小':>8} {'旧实现(ms)':>12} {'新实现(ms)':>12} {'加速比':>8}")
+        for size in (10 * 1024, 100 * 1024, 1024 * 1024):
+            text = make_message(size, sample)
+            old = measure(legacy, text, args.repeat)
+            new = measure(current, text, args.repeat)
+            print(f"{size // 1024:>6}KB {old * 1000:>12.2f} {new * 1000:>12.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Dify 流式响应解析性能基准
+
+本地起一个 SSE 服务，按 Dify 的格式推送事件（中文内容，夹带保活注释），
+分别模拟逐事件写出、批量写出和较大的工作流事件，
+对比 iter_lines 逐行解码的旧实现与 iter_content + SSEParser 的新实现。
+另外在内存中按固定大小切块解析同一段数据，排除网络因素单独比较解析开销。
+
+用法：python benchmarks/sse_benchmark.py [--events 20000] [--repeat 3]
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sse_parser import iter_response_events, iter_sse
+
+PIECES = ["视频", "中提到的", "检索增强生成", "（RAG）", "会先从知识库", "召回相关片段，", "再交给模型", "组织回答。"]
+
+
+def make_events(count, event_size=0):
+    """
+    生成 Dify 格式的 SSE 事件，每 100 个事件夹带一条保活注释
+
+    event_size 大于 0 时生成 node_finished 事件，outputs 约为 event_size 字节，
+    模拟工作流节点输出较长的情况。
+    """
+    events = []
+    for i in range(count):
+        if event_size:
+            data = {"event": "node_finished", "task_id": "t-1", "workflow_run_id": "w-1",
+                    "data": {"title": "知识检索", "status": "succeeded",
+                             "outputs": {"result": "".join(PIECES) * (event_size // 96 + 1)}}}
+        else:
+            data = {"event": "message", "task_id": "t-1", "message_id": "m-1", "conversation_id": "c-1",
+                    "answer": PIECES[i % len(PIECES)], "created_at": 1700000000}
+        events.append(f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8'))
+        if i % 100 == 99:
+            events.append(b": ping\n\n")
+    events.append('data: {"event": "message_end", "task_id": "t-1", "conversation_id": "c-1"}\n\n'.encode('utf-8'))
+    return events
+
+
+def start_server(events, write_size):
+    """write_size 为 0 时每个事件单独写出（与 Dify 一致），否则按 write_size 字节分批写出"""
+    if write_size:
+        payload = b"".join(events)
+        writes = [payload[i:i + write_size] for i in range(0, len(payload), write_size)]
+    else:
+        writes = events
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for piece in writes:
+                self.wfile.write(f"{len(piece):x}\r\n".encode() + piece + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def legacy_read(response):
+    """旧实现：iter_lines 默认 512 字节一块，逐行解码"""
+    answer = []
+    for line in response.iter_lines():
+        if not line:
+            continue
+        line = line.decode('utf-8')
+        if line.startswith('data: '):
+            data = json.loads(line[6:])
+            answer.append(data.get('answer', ''))
+    return "".join(answer)
+
+
+def current_read(response):
+    answer = []
+    for event in iter_response_events(response):
+        answer.append(event.json().get('answer', ''))
+    return "".join(answer)
+
+
+def measure_http(session, url, reader, repeat):
+    best = float('inf')
+    answer = ''
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with session.post(url, json={}, stream=True) as response:
+            answer = reader(response)
+        best = min(best, time.perf_counter() - start)
+    return best, answer
+
+
+def legacy_parse(payload, chunk_size):
+    """与 iter_lines 相同的按行切分逻辑，只是数据来自内存"""
+    count = 0
+    pending = None
+    for i in range(0, len(payload), chunk_size):
+        chunk = payload[i:i + chunk_size]
+        if pending is not None:
+            chunk = pending + chunk
+        lines = chunk.splitlines()
+        pending = lines.pop() if lines and chunk and lines[-1] and lines[-1][-1] == chunk[-1] else None
+        for line in lines:
+            if line:
+                line = line.decode('utf-8')
+                if line.startswith('data: '):
+                    json.loads(line[6:])
+                    count += 1
+    return count
+
+
+def current_parse(payload, chunk_size):
+    count = 0
+    for event in iter_sse(payload[i:i + chunk_size] for i in range(0, len(payload), chunk_size)):
+        event.json()
+        count += 1
+    return count
+
+
+def measure(func, repeat, *args):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dify 流式响应解析性能基准")
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    session = requests.Session()
+    scenarios = (
+        ("逐事件写出", args.events, 0, 0),
+        ("4KB 批量写出", args.events, 0, 4096),
+        ("64KB 批量写出", args.events, 0, 65536),
+        ("8KB 大事件", args.events // 20, 8192, 0),
+    )
+    print("\n[本地 SSE 服务]")
+    print(f"{'场景':<12} {'事件数':>8} {'旧实现(µs/事件)':>16} {'新实现(µs/事件)':>16} {'加速比':>8}")
+    for name, count, event_size, write_size in scenarios:
+        events = make_events(count, event_size)
+        server = start_server(events, write_size)
+        url = f"http://127.0.0.1:{server.server_address[1]}/chat-messages"
+        try:
+            old, old_answer = measure_http(session, url, legacy_read, args.repeat)
+            new, new_answer = measure_http(session, url, current_read, args.repeat)
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert old_answer == new_answer
+        n = count + 1
+        print(f"{name:<12} {n:>8} {old / n * 1e6:>16.2f} {new / n * 1e6:>16.2f} {old / new:>7.1f}x")
+
+    payload = b"".join(make_events(args.events))
+    events = args.events + 1
+    print(f"\n[内存解析] {len(payload) // 1024} KB")
+    print(f"{'块大小':>8} {'旧实现(µs/事件)':>16} {'新实现(µs/事件)':>16} {'加速比':>8}")
+    for chunk_size in (512, 8192):
+        assert current_parse(payload, chunk_size) == events
+        old = measure(legacy_parse, args.repeat, payload, chunk_size)
+        new = measure(current_parse, args.repeat, payload, chunk_size)
+        print(f"{chunk_size:>7}B {old / events * 1e6:>16.2f} {new / events * 1e6:>16.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
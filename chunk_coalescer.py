@@ -0,0 +1,69 @@
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class ChunkCoalescer:
+    """
+    合并流式回答的片段
+
+    片段先在缓冲区中累积，距上次发送超过 interval_ms 或累积字节数达到 max_bytes 时
+    一次性交给 flush 回调。片段停止到达时由定时器把剩余内容按时发出，不会滞留在缓冲区。
+    flush 回调在加锁状态下调用，多次调用之间不会并发，顺序与片段到达顺序一致。
+    """
+
+    def __init__(self, flush: Callable[[str], None], interval_ms: int = 33, max_bytes: int = 1024):
+        self._flush = flush
+        self.interval = max(0, interval_ms) / 1000
+        self.max_bytes = max_bytes
+        self._parts: List[str] = []
+        self._bytes = 0
+        self._last_flush = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def push(self, chunk: str):
+        if not chunk:
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self._parts.append(chunk)
+            self._bytes += len(chunk.encode('utf-8'))
+
+            elapsed = time.monotonic() - self._last_flush
+            if self._bytes >= self.max_bytes or elapsed >= self.interval:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.interval - elapsed, self._on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """发出剩余内容，之后的片段被忽略"""
+        with self._lock:
+            self._flush_locked()
+            self._closed = True
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            if not self._closed:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._parts:
+            return
+        text = "".join(self._parts)
+        self._parts = []
+        self._bytes = 0
+        self._last_flush = time.monotonic()
+        self._flush(text)
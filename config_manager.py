@@ -25,6 +25,10 @@ class ConfigManager(QObject):
             'general': {
                 'language': '简体中文'
             },
+            'chat': {
+                'stream_flush_interval_ms': 33,
+                'stream_flush_bytes': 1024
+            },
             'knowledge_update': {
                 'platform': 'Bilibili',
                 'type': '收藏夹',
@@ -32,7 +36,29 @@ class ConfigManager(QObject):
                 'cookie': '',
                 'whisper_path': 'utils/whisper',
                 'ollama_url': 'http://localhost:11434/api/generate',
-                'ollama_model': 'deepseek-r1:8b'
+                'ollama_model': 'deepseek-r1:8b',
+                'download_workers': 2,
+                'transcribe_workers': 1,
+                'analyze_workers': 2,
+                'upload_workers': 2,
+                'pipeline_queue_size': 4,
+                'whisper_instances': 0,
+                'ingest_profile': 'audio',
+                'extract_keyframes': False,
+                'dify_rate_limit': 2.0,
+                'incremental_scan': True,
+                'local_index': True,
+                'embedding_model': '',
+                'embedding_url': 'http://localhost:11434/api/embed',
+                'chunk_tokens': 400,
+                'summary_mode': 'single',
+                'summary_workers': 2,
+                'summary_chunk_tokens': 2000,
+                'llm_cache': True,
+                'llm_cache_max_mb': 64,
+                'llm_cache_max_age_days': 30,
+                'analysis_provider': 'qwen',
+                'analysis_model': ''
             },
             'model': {
                 'provider': 'ollama',
@@ -164,6 +190,94 @@ class ConfigManager(QObject):
     def get_ollama_model(self):
         return self.config.get('knowledge_update', {}).get('ollama_model', 'deepseek-r1:8b')
 
+    @Slot(result=int)
+    def get_download_workers(self):
+        return int(self.config.get('knowledge_update', {}).get('download_workers', 2))
+
+    @Slot(result=int)
+    def get_transcribe_workers(self):
+        return int(self.config.get('knowledge_update', {}).get('transcribe_workers', 1))
+
+    @Slot(result=int)
+    def get_analyze_workers(self):
+        return int(self.config.get('knowledge_update', {}).get('analyze_workers', 2))
+
+    @Slot(result=int)
+    def get_upload_workers(self):
+        return int(self.config.get('knowledge_update', {}).get('upload_workers', 2))
+
+    @Slot(result=int)
+    def get_pipeline_queue_size(self):
+        return int(self.config.get('knowledge_update', {}).get('pipeline_queue_size', 4))
+
+    @Slot(result=int)
+    def get_whisper_instances(self):
+        return int(self.config.get('knowledge_update', {}).get('whisper_instances', 0))
+
+    @Slot(result=str)
+    def get_ingest_profile(self):
+        return self.config.get('knowledge_update', {}).get('ingest_profile', 'audio')
+
+    @Slot(result=bool)
+    def get_extract_keyframes(self):
+        return bool(self.config.get('knowledge_update', {}).get('extract_keyframes', False))
+
+    @Slot(result=float)
+    def get_dify_rate_limit(self):
+        return float(self.config.get('knowledge_update', {}).get('dify_rate_limit', 2.0))
+
+    @Slot(result=bool)
+    def get_incremental_scan(self):
+        return bool(self.config.get('knowledge_update', {}).get('incremental_scan', True))
+
+    @Slot(result=bool)
+    def get_local_index_enabled(self):
+        return bool(self.config.get('knowledge_update', {}).get('local_index', True))
+
+    @Slot(result=str)
+    def get_embedding_model(self):
+        return self.config.get('knowledge_update', {}).get('embedding_model', '')
+
+    @Slot(result=str)
+    def get_embedding_url(self):
+        return self.config.get('knowledge_update', {}).get('embedding_url', 'http://localhost:11434/api/embed')
+
+    @Slot(result=int)
+    def get_chunk_tokens(self):
+        return int(self.config.get('knowledge_update', {}).get('chunk_tokens', 400))
+
+    @Slot(result=str)
+    def get_summary_mode(self):
+        return self.config.get('knowledge_update', {}).get('summary_mode', 'single')
+
+    @Slot(result=int)
+    def get_summary_workers(self):
+        return int(self.config.get('knowledge_update', {}).get('summary_workers', 2))
+
+    @Slot(result=int)
+    def get_summary_chunk_tokens(self):
+        return int(self.config.get('knowledge_update', {}).get('summary_chunk_tokens', 2000))
+
+    @Slot(result=bool)
+    def get_llm_cache_enabled(self):
+        return bool(self.config.get('knowledge_update', {}).get('llm_cache', True))
+
+    @Slot(result=int)
+    def get_llm_cache_max_mb(self):
+        return int(self.config.get('knowledge_update', {}).get('llm_cache_max_mb', 64))
+
+    @Slot(result=int)
+    def get_llm_cache_max_age_days(self):
+        return int(self.config.get('knowledge_update', {}).get('llm_cache_max_age_days', 30))
+
+    @Slot(result=str)
+    def get_analysis_provider(self):
+        return self.config.get('knowledge_update', {}).get('analysis_provider', 'qwen')
+
+    @Slot(result=str)
+    def get_analysis_model(self):
+        return self.config.get('knowledge_update', {}).get('analysis_model', '')
+
     @Slot(str)
     def set_knowledge_platform(self, value):
         self._set_knowledge_config('platform', value)
@@ -192,6 +306,94 @@ class ConfigManager(QObject):
     def set_ollama_model(self, value):
         self._set_knowledge_config('ollama_model', value)
 
+    @Slot(int)
+    def set_download_workers(self, value):
+        self._set_knowledge_config('download_workers', value)
+
+    @Slot(int)
+    def set_transcribe_workers(self, value):
+        self._set_knowledge_config('transcribe_workers', value)
+
+    @Slot(int)
+    def set_analyze_workers(self, value):
+        self._set_knowledge_config('analyze_workers', value)
+
+    @Slot(int)
+    def set_upload_workers(self, value):
+        self._set_knowledge_config('upload_workers', value)
+
+    @Slot(int)
+    def set_pipeline_queue_size(self, value):
+        self._set_knowledge_config('pipeline_queue_size', value)
+
+    @Slot(int)
+    def set_whisper_instances(self, value):
+        self._set_knowledge_config('whisper_instances', value)
+
+    @Slot(str)
+    def set_ingest_profile(self, value):
+        self._set_knowledge_config('ingest_profile', value)
+
+    @Slot(bool)
+    def set_extract_keyframes(self, value):
+        self._set_knowledge_config('extract_keyframes', value)
+
+    @Slot(float)
+    def set_dify_rate_limit(self, value):
+        self._set_knowledge_config('dify_rate_limit', value)
+
+    @Slot(bool)
+    def set_incremental_scan(self, value):
+        self._set_knowledge_config('incremental_scan', value)
+
+    @Slot(bool)
+    def set_local_index_enabled(self, value):
+        self._set_knowledge_config('local_index', value)
+
+    @Slot(str)
+    def set_embedding_model(self, value):
+        self._set_knowledge_config('embedding_model', value)
+
+    @Slot(str)
+    def set_embedding_url(self, value):
+        self._set_knowledge_config('embedding_url', value)
+
+    @Slot(int)
+    def set_chunk_tokens(self, value):
+        self._set_knowledge_config('chunk_tokens', value)
+
+    @Slot(str)
+    def set_summary_mode(self, value):
+        self._set_knowledge_config('summary_mode', value)
+
+    @Slot(int)
+    def set_summary_workers(self, value):
+        self._set_knowledge_config('summary_workers', value)
+
+    @Slot(int)
+    def set_summary_chunk_tokens(self, value):
+        self._set_knowledge_config('summary_chunk_tokens', value)
+
+    @Slot(bool)
+    def set_llm_cache_enabled(self, value):
+        self._set_knowledge_config('llm_cache', value)
+
+    @Slot(int)
+    def set_llm_cache_max_mb(self, value):
+        self._set_knowledge_config('llm_cache_max_mb', value)
+
+    @Slot(int)
+    def set_llm_cache_max_age_days(self, value):
+        self._set_knowledge_config('llm_cache_max_age_days', value)
+
+    @Slot(str)
+    def set_analysis_provider(self, value):
+        self._set_knowledge_config('analysis_provider', value)
+
+    @Slot(str)
+    def set_analysis_model(self, value):
+        self._set_knowledge_config('analysis_model', value)
+
     def _set_knowledge_config(self, key, value):
         if 'knowledge_update' not in self.config:
             self.config['knowledge_update'] = {}
@@ -199,6 +401,29 @@ class ConfigManager(QObject):
         self.save_config()
         self.configChanged.emit()
 
+    @Slot(result=int)
+    def get_stream_flush_interval_ms(self):
+        return int(self.config.get('chat', {}).get('stream_flush_interval_ms', 33))
+
+    @Slot(result=int)
+    def get_stream_flush_bytes(self):
+        return int(self.config.get('chat', {}).get('stream_flush_bytes', 1024))
+
+    @Slot(int)
+    def set_stream_flush_interval_ms(self, value):
+        self._set_chat_config('stream_flush_interval_ms', value)
+
+    @Slot(int)
+    def set_stream_flush_bytes(self, value):
+        self._set_chat_config('stream_flush_bytes', value)
+
+    def _set_chat_config(self, key, value):
+        if 'chat' not in self.config:
+            self.config['chat'] = {}
+        self.config['chat'][key] = value
+        self.save_config()
+        self.configChanged.emit()
+
     @Slot(result=str)
     def get_model_provider(self):
         return self.config.get('model', {}).get('provider', 'ollama')
@@ -3,6 +3,8 @@ from datetime import datetime
 from pathlib import Path
 from PySide6.QtCore import QObject, Signal, Slot, Property
 from database_manager import DatabaseManager
+from list_models import ConversationListModel, MessageListModel
+from markdown_formatter import FORMATTER_VERSION
 from logger_config import get_logger
 
 logger = get_logger('conversation_manager')
@@ -11,14 +13,31 @@ logger = get_logger('conversation_manager')
 class ConversationManager(QObject):
     conversationListChanged = Signal()
     currentConversationChanged = Signal()
+    # 消息可能在生成线程中写入，通过信号把列表模型的更新排队到主线程
+    _messageStored = Signal(str, object, object)
+    _conversationStored = Signal(object)
 
     def __init__(self, data_dir=None):
         super().__init__()
         self.db = DatabaseManager(data_dir)
         self._current_conversation_id = None
+        self._conversation_model = ConversationListModel(self.db, self)
+        self._message_model = MessageListModel(self.db, parent=self)
+        
+        self._messageStored.connect(self._on_message_stored)
+        self._conversationStored.connect(self._on_conversation_stored)
+        self.currentConversationChanged.connect(self._reload_messages)
         
         self.load_conversations()
     
+    @Property(QObject, constant=True)
+    def conversation_model(self):
+        return self._conversation_model
+    
+    @Property(QObject, constant=True)
+    def message_model(self):
+        return self._message_model
+    
     @Property(str, notify=currentConversationChanged)
     def current_conversation_id(self):
         return self._current_conversation_id
@@ -37,15 +56,17 @@ class ConversationManager(QObject):
                 logger.info("没有找到对话，创建新对话")
                 self.create_new_conversation()
             else:
-                if saved_current_id and self.db.get_conversation(saved_current_id):
+                if saved_current_id and self.db.conversation_exists(saved_current_id):
                     self._current_conversation_id = saved_current_id
                 else:
-                    first_conv = self.db.get_all_conversations()
-                    if first_conv:
-                        self._current_conversation_id = first_conv[0]['id']
+                    first_conv_id = self.db.get_first_conversation_id()
+                    if first_conv_id:
+                        self._current_conversation_id = first_conv_id
                     else:
                         self.create_new_conversation()
             
+            self._conversation_model.reload()
+            self._reload_messages()
             self.conversationListChanged.emit()
             
         except Exception as e:
@@ -53,6 +74,21 @@ class ConversationManager(QObject):
             self._current_conversation_id = None
             self.create_new_conversation()
 
+    @Slot()
+    def _reload_messages(self):
+        self._message_model.load(self._current_conversation_id)
+
+    @Slot(str, object, object)
+    def _on_message_stored(self, conversation_id, message, conversation):
+        if message:
+            self._message_model.append_message(conversation_id, message)
+        if conversation:
+            self._conversation_model.upsert(conversation)
+
+    @Slot(object)
+    def _on_conversation_stored(self, conversation):
+        self._conversation_model.upsert(conversation)
+
     @Slot(result=str)
     def create_new_conversation(self):
         conversation_id = self.db.create_conversation('')
@@ -67,27 +103,32 @@ class ConversationManager(QObject):
 
     @Slot(str, str, str)
     def add_message(self, conversation_id, role, content):
-        conversation = self.get_conversation(conversation_id)
+        conversation = self.db.get_conversation_meta(conversation_id)
         if conversation:
-            self.db.add_message(conversation_id, role, content)
+            # 助手消息在写入时渲染一次，之后加载直接使用缓存的 HTML
+            msg_id = self.db.add_message(conversation_id, role, content,
+                                         self._message_model.render_html(role, content), FORMATTER_VERSION)
             
             if not conversation['title'] and role == 'user':
                 self.db.update_conversation_title(conversation_id, content)
             
+            self._messageStored.emit(conversation_id, self.db.get_message(msg_id),
+                                     self.db.get_conversation_meta(conversation_id))
             self.conversationListChanged.emit()
             logger.debug(f"添加消息到对话 {conversation_id}: {role}")
 
     @Slot(str, str)
     def update_title(self, conversation_id, title):
-        conversation = self.get_conversation(conversation_id)
+        conversation = self.db.get_conversation_meta(conversation_id)
         if conversation:
             self.db.update_conversation_title(conversation_id, title)
+            self._conversationStored.emit(self.db.get_conversation_meta(conversation_id))
             self.conversationListChanged.emit()
             logger.debug(f"更新对话标题: {conversation_id} -> {title}")
 
     @Slot(str)
     def load_conversation(self, conversation_id):
-        conversation = self.get_conversation(conversation_id)
+        conversation = self.db.get_conversation_meta(conversation_id)
         if conversation:
             self._current_conversation_id = conversation_id
             self.db.set_current_conversation_id(conversation_id)
@@ -107,11 +148,12 @@ class ConversationManager(QObject):
             return
         
         self.db.delete_conversation(conversation_id)
+        self._conversation_model.remove(conversation_id)
         
         if self._current_conversation_id == conversation_id:
-            first_conv = self.db.get_all_conversations()
-            if first_conv:
-                self._current_conversation_id = first_conv[0]['id']
+            first_conv_id = self.db.get_first_conversation_id()
+            if first_conv_id:
+                self._current_conversation_id = first_conv_id
                 self.db.set_current_conversation_id(self._current_conversation_id)
                 logger.debug(f"切换到新对话: {self._current_conversation_id}")
             else:
@@ -124,9 +166,10 @@ class ConversationManager(QObject):
 
     @Slot(str, str)
     def rename_conversation(self, conversation_id, new_title):
-        conversation = self.get_conversation(conversation_id)
+        conversation = self.db.get_conversation_meta(conversation_id)
         if conversation:
             self.db.update_conversation_title(conversation_id, new_title)
+            self._conversationStored.emit(self.db.get_conversation_meta(conversation_id))
             self.conversationListChanged.emit()
             logger.debug(f"重命名对话: {conversation_id} -> {new_title}")
 
@@ -135,7 +178,7 @@ class ConversationManager(QObject):
 
     def get_current_conversation(self):
         if self.current_conversation_id:
-            return self.get_conversation(self.current_conversation_id)
+            return self.db.get_conversation_meta(self.current_conversation_id)
         return None
 
     def _sort_conversations(self):
@@ -147,11 +190,22 @@ class ConversationManager(QObject):
 
     @Slot(result=list)
     def get_current_messages(self):
-        conversation = self.get_current_conversation()
-        if conversation:
-            return conversation.get('messages', [])
+        if self.current_conversation_id:
+            return self.db.get_messages(self.current_conversation_id)
+        return []
+    
+    @Slot(int, int, result=list)
+    def get_messages_page(self, before_id, limit):
+        """获取当前对话中 before_id 之前的一页消息，before_id 为 0 时返回最新一页"""
+        if self.current_conversation_id:
+            return self.db.get_messages_page(self.current_conversation_id, before_id or None, limit)
         return []
     
+    @Slot(str, int, int, result=list)
+    def search_messages(self, query, limit, offset):
+        """全文搜索历史对话，返回带高亮片段的结果"""
+        return self.db.search_messages(query, limit or 20, offset)
+    
     @Slot(result=bool)
     def has_messages(self):
         return False
@@ -1,6 +1,11 @@
+import html
+import re
 import sqlite3
 import json
+import threading
 import uuid
+import weakref
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, List, Dict, Any
@@ -9,7 +14,67 @@ from logger_config import get_logger
 logger = get_logger('database_manager')
 
 
+class _Connection(sqlite3.Connection):
+    """支持弱引用的连接，所属线程结束后随线程局部存储一起释放"""
+
+
 class DatabaseManager:
+    """
+    对话数据库
+
+    数据库使用 WAL 日志模式，每个线程持有自己的连接：读操作互不阻塞，也不会被写操作阻塞；
+    写操作通过写锁串行执行，每次调用在一个 IMMEDIATE 事务中提交。
+    """
+
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA cache_size = -16000",
+        "PRAGMA mmap_size = 268435456",
+    )
+    BUSY_TIMEOUT = 10
+    # trigram 分词器要求每个检索词至少 3 个字符，更短的检索词使用 LIKE 查询
+    FTS_MIN_TERM = 3
+    SNIPPET_TOKENS = 24
+    RANK_WINDOW = 2000
+    _HIGHLIGHT_START = '\x02'
+    _HIGHLIGHT_END = '\x03'
+    _SEARCH_TRIGGERS = (
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS conversations_fts_insert AFTER INSERT ON conversations BEGIN
+            INSERT INTO conversations_fts(rowid, title) VALUES (new.rowid, new.title);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS conversations_fts_delete AFTER DELETE ON conversations BEGIN
+            INSERT INTO conversations_fts(conversations_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS conversations_fts_update AFTER UPDATE OF title ON conversations BEGIN
+            INSERT INTO conversations_fts(conversations_fts, rowid, title) VALUES ('delete', old.rowid, old.title);
+            INSERT INTO conversations_fts(rowid, title) VALUES (new.rowid, new.title);
+        END
+        ''',
+    )
+
     def __init__(self, data_dir=None):
         self.data_dir = Path(data_dir) if data_dir else Path(__file__).parent / "data"
         self.data_dir.mkdir(exist_ok=True)
@@ -17,78 +82,167 @@ class DatabaseManager:
         self.db_path = self.data_dir / "conversations.db"
         self.json_file = self.data_dir / "conversations.json"
         
-        self._connection = None
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        self._connections_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._fts_enabled = False
         self._initialize_database()
     
     def _get_connection(self):
-        if self._connection is None:
-            self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
-            self._connection.row_factory = sqlite3.Row
-        return self._connection
+        """获取当前线程的连接，不存在时创建"""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            # 连接只在所属线程中使用；关闭 check_same_thread 以便 close() 在主线程统一关闭
+            conn = sqlite3.connect(str(self.db_path), timeout=self.BUSY_TIMEOUT, isolation_level=None,
+                                   check_same_thread=False, factory=_Connection)
+            conn.row_factory = sqlite3.Row
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            self._local.connection = conn
+            with self._connections_lock:
+                self._connections.add(conn)
+        return conn
+    
+    @contextmanager
+    def _write_transaction(self):
+        """在写锁保护下执行一个写事务，正常结束时提交，异常时回滚"""
+        conn = self._get_connection()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn.cursor()
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
     
     def close(self):
-        if self._connection:
-            self._connection.close()
-            self._connection = None
+        with self._connections_lock:
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
     
     def _initialize_database(self):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS conversations (
-                id TEXT PRIMARY KEY,
-                title TEXT NOT NULL DEFAULT '',
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                dify_conversation_id TEXT,
-                is_deleted INTEGER NOT NULL DEFAULT 0
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_id TEXT NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                FOREIGN KEY (conversation_id) REFERENCES conversations(id) ON DELETE CASCADE
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS app_settings (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_conversations_updated_at 
-            ON conversations(updated_at DESC)
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_conversations_is_deleted 
-            ON conversations(is_deleted)
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_messages_conversation_id 
-            ON messages(conversation_id)
-        ''')
-        
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_messages_timestamp 
-            ON messages(timestamp)
-        ''')
-        
-        conn.commit()
+        with self._write_transaction() as cursor:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL DEFAULT '',
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    dify_conversation_id TEXT,
+                    is_deleted INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    rendered_html TEXT,
+                    render_version INTEGER NOT NULL DEFAULT 0,
+                    FOREIGN KEY (conversation_id) REFERENCES conversations(id) ON DELETE CASCADE
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS app_settings (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_conversations_updated_at 
+                ON conversations(updated_at DESC)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_conversations_is_deleted 
+                ON conversations(is_deleted)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_messages_conversation_id 
+                ON messages(conversation_id)
+            ''')
+            
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_messages_timestamp 
+                ON messages(timestamp)
+            ''')
+            
+            # 旧数据库补充渲染缓存列
+            columns = {row['name'] for row in cursor.execute("PRAGMA table_info(messages)")}
+            if 'rendered_html' not in columns:
+                cursor.execute("ALTER TABLE messages ADD COLUMN rendered_html TEXT")
+            if 'render_version' not in columns:
+                cursor.execute("ALTER TABLE messages ADD COLUMN render_version INTEGER NOT NULL DEFAULT 0")
+            
+            # 消息内容修改后缓存的 HTML 失效
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS messages_render_invalidate
+                AFTER UPDATE OF content ON messages
+                BEGIN
+                    UPDATE messages SET rendered_html = NULL, render_version = 0 WHERE id = new.id;
+                END
+            ''')
+        
+        self._initialize_search_index()
         logger.info(f"数据库初始化完成: {self.db_path}")
         
         self._check_and_migrate_data()
     
+    def _initialize_search_index(self):
+        """
+        创建消息内容与对话标题的 FTS5 全文索引
+
+        索引为外部内容表，由触发器与 messages、conversations 保持同步；
+        首次创建时从现有数据重建。SQLite 不支持 FTS5 或 trigram 分词器时退回 LIKE 查询。
+        """
+        conn = self._get_connection()
+        existing = {row['name'] for row in conn.execute('''
+            SELECT name FROM sqlite_master WHERE type = 'table' AND name IN ('messages_fts', 'conversations_fts')
+        ''')}
+        
+        try:
+            with self._write_transaction() as cursor:
+                cursor.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                        content,
+                        content = 'messages',
+                        content_rowid = 'id',
+                        tokenize = 'trigram'
+                    )
+                ''')
+                
+                cursor.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+                        title,
+                        content = 'conversations',
+                        content_rowid = 'rowid',
+                        tokenize = 'trigram'
+                    )
+                ''')
+                
+                for trigger in self._SEARCH_TRIGGERS:
+                    cursor.execute(trigger)
+                
+                if 'messages_fts' not in existing:
+                    cursor.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+                if 'conversations_fts' not in existing:
+                    cursor.execute("INSERT INTO conversations_fts(conversations_fts) VALUES ('rebuild')")
+            self._fts_enabled = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"全文索引不可用，搜索将使用 LIKE 查询: {e}")
+            self._fts_enabled = False
+    
     def _check_and_migrate_data(self):
         if self.json_file.exists():
             cursor = self._get_connection().cursor()
@@ -107,38 +261,34 @@ class DatabaseManager:
             conversations = data.get('conversations', [])
             current_conversation_id = data.get('current_conversation_id', '')
             
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            for conv in conversations:
-                conv_id = conv.get('id', str(uuid.uuid4()))
-                title = conv.get('title', '')
-                created_at = conv.get('created_at', datetime.now().isoformat())
-                updated_at = conv.get('updated_at', datetime.now().isoformat())
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO conversations 
-                    (id, title, created_at, updated_at, is_deleted)
-                    VALUES (?, ?, ?, ?, 0)
-                ''', (conv_id, title, created_at, updated_at))
-                
-                messages = conv.get('messages', [])
-                for msg in messages:
-                    role = msg.get('role', '')
-                    content = msg.get('content', '')
-                    timestamp = msg.get('timestamp', datetime.now().isoformat())
+            with self._write_transaction() as cursor:
+                for conv in conversations:
+                    conv_id = conv.get('id', str(uuid.uuid4()))
+                    title = conv.get('title', '')
+                    created_at = conv.get('created_at', datetime.now().isoformat())
+                    updated_at = conv.get('updated_at', datetime.now().isoformat())
                     
                     cursor.execute('''
-                        INSERT INTO messages (conversation_id, role, content, timestamp)
-                        VALUES (?, ?, ?, ?)
-                    ''', (conv_id, role, content, timestamp))
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO app_settings (key, value)
-                VALUES ('current_conversation_id', ?)
-            ''', (current_conversation_id,))
-            
-            conn.commit()
+                        INSERT OR REPLACE INTO conversations 
+                        (id, title, created_at, updated_at, is_deleted)
+                        VALUES (?, ?, ?, ?, 0)
+                    ''', (conv_id, title, created_at, updated_at))
+                    
+                    messages = conv.get('messages', [])
+                    for msg in messages:
+                        role = msg.get('role', '')
+                        content = msg.get('content', '')
+                        timestamp = msg.get('timestamp', datetime.now().isoformat())
+                        
+                        cursor.execute('''
+                            INSERT INTO messages (conversation_id, role, content, timestamp)
+                            VALUES (?, ?, ?, ?)
+                        ''', (conv_id, role, content, timestamp))
+                
+                cursor.execute('''
+                    INSERT OR REPLACE INTO app_settings (key, value)
+                    VALUES ('current_conversation_id', ?)
+                ''', (current_conversation_id,))
             
             backup_file = self.json_file.with_suffix('.json.backup')
             self.json_file.rename(backup_file)
@@ -154,15 +304,12 @@ class DatabaseManager:
         conv_id = str(uuid.uuid4())
         now = datetime.now().isoformat()
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO conversations (id, title, created_at, updated_at, is_deleted)
-            VALUES (?, ?, ?, ?, 0)
-        ''', (conv_id, title, now, now))
+        with self._write_transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO conversations (id, title, created_at, updated_at, is_deleted)
+                VALUES (?, ?, ?, ?, 0)
+            ''', (conv_id, title, now, now))
         
-        conn.commit()
         logger.debug(f"创建对话: {conv_id}")
         
         return conv_id
@@ -191,29 +338,106 @@ class DatabaseManager:
             }
         return None
     
-    def get_all_conversations(self) -> List[Dict[str, Any]]:
+    def _conversation_from_row(self, row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'title': row['title'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+            'dify_conversation_id': row['dify_conversation_id'],
+            'is_deleted': row['is_deleted']
+        }
+    
+    def get_conversation_meta(self, conv_id: str) -> Optional[Dict[str, Any]]:
+        """获取对话元数据（不加载消息）"""
         conn = self._get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
             SELECT id, title, created_at, updated_at, dify_conversation_id, is_deleted
             FROM conversations
+            WHERE id = ? AND is_deleted = 0
+        ''', (conv_id,))
+        
+        row = cursor.fetchone()
+        return self._conversation_from_row(row) if row else None
+    
+    def conversation_exists(self, conv_id: str) -> bool:
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT 1 FROM conversations WHERE id = ? AND is_deleted = 0
+        ''', (conv_id,))
+        
+        return cursor.fetchone() is not None
+    
+    def get_first_conversation_id(self) -> str:
+        """获取最近更新的对话ID，没有对话时返回空字符串"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id FROM conversations
             WHERE is_deleted = 0
             ORDER BY updated_at DESC
+            LIMIT 1
         ''')
         
-        return [
-            {
-                'id': row['id'],
-                'title': row['title'],
-                'created_at': row['created_at'],
-                'updated_at': row['updated_at'],
-                'dify_conversation_id': row['dify_conversation_id'],
-                'is_deleted': row['is_deleted'],
-                'messages': self.get_messages(row['id'])
-            }
-            for row in cursor.fetchall()
-        ]
+        row = cursor.fetchone()
+        return row['id'] if row else ''
+    
+    def get_conversation_summaries(self) -> List[Dict[str, Any]]:
+        """获取全部对话的元数据（不加载消息）"""
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, title, created_at, updated_at, dify_conversation_id, is_deleted
+            FROM conversations
+            WHERE is_deleted = 0
+            ORDER BY updated_at DESC
+        ''')
+        
+        return [self._conversation_from_row(row) for row in cursor.fetchall()]
+    
+    def get_all_conversations(self, include_messages: bool = True) -> List[Dict[str, Any]]:
+        """
+        获取全部对话
+
+        include_messages 为 True 时通过一次 json_group_array 聚合查询取回所有消息，
+        不需要消息时请使用 get_conversation_summaries。
+        """
+        if not include_messages:
+            return self.get_conversation_summaries()
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT c.id, c.title, c.created_at, c.updated_at, c.dify_conversation_id, c.is_deleted,
+                   (
+                       SELECT json_group_array(json_object(
+                           'id', m.id, 'role', m.role, 'content', m.content, 'timestamp', m.timestamp
+                       ))
+                       FROM (
+                           SELECT id, role, content, timestamp
+                           FROM messages
+                           WHERE conversation_id = c.id
+                           ORDER BY id ASC
+                       ) AS m
+                   ) AS messages_json
+            FROM conversations c
+            WHERE c.is_deleted = 0
+            ORDER BY c.updated_at DESC
+        ''')
+        
+        conversations = []
+        for row in cursor.fetchall():
+            conversation = self._conversation_from_row(row)
+            conversation['messages'] = json.loads(row['messages_json'] or '[]')
+            conversations.append(conversation)
+        return conversations
     
     def get_conversation_list(self) -> List[Dict[str, Any]]:
         conn = self._get_connection()
@@ -238,16 +462,13 @@ class DatabaseManager:
     def update_conversation_title(self, conv_id: str, title: str) -> bool:
         now = datetime.now().isoformat()
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE conversations
-            SET title = ?, updated_at = ?
-            WHERE id = ? AND is_deleted = 0
-        ''', (title, now, conv_id))
+        with self._write_transaction() as cursor:
+            cursor.execute('''
+                UPDATE conversations
+                SET title = ?, updated_at = ?
+                WHERE id = ? AND is_deleted = 0
+            ''', (title, now, conv_id))
         
-        conn.commit()
         success = cursor.rowcount > 0
         
         if success:
@@ -258,16 +479,13 @@ class DatabaseManager:
     def delete_conversation(self, conv_id: str) -> bool:
         now = datetime.now().isoformat()
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE conversations
-            SET is_deleted = 1, updated_at = ?
-            WHERE id = ?
-        ''', (now, conv_id))
+        with self._write_transaction() as cursor:
+            cursor.execute('''
+                UPDATE conversations
+                SET is_deleted = 1, updated_at = ?
+                WHERE id = ?
+            ''', (now, conv_id))
         
-        conn.commit()
         success = cursor.rowcount > 0
         
         if success:
@@ -275,30 +493,54 @@ class DatabaseManager:
         
         return success
     
-    def add_message(self, conv_id: str, role: str, content: str) -> int:
+    def add_message(self, conv_id: str, role: str, content: str,
+                    rendered_html: Optional[str] = None, render_version: int = 0) -> int:
         timestamp = datetime.now().isoformat()
         
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE conversations
-            SET updated_at = ?
-            WHERE id = ? AND is_deleted = 0
-        ''', (timestamp, conv_id))
-        
-        cursor.execute('''
-            INSERT INTO messages (conversation_id, role, content, timestamp)
-            VALUES (?, ?, ?, ?)
-        ''', (conv_id, role, content, timestamp))
+        with self._write_transaction() as cursor:
+            cursor.execute('''
+                UPDATE conversations
+                SET updated_at = ?
+                WHERE id = ? AND is_deleted = 0
+            ''', (timestamp, conv_id))
+            
+            cursor.execute('''
+                INSERT INTO messages (conversation_id, role, content, timestamp, rendered_html, render_version)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (conv_id, role, content, timestamp, rendered_html, render_version if rendered_html else 0))
         
-        conn.commit()
         msg_id = cursor.lastrowid
         
         logger.debug(f"添加消息到对话 {conv_id}: {role}")
         
         return msg_id
     
+    def get_message(self, msg_id: int) -> Optional[Dict[str, Any]]:
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, role, content, timestamp, rendered_html, render_version
+            FROM messages
+            WHERE id = ?
+        ''', (msg_id,))
+        
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return self._message_from_row(row)
+    
+    def _message_from_row(self, row) -> Dict[str, Any]:
+        """消息行转字典，包含渲染缓存字段"""
+        return {
+            'id': row['id'],
+            'role': row['role'],
+            'content': row['content'],
+            'timestamp': row['timestamp'],
+            'rendered_html': row['rendered_html'],
+            'render_version': row['render_version']
+        }
+    
     def get_messages(self, conv_id: str) -> List[Dict[str, Any]]:
         conn = self._get_connection()
         cursor = conn.cursor()
@@ -320,17 +562,236 @@ class DatabaseManager:
             for row in cursor.fetchall()
         ]
     
-    def update_dify_conversation_id(self, conv_id: str, dify_conv_id: str) -> bool:
+    def get_messages_page(self, conv_id: str, before_id: Optional[int] = None,
+                          limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        按消息ID倒序分页获取消息（键集分页）
+
+        Args:
+            conv_id: 对话ID
+            before_id: 只返回ID小于该值的消息，为空时从最新消息开始
+            limit: 每页消息数
+
+        Returns:
+            按时间正序排列的一页消息
+        """
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        if before_id:
+            cursor.execute('''
+                SELECT id, role, content, timestamp, rendered_html, render_version
+                FROM messages
+                WHERE conversation_id = ? AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (conv_id, before_id, limit))
+        else:
+            cursor.execute('''
+                SELECT id, role, content, timestamp, rendered_html, render_version
+                FROM messages
+                WHERE conversation_id = ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (conv_id, limit))
+        
+        return [self._message_from_row(row) for row in reversed(cursor.fetchall())]
+    
+    def save_rendered_html(self, items: List[tuple]) -> None:
+        """
+        批量写入消息的渲染缓存
+
+        Args:
+            items: [(消息ID, HTML, 格式化器版本)]
+        """
+        if not items:
+            return
+        with self._write_transaction() as cursor:
+            cursor.executemany('''
+                UPDATE messages SET rendered_html = ?, render_version = ? WHERE id = ?
+            ''', [(html_text, version, msg_id) for msg_id, html_text, version in items])
+    
+    def search_messages(self, query: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        全文搜索消息内容和对话标题
+
+        Args:
+            query: 检索词，多个词以空格分隔，需同时命中
+            limit: 返回条数
+            offset: 跳过条数（分页）
+
+        Returns:
+            按相关度排列的结果，snippet 为高亮后的 HTML 片段；
+            kind 为 'title' 表示命中对话标题，此时 message_id 为 0
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        
+        if self._fts_enabled and all(len(term) >= self.FTS_MIN_TERM for term in terms):
+            rows = self._search_fts(terms, limit, offset)
+        else:
+            rows = self._search_like(terms, limit, offset)
+        
+        return [
+            {
+                'kind': row['kind'],
+                'conversation_id': row['conversation_id'],
+                'conversation_title': row['conversation_title'],
+                'message_id': row['message_id'],
+                'role': row['role'],
+                'snippet': self._highlight(row['snippet']),
+                'timestamp': row['timestamp']
+            }
+            for row in rows
+        ]
+    
+    def _search_fts(self, terms: List[str], limit: int, offset: int) -> List[Dict[str, Any]]:
+        """
+        FTS5 检索
+
+        常见词可能命中大量消息，只对未删除对话中最新的 RANK_WINDOW 条命中和对话标题
+        按相关度排序；更早的命中排在其后、按时间倒序，仍可通过 offset 翻页取到。
+        """
+        match = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        
         conn = self._get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            UPDATE conversations
-            SET dify_conversation_id = ?
-            WHERE id = ? AND is_deleted = 0
-        ''', (dify_conv_id, conv_id))
+            SELECT messages_fts.rowid FROM messages_fts
+            JOIN messages m ON m.id = messages_fts.rowid
+            JOIN conversations c ON c.id = m.conversation_id
+            WHERE messages_fts MATCH ? AND c.is_deleted = 0
+            ORDER BY messages_fts.rowid DESC
+            LIMIT 1 OFFSET ?
+        ''', (match, self.RANK_WINDOW - 1))
+        row = cursor.fetchone()
+        # 命中数不超过窗口时全部参与相关度排序
+        min_rowid = row[0] if row else 0
+        
+        ranked_count = None
+        if min_rowid and offset + limit > self.RANK_WINDOW:
+            cursor.execute('''
+                SELECT COUNT(*) FROM conversations_fts
+                JOIN conversations c ON c.rowid = conversations_fts.rowid
+                WHERE conversations_fts MATCH ? AND c.is_deleted = 0
+            ''', (match,))
+            ranked_count = self.RANK_WINDOW + cursor.fetchone()[0]
+        
+        rows = []
+        if ranked_count is None or offset < ranked_count:
+            cursor.execute('''
+                SELECT * FROM (
+                    SELECT 'title' AS kind, c.rowid AS fts_rowid, c.id AS conversation_id,
+                           c.title AS conversation_title, 0 AS message_id, '' AS role,
+                           c.updated_at AS timestamp, bm25(conversations_fts) AS rank
+                    FROM conversations_fts
+                    JOIN conversations c ON c.rowid = conversations_fts.rowid
+                    WHERE conversations_fts MATCH ? AND c.is_deleted = 0
+                    UNION ALL
+                    SELECT 'message', m.id, m.conversation_id,
+                           c.title, m.id, m.role,
+                           m.timestamp, bm25(messages_fts)
+                    FROM messages_fts
+                    JOIN messages m ON m.id = messages_fts.rowid
+                    JOIN conversations c ON c.id = m.conversation_id
+                    WHERE messages_fts MATCH ? AND messages_fts.rowid >= ? AND c.is_deleted = 0
+                )
+                ORDER BY rank
+                LIMIT ? OFFSET ?
+            ''', (match, match, min_rowid, limit, offset))
+            rows = [dict(row) for row in cursor.fetchall()]
+        
+        if ranked_count is not None and len(rows) < limit:
+            cursor.execute('''
+                SELECT 'message' AS kind, m.id AS fts_rowid, m.conversation_id,
+                       c.title AS conversation_title, m.id AS message_id, m.role,
+                       m.timestamp, 0 AS rank
+                FROM messages_fts
+                JOIN messages m ON m.id = messages_fts.rowid
+                JOIN conversations c ON c.id = m.conversation_id
+                WHERE messages_fts MATCH ? AND messages_fts.rowid < ? AND c.is_deleted = 0
+                ORDER BY messages_fts.rowid DESC
+                LIMIT ? OFFSET ?
+            ''', (match, min_rowid, limit - len(rows), max(0, offset - ranked_count)))
+            rows.extend(dict(row) for row in cursor.fetchall())
+        
+        # 只为当前页生成摘要片段
+        for kind, table in (('title', 'conversations_fts'), ('message', 'messages_fts')):
+            rowids = [row['fts_rowid'] for row in rows if row['kind'] == kind]
+            if not rowids:
+                continue
+            placeholders = ', '.join('?' for _ in rowids)
+            cursor.execute(f'''
+                SELECT rowid, snippet({table}, 0, ?, ?, '…', ?) AS snippet
+                FROM {table}
+                WHERE {table} MATCH ? AND rowid IN ({placeholders})
+            ''', (self._HIGHLIGHT_START, self._HIGHLIGHT_END, self.SNIPPET_TOKENS, match, *rowids))
+            snippets = {row['rowid']: row['snippet'] for row in cursor.fetchall()}
+            for row in rows:
+                if row['kind'] == kind:
+                    row['snippet'] = snippets.get(row['fts_rowid'], '')
+        
+        return rows
+    
+    def _search_like(self, terms: List[str], limit: int, offset: int) -> List[Dict[str, Any]]:
+        patterns = ['%' + re.sub(r'([\\%_])', r'\\\1', term) + '%' for term in terms]
+        content_filter = ' AND '.join("m.content LIKE ? ESCAPE '\\'" for _ in terms)
+        title_filter = ' AND '.join("c.title LIKE ? ESCAPE '\\'" for _ in terms)
+        
+        conn = self._get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT * FROM (
+                SELECT 'title' AS kind, c.id AS conversation_id, c.title AS conversation_title,
+                       0 AS message_id, '' AS role, c.updated_at AS timestamp, c.title AS snippet
+                FROM conversations c
+                WHERE c.is_deleted = 0 AND {title_filter}
+                UNION ALL
+                SELECT 'message', m.conversation_id, c.title,
+                       m.id, m.role, m.timestamp, m.content
+                FROM messages m
+                JOIN conversations c ON c.id = m.conversation_id
+                WHERE c.is_deleted = 0 AND {content_filter}
+            )
+            ORDER BY kind = 'message', timestamp DESC
+            LIMIT ? OFFSET ?
+        ''', (*patterns, *patterns, limit, offset))
+        
+        results = []
+        for row in cursor.fetchall():
+            result = dict(row)
+            result['snippet'] = self._make_snippet(result['snippet'], terms)
+            results.append(result)
+        return results
+    
+    def _make_snippet(self, text: str, terms: List[str], width: int = 48) -> str:
+        """截取首个命中位置附近的文本，并为所有命中加上高亮标记"""
+        pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+        first = pattern.search(text)
+        start = max(0, first.start() - width // 2) if first else 0
+        end = min(len(text), start + width)
+        
+        fragment = pattern.sub(lambda m: self._HIGHLIGHT_START + m.group(0) + self._HIGHLIGHT_END,
+                               text[start:end])
+        return ('…' if start > 0 else '') + fragment + ('…' if end < len(text) else '')
+    
+    def _highlight(self, snippet: str) -> str:
+        """转义片段中的 HTML，再把高亮标记替换为加粗标签"""
+        return (html.escape(snippet or '')
+                .replace(self._HIGHLIGHT_START, '<b>')
+                .replace(self._HIGHLIGHT_END, '</b>'))
+    
+    def update_dify_conversation_id(self, conv_id: str, dify_conv_id: str) -> bool:
+        with self._write_transaction() as cursor:
+            cursor.execute('''
+                UPDATE conversations
+                SET dify_conversation_id = ?
+                WHERE id = ? AND is_deleted = 0
+            ''', (dify_conv_id, conv_id))
         
-        conn.commit()
         success = cursor.rowcount > 0
         
         if success:
@@ -339,7 +800,7 @@ class DatabaseManager:
         return success
     
     def get_dify_conversation_id(self, conv_id: str) -> Optional[str]:
-        conv = self.get_conversation(conv_id)
+        conv = self.get_conversation_meta(conv_id)
         return conv['dify_conversation_id'] if conv else None
     
     def get_current_conversation_id(self) -> str:
@@ -354,15 +815,12 @@ class DatabaseManager:
         return row['value'] if row else ''
     
     def set_current_conversation_id(self, conv_id: str) -> None:
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO app_settings (key, value)
-            VALUES ('current_conversation_id', ?)
-        ''', (conv_id,))
+        with self._write_transaction() as cursor:
+            cursor.execute('''
+                INSERT OR REPLACE INTO app_settings (key, value)
+                VALUES ('current_conversation_id', ?)
+            ''', (conv_id,))
         
-        conn.commit()
         logger.debug(f"设置当前对话ID: {conv_id}")
     
     def has_empty_title_conversation(self) -> bool:
@@ -1,6 +1,8 @@
 import requests
 import json
 from typing import Optional, Dict, Any, Callable
+from http_pool import get_http_pool
+from sse_parser import iter_response_events
 from logger_config import get_logger
 
 logger = get_logger('dify_client')
@@ -14,7 +16,9 @@ class DifyClient:
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        # 当前请求的任务ID和会话ID，每次发送消息时重置，不会沿用上一次请求的值
         self.current_task_id = None
+        self.current_conversation_id = None
 
     def send_message(
         self,
@@ -25,7 +29,8 @@ class DifyClient:
         response_mode: str = "blocking",
         on_message: Optional[Callable[[str], None]] = None,
         on_finished: Optional[Callable[[], None]] = None,
-        on_error: Optional[Callable[[str], None]] = None
+        on_error: Optional[Callable[[str], None]] = None,
+        on_replace: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         # 检查base_url是否已经包含/chat-messages路径
         if self.base_url.endswith('/chat-messages'):
@@ -51,6 +56,9 @@ class DifyClient:
         if conversation_id:
             payload["conversation_id"] = conversation_id
         
+        self.current_task_id = None
+        self.current_conversation_id = None
+        
         logger.debug(f"Payload: {json.dumps(payload, ensure_ascii=False)}")
         
         try:
@@ -62,7 +70,7 @@ class DifyClient:
             
             if response_mode == "streaming":
                 logger.info("使用流式请求模式")
-                return self._send_streaming_request(url, payload, on_message, on_finished, on_error)
+                return self._send_streaming_request(url, payload, on_message, on_finished, on_error, on_replace)
             else:
                 logger.info("使用阻塞请求模式")
                 return self._send_blocking_request(url, payload)
@@ -85,13 +93,14 @@ class DifyClient:
             raise Exception(f"Dify API请求失败: {str(e)}")
 
     def _send_blocking_request(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-        response = requests.post(url, headers=self.headers, json=payload, timeout=60)
+        response = get_http_pool().post(url, headers=self.headers, json=payload, timeout=(10, 60))
         logger.debug(f"响应状态码: {response.status_code}")
         
         response.raise_for_status()
         
         result = response.json()
         logger.debug(f"响应内容: {json.dumps(result, ensure_ascii=False, indent=2)}")
+        self.current_conversation_id = result.get("conversation_id")
         
         return result
 
@@ -101,55 +110,81 @@ class DifyClient:
         payload: Dict[str, Any],
         on_message: Optional[Callable[[str], None]],
         on_finished: Optional[Callable[[], None]],
-        on_error: Optional[Callable[[str], None]]
+        on_error: Optional[Callable[[str], None]],
+        on_replace: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
-        response = requests.post(url, headers=self.headers, json=payload, stream=True, timeout=60)
+        response = get_http_pool().post(url, headers=self.headers, json=payload, stream=True, timeout=(10, 60))
         logger.debug(f"响应状态码: {response.status_code}")
         
         response.raise_for_status()
         
-        full_answer = ""
+        parts = []
         task_id = None
+        conversation_id = None
         
-        for line in response.iter_lines():
-            if not line:
-                continue
-            
-            line = line.decode('utf-8')
-            
-            if line.startswith('data: '):
-                data_str = line[6:]
+        try:
+            for event in iter_response_events(response):
                 try:
-                    data = json.loads(data_str)
-                    
-                    if data.get('event') == 'message':
-                        answer = data.get('answer', '')
-                        full_answer += answer
+                    data = event.json()
+                except ValueError as e:
+                    logger.error(f"JSON解析错误: {e}")
+                    continue
+                
+                name = data.get('event')
+                if not task_id and data.get('task_id'):
+                    # 首个事件就记录任务ID，生成过程中即可调用停止接口
+                    task_id = data['task_id']
+                    self.current_task_id = task_id
+                if not conversation_id and data.get('conversation_id'):
+                    conversation_id = data['conversation_id']
+                    self.current_conversation_id = conversation_id
+                
+                if name in ('message', 'agent_message'):
+                    answer = data.get('answer', '')
+                    if answer:
+                        parts.append(answer)
                         if on_message:
                             on_message(answer)
-                        logger.debug(f"收到消息片段: {answer[:50]}...")
-                    
-                    elif data.get('event') == 'message_end':
-                        task_id = data.get('task_id')
-                        self.current_task_id = task_id
-                        logger.debug(f"消息结束, Task ID: {task_id}")
-                        if on_finished:
-                            on_finished()
-                    
-                    elif data.get('event') == 'error':
-                        error_msg = data.get('message', '未知错误')
-                        logger.error(f"流式错误: {error_msg}")
+                
+                elif name == 'message_replace':
+                    # 内容审查等场景下服务端用新内容替换已输出的回答
+                    answer = data.get('answer', '')
+                    parts = [answer]
+                    logger.debug("回答内容被替换")
+                    if on_replace:
+                        on_replace(answer)
+                
+                elif name == 'message_end':
+                    logger.debug(f"消息结束, Task ID: {task_id}")
+                    if on_finished:
+                        on_finished()
+                
+                elif name == 'workflow_finished':
+                    result = data.get('data', {})
+                    if result.get('status') == 'failed':
+                        error_msg = result.get('error') or '工作流执行失败'
+                        logger.error(f"工作流错误: {error_msg}")
                         if on_error:
                             on_error(error_msg)
                 
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON解析错误: {e}")
+                elif name in ('workflow_started', 'node_started', 'node_finished'):
+                    logger.debug(f"工作流事件: {name} {data.get('data', {}).get('title', '')}")
+                
+                elif name == 'error':
+                    error_msg = data.get('message', '未知错误')
+                    logger.error(f"流式错误: {error_msg}")
+                    if on_error:
+                        on_error(error_msg)
+        finally:
+            response.close()
         
+        full_answer = "".join(parts)
         logger.debug(f"完整响应: {full_answer[:100]}...")
+        logger.debug(f"连接池统计: {get_http_pool().format_stats()}")
         
         return {
             "answer": full_answer,
-            "conversation_id": None,
+            "conversation_id": conversation_id,
             "task_id": task_id
         }
 
@@ -162,7 +197,7 @@ class DifyClient:
         logger.debug(f"停止生成请求: {url}")
         
         try:
-            response = requests.post(url, headers=self.headers, timeout=10)
+            response = get_http_pool().post(url, headers=self.headers, timeout=10)
             logger.debug(f"停止响应状态码: {response.status_code}")
             
             if response.status_code == 200:
@@ -178,7 +213,8 @@ class DifyClient:
             return False
 
     def get_conversation_id(self, response: Dict[str, Any]) -> Optional[str]:
-        return response.get("conversation_id")
+        """返回响应中的会话ID；流式回调中尚无响应结果时，使用本次请求已收到的会话ID"""
+        return response.get("conversation_id") or self.current_conversation_id
 
     def get_answer(self, response: Dict[str, Any]) -> str:
         if response.get("answer"):
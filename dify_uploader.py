@@ -0,0 +1,277 @@
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+import requests
+from http_pool import get_http_pool
+from logger_config import get_logger
+
+logger = get_logger('dify_uploader')
+
+
+class TokenBucket:
+    """
+    令牌桶限流器
+
+    Args:
+        rate: 每秒补充的令牌数
+        capacity: 桶容量（允许的突发请求数），默认与 rate 相同
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = max(0.01, float(rate))
+        self.capacity = max(1.0, float(capacity if capacity is not None else rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        获取一个令牌，令牌不足时阻塞等待
+
+        Returns:
+            bool: 成功获取返回 True，等待期间被停止返回 False
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait_time = (1 - self._tokens) / self.rate
+
+            if should_stop and should_stop():
+                return False
+            time.sleep(min(wait_time, 0.2))
+
+
+class DifyBatchUploader:
+    """
+    Dify 知识库批量上传器
+
+    文档提交到内部线程池后并发上传，并发数与请求速率均可配置；
+    429 和 5xx 响应按带抖动的指数退避重试。
+    上传成功的文档记录其 batch，结束时统一轮询索引状态。
+    """
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+    # 上传请求的 (连接超时, 读取超时)
+    UPLOAD_TIMEOUT = (10, 60)
+    FINISHED_STATUS = ("completed", "error", "paused")
+
+    def __init__(self, base_url: str, dataset_id: str, api_key: str,
+                 concurrency: int = 2, rate_per_second: float = 2.0, max_retries: int = 4,
+                 log_callback: Optional[Callable[[str], None]] = None,
+                 should_stop: Optional[Callable[[], bool]] = None):
+        self.base_url = base_url.rstrip('/')
+        self.dataset_id = dataset_id
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        self.max_retries = max_retries
+        self.log = log_callback or logger.info
+        self.should_stop = should_stop or (lambda: False)
+
+        self._bucket = TokenBucket(rate_per_second)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="dify-upload")
+        self._batches: Dict[str, str] = {}
+        self._batches_lock = threading.Lock()
+
+    def submit(self, title: str, content: str) -> Future:
+        """
+        提交一个文档等待上传
+
+        Returns:
+            Future: 结果为 Dify 返回的 batch 标识，失败时为 None
+        """
+        return self._executor.submit(self._upload, title, content)
+
+    def upload(self, title: str, content: str) -> Optional[str]:
+        """提交文档并等待上传完成，等待期间响应停止标志"""
+        future = self.submit(title, content)
+        while not future.done():
+            if self.should_stop():
+                future.cancel()
+                return None
+            wait([future], timeout=0.5)
+
+        try:
+            return future.result()
+        except Exception as e:
+            self.log(f"[-] 连接 Dify 失败: {e}")
+            return None
+
+    def upload_many(self, documents: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """
+        并发提交多个文档并等待全部完成，等待期间响应停止标志
+
+        Args:
+            documents: [(标题, 内容)]
+
+        Returns:
+            list: 与 documents 一一对应的 batch，失败或被停止的为 None；
+                被停止时已完成上传的文档仍返回其 batch
+        """
+        futures = [self.submit(title, content) for title, content in documents]
+        while not all(future.done() for future in futures):
+            if self.should_stop():
+                for future in futures:
+                    future.cancel()
+                break
+            wait(futures, timeout=0.5)
+
+        results = []
+        for future in futures:
+            if not future.done() or future.cancelled():
+                results.append(None)
+                continue
+            try:
+                results.append(future.result())
+            except Exception as e:
+                self.log(f"[-] 连接 Dify 失败: {e}")
+                results.append(None)
+        return results
+
+    def _build_payload(self, title: str, content: str) -> dict:
+        return {
+            "name": title,
+            "text": content,
+            "indexing_technique": "high_quality",
+            "process_rule": {
+                "mode": "custom",
+                "rules": {
+                    "pre_processing_rules": [
+                        {"id": "remove_extra_spaces", "enabled": True},
+                        {"id": "remove_urls_emails", "enabled": False}
+                    ],
+                    "segmentation": {
+                        "separator": "\\n\\n",
+                        "max_tokens": 4000
+                    }
+                }
+            }
+        }
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """计算重试等待时间：优先使用 Retry-After，否则指数退避加随机抖动"""
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return min(30.0, 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def _upload(self, title: str, content: str) -> Optional[str]:
+        url = f"{self.base_url}/datasets/{self.dataset_id}/document/create-by-text"
+        payload = self._build_payload(title, content)
+
+        for attempt in range(self.max_retries + 1):
+            if not self._bucket.acquire(self.should_stop):
+                return None
+
+            try:
+                res = get_http_pool().post(url, headers=self.headers, json=payload, timeout=self.UPLOAD_TIMEOUT)
+            except requests.ReadTimeout as e:
+                # 请求已发出，Dify 可能已经创建了文档，重试会重复上传；
+                # 本次按失败处理，任务检查点保留，下次更新时再上传
+                self.log(f"[-] 等待 Dify 响应超时，不再重试以免重复创建文档: {title} ({e})")
+                return None
+            except requests.ConnectionError as e:
+                # 与连接池的策略一致：非幂等的 POST 只在连接失败时重试
+                if attempt == self.max_retries:
+                    self.log(f"[-] 连接 Dify 失败: {e}")
+                    return None
+                delay = self._backoff(attempt)
+                self.log(f"[!] 连接 Dify 失败（{e}），{delay:.1f} 秒后重试: {title}")
+                if not self._sleep(delay):
+                    return None
+                continue
+            except requests.RequestException as e:
+                self.log(f"[-] 上传请求失败: {title} ({e})")
+                return None
+
+            if res.status_code == 200:
+                batch = res.json().get("batch")
+                if batch:
+                    with self._batches_lock:
+                        self._batches[batch] = title
+                self.log(f"[√] 已提交索引请求: {title}")
+                return batch or ""
+
+            if res.status_code not in self.RETRY_STATUS or attempt == self.max_retries:
+                self.log(f"[-] 上传失败，状态码: {res.status_code}, 原因: {res.text}")
+                return None
+
+            delay = self._backoff(attempt, res.headers.get("Retry-After"))
+            self.log(f"[!] Dify 返回 {res.status_code}，{delay:.1f} 秒后重试: {title}")
+            if not self._sleep(delay):
+                return None
+        return None
+
+    def _sleep(self, delay: float) -> bool:
+        """分段等待，期间响应停止标志；被停止时返回 False"""
+        deadline = time.monotonic() + delay
+        while True:
+            if self.should_stop():
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            time.sleep(min(remaining, 0.2))
+
+    def _fetch_status(self, batch: str) -> List[dict]:
+        url = f"{self.base_url}/datasets/{self.dataset_id}/documents/{batch}/indexing-status"
+        res = get_http_pool().get(url, headers=self.headers, timeout=(10, 30))
+        res.raise_for_status()
+        return res.json().get("data", [])
+
+    def wait_indexed(self, timeout: float = 600, poll_interval: float = 5) -> Dict[str, str]:
+        """
+        批量轮询已上传文档的索引状态，直到全部结束、超时或被停止
+
+        Returns:
+            dict: {文档标题: 索引状态}，未结束的文档为 timeout 或 stopped
+        """
+        with self._batches_lock:
+            pending = dict(self._batches)
+        results: Dict[str, str] = {}
+        deadline = time.monotonic() + timeout
+
+        while pending and not self.should_stop():
+            futures = {batch: self._executor.submit(self._fetch_status, batch) for batch in pending}
+            while not all(future.done() for future in futures.values()):
+                if self.should_stop() or time.monotonic() >= deadline:
+                    break
+                wait(list(futures.values()), timeout=0.5)
+
+            for batch, future in futures.items():
+                if not future.done():
+                    future.cancel()
+                    continue
+                try:
+                    documents = future.result(timeout=0)
+                except Exception as e:
+                    logger.warning(f"查询索引状态失败 {batch}: {e}")
+                    continue
+                statuses = [doc.get("indexing_status", "") for doc in documents]
+                if statuses and all(status in self.FINISHED_STATUS for status in statuses):
+                    results[pending.pop(batch)] = "error" if "error" in statuses else statuses[0]
+
+            if not pending or time.monotonic() >= deadline:
+                break
+            if not self._sleep(min(poll_interval, deadline - time.monotonic())):
+                break
+
+        unfinished = "stopped" if self.should_stop() else "timeout"
+        for title in pending.values():
+            results[title] = unfinished
+        with self._batches_lock:
+            self._batches.clear()
+        return results
+
+    def close(self):
+        self._executor.shutdown(wait=False)
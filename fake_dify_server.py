@@ -0,0 +1,164 @@
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Union
+
+
+class FakeDifyServer:
+    """
+    本地模拟的 Dify 知识库接口，用于测试 dify_uploader
+
+    提供 create-by-text 上传和 indexing-status 查询两个接口。
+    upload_failures 按顺序指定前几次上传请求的结果：数字为返回的状态码
+    （429 时带上 retry_after 指定的 Retry-After 头），'drop' 为不响应直接断开连接。
+    index_statuses 指定各文档（按标题）的索引状态，可以是单个状态，
+    也可以是按查询次数依次返回的状态列表（停在最后一个），未指定的文档为 completed。
+
+    用法：
+        with FakeDifyServer(upload_failures=[503]) as server:
+            uploader = DifyBatchUploader(server.url(), "dataset", "key")
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 upload_failures: Optional[Sequence[Union[int, str]]] = None,
+                 retry_after: Optional[str] = None,
+                 index_statuses: Optional[Dict[str, Union[str, List[str]]]] = None,
+                 latency: float = 0.0):
+        self.upload_failures = list(upload_failures or [])
+        self.retry_after = retry_after
+        self.index_statuses = dict(index_statuses or {})
+        self.latency = latency
+        # 每次上传请求的 (到达时间, 标题, 返回状态)
+        self.upload_log: List[tuple] = []
+        self.status_polls = 0
+        self._batches: Dict[str, str] = {}
+        self._polls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def url(self) -> str:
+        """返回 DifyBatchUploader 使用的 base_url"""
+        return f"http://{self._server.server_address[0]}:{self.port}/v1"
+
+    @property
+    def uploaded_titles(self) -> List[str]:
+        """上传成功的文档标题，按到达顺序"""
+        with self._lock:
+            return [title for _, title, status in self.upload_log if status == 200]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _next_upload(self, title: str) -> Union[int, str]:
+        """记录一次上传请求并决定其结果"""
+        with self._lock:
+            result = self.upload_failures.pop(0) if self.upload_failures else 200
+            self.upload_log.append((time.monotonic(), title, result))
+            if result == 200:
+                batch = uuid.uuid4().hex
+                self._batches[batch] = title
+                return batch
+            return result
+
+    def _index_status(self, batch: str) -> Optional[str]:
+        with self._lock:
+            self.status_polls += 1
+            title = self._batches.get(batch)
+            if title is None:
+                return None
+            count = self._polls.get(batch, 0)
+            self._polls[batch] = count + 1
+        status = self.index_statuses.get(title, "completed")
+        if isinstance(status, list):
+            status = status[min(count, len(status) - 1)]
+        return status
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, data, status=200, headers=None):
+                payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if not self.path.endswith('/document/create-by-text'):
+                    self._send_json({"code": "not_found"}, status=404)
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+
+                result = server._next_upload(body.get('name', ''))
+                if result == 'drop':
+                    self.close_connection = True
+                    self.connection.close()
+                    return
+                if isinstance(result, int):
+                    headers = {"Retry-After": server.retry_after} if result == 429 and server.retry_after else None
+                    self._send_json({"code": "error", "status": result}, status=result, headers=headers)
+                    return
+                self._send_json({
+                    "document": {"id": uuid.uuid4().hex, "name": body.get('name', '')},
+                    "batch": result
+                })
+
+            def do_GET(self):
+                parts = self.path.rstrip('/').split('/')
+                if len(parts) < 3 or parts[-1] != 'indexing-status':
+                    self._send_json({"code": "not_found"}, status=404)
+                    return
+                status = server._index_status(parts[-2])
+                if status is None:
+                    self._send_json({"code": "not_found"}, status=404)
+                    return
+                self._send_json({"data": [{"id": parts[-2], "indexing_status": status}]})
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟的 Dify 知识库接口")
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeDifyServer(port=args.port, latency=args.latency).start()
+    print(f"dify: {fake.url()}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.stop()
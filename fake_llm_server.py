@@ -0,0 +1,174 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+
+class FakeLLMServer:
+    """
+    本地模拟的大模型服务，用于测试 llm_client 和分析流程
+
+    同时提供 Ollama、OpenAI 兼容、Anthropic 和 DashScope 四种接口，
+    回复内容由 reply(prompt) 决定（默认回显提示词开头），支持流式输出、
+    模拟延迟和前若干次请求返回错误状态码（fail_status，默认 503）。
+
+    用法：
+        with FakeLLMServer() as server:
+            client = OllamaProvider(server.url("ollama"), "fake")
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 reply: Optional[Callable[[str], str]] = None,
+                 latency: float = 0.0, fail_first: int = 0, fail_status: int = 503,
+                 chunk_size: int = 8):
+        self.reply = reply or (lambda prompt: f"ECHO: {prompt[:80]}")
+        self.latency = latency
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.chunk_size = chunk_size
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def url(self, provider: str = 'ollama') -> str:
+        """返回对应供应商客户端使用的 base_url"""
+        prefix = {'ollama': '/api', 'qwen': '/api/v1'}.get(provider, '/v1')
+        return f"http://{self._server.server_address[0]}:{self.port}{prefix}"
+
+    def start(self):
+        # 缩短轮询间隔，stop() 不必等待默认的 0.5 秒
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05},
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count_request(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if server._count_request() <= server.fail_first:
+                    self._send_json({"error": "unavailable"}, status=server.fail_status)
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if self.path.endswith('/generate') and not self.path.endswith('/generation'):
+                    self._ollama(body)
+                elif self.path.endswith('/chat/completions'):
+                    self._openai(body)
+                elif self.path.endswith('/messages'):
+                    self._anthropic(body)
+                elif self.path.endswith('/text-generation/generation'):
+                    self._dashscope(body)
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def _pieces(self, text):
+                return [text[i:i + server.chunk_size] for i in range(0, len(text), server.chunk_size)]
+
+            def _send_json(self, data, status=200):
+                payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_stream(self, lines, content_type):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for line in lines:
+                    data = line.encode('utf-8')
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _sse(self, events):
+                return [f"data: {json.dumps(e, ensure_ascii=False)}\n\n" if not isinstance(e, str) else e
+                        for e in events]
+
+            def _ollama(self, body):
+                text = server.reply(body.get('prompt', ''))
+                if not body.get('stream', True):
+                    self._send_json({"model": body.get('model'), "response": text, "done": True})
+                    return
+                lines = [json.dumps({"response": p, "done": False}, ensure_ascii=False) + "\n" for p in self._pieces(text)]
+                lines.append(json.dumps({"response": "", "done": True}) + "\n")
+                self._send_stream(lines, 'application/x-ndjson')
+
+            def _openai(self, body):
+                text = server.reply(body['messages'][-1]['content'])
+                if not body.get('stream'):
+                    self._send_json({"choices": [{"index": 0, "message": {"role": "assistant", "content": text}}]})
+                    return
+                events = [{"choices": [{"index": 0, "delta": {"content": p}}]} for p in self._pieces(text)]
+                self._send_stream(self._sse(events) + ["data: [DONE]\n\n"], 'text/event-stream')
+
+            def _anthropic(self, body):
+                text = server.reply(body['messages'][-1]['content'])
+                if not body.get('stream'):
+                    self._send_json({"type": "message", "content": [{"type": "text", "text": text}]})
+                    return
+                events = [{"type": "message_start"}]
+                events += [{"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": p}}
+                           for p in self._pieces(text)]
+                events.append({"type": "message_stop"})
+                self._send_stream(self._sse(events), 'text/event-stream')
+
+            def _dashscope(self, body):
+                text = server.reply(body.get('input', {}).get('prompt', ''))
+                if self.headers.get('X-DashScope-SSE') != 'enable':
+                    self._send_json({"output": {"text": text, "finish_reason": "stop"}})
+                    return
+                events = [{"output": {"text": p}} for p in self._pieces(text)]
+                self._send_stream(self._sse(events), 'text/event-stream')
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟的大模型服务")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeLLMServer(port=args.port, latency=args.latency).start()
+    for name in ('ollama', 'openai', 'anthropic', 'qwen'):
+        print(f"{name}: {fake.url(name)}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.stop()
@@ -0,0 +1,145 @@
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from logger_config import get_logger
+
+logger = get_logger('http_pool')
+
+
+class HttpPool:
+    """
+    共享的HTTP连接池
+
+    按 scheme://host 为每个目标服务维护一个 requests.Session，
+    保持长连接以避免每次请求重新进行 TCP/TLS 握手。
+    连接失败和幂等请求的 429/5xx 响应会按指数退避自动重试；
+    POST 等非幂等请求只在连接建立失败时重试。
+    """
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 16,
+                 connect_timeout: float = 10, read_timeout: float = 60,
+                 retries: int = 2, backoff_factor: float = 0.5):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.default_timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _host_key(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _create_session(self) -> requests.Session:
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=0,
+            status=self.retries,
+            status_forcelist=self.RETRY_STATUS,
+            backoff_factor=self.backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry
+        )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def session_for(self, url: str) -> requests.Session:
+        """获取目标地址所在主机的会话，不存在时创建"""
+        key = self._host_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._create_session()
+                self._sessions[key] = session
+            return session
+
+    def request(self, method: str, url: str, timeout: Any = None, **kwargs: Any) -> requests.Response:
+        """
+        发送请求
+
+        Args:
+            method: HTTP 方法
+            url: 请求地址
+            timeout: 超时时间，未指定时使用连接池默认的 (连接, 读取) 超时
+            **kwargs: 透传给 requests.Session.request 的参数
+        """
+        session = self.session_for(url)
+        return session.request(method, url, timeout=timeout or self.default_timeout, **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        统计各主机的连接复用情况
+
+        Returns:
+            dict: {主机: {"requests": 请求数, "connections": 新建连接数（未命中）, "reused": 复用次数（命中）}}
+        """
+        result = {}
+        with self._lock:
+            sessions = list(self._sessions.items())
+
+        for key, session in sessions:
+            total_requests = 0
+            total_connections = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for pool_key in list(pools.keys()):
+                    pool = pools.get(pool_key)
+                    if pool is None:
+                        continue
+                    total_requests += pool.num_requests
+                    total_connections += pool.num_connections
+            result[key] = {
+                "requests": total_requests,
+                "connections": total_connections,
+                "reused": max(0, total_requests - total_connections)
+            }
+        return result
+
+    def format_stats(self) -> str:
+        """将连接池统计格式化为一行日志文本"""
+        parts = [
+            f"{host} 请求 {s['requests']} 次/新建连接 {s['connections']} 次/复用 {s['reused']} 次"
+            for host, s in self.stats().items()
+        ]
+        return "；".join(parts) if parts else "暂无请求"
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+_pool_lock = threading.Lock()
+_pool: Optional[HttpPool] = None
+
+
+def get_http_pool() -> HttpPool:
+    """获取进程内共享的连接池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HttpPool()
+        return _pool
@@ -0,0 +1,154 @@
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+from logger_config import get_logger
+
+logger = get_logger('ingest_jobs')
+
+
+class JobStage:
+    """视频处理阶段，按先后顺序排列"""
+    SCANNED = "scanned"
+    DOWNLOADED = "downloaded"
+    TRANSCRIBED = "transcribed"
+    ANALYZED = "analyzed"
+    UPLOADED = "uploaded"
+    CLEANED = "cleaned"
+
+    ORDER = [SCANNED, DOWNLOADED, TRANSCRIBED, ANALYZED, UPLOADED, CLEANED]
+
+    @classmethod
+    def reached(cls, current: str, target: str) -> bool:
+        """current 阶段是否已经完成 target 阶段"""
+        return cls.ORDER.index(current) >= cls.ORDER.index(target)
+
+
+class JobStore:
+    """
+    视频处理任务状态表
+
+    每个视频记录已完成的最后一个阶段以及该阶段产生的中间结果
+    （标题、媒体文件、转录文本、待上传文档），
+    程序重启或中途失败后可以从上次完成的阶段继续。
+    一个视频会上传为多篇文档，已成功上传的文档单独记录，继续上传时跳过。
+    """
+
+    ARTIFACT_FIELDS = ('title', 'url', 'media_file', 'transcript', 'document')
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._initialize_database()
+
+    def _initialize_database(self):
+        with self._lock:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS ingest_jobs (
+                    platform TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    title TEXT,
+                    url TEXT,
+                    media_file TEXT,
+                    transcript TEXT,
+                    document TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (platform, video_id)
+                )
+            ''')
+            self._connection.execute('''
+                CREATE INDEX IF NOT EXISTS idx_ingest_jobs_stage
+                ON ingest_jobs(stage)
+            ''')
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS ingest_uploads (
+                    platform TEXT NOT NULL,
+                    video_id TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    batch TEXT,
+                    uploaded_at TEXT NOT NULL,
+                    PRIMARY KEY (platform, video_id, title)
+                )
+            ''')
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def get(self, platform: str, video_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态，不存在时返回 None"""
+        with self._lock:
+            row = self._connection.execute('''
+                SELECT * FROM ingest_jobs WHERE platform = ? AND video_id = ?
+            ''', (platform, video_id)).fetchone()
+        return dict(row) if row else None
+
+    def ensure(self, platform: str, video_id: str, url: str = '') -> Dict[str, Any]:
+        """获取任务状态，不存在时以 scanned 阶段创建"""
+        job = self.get(platform, video_id)
+        if job:
+            return job
+
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._connection.execute('''
+                INSERT OR IGNORE INTO ingest_jobs (platform, video_id, stage, url, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (platform, video_id, JobStage.SCANNED, url, now))
+            self._connection.commit()
+        return self.get(platform, video_id)
+
+    def advance(self, platform: str, video_id: str, stage: str, **artifacts: Any) -> None:
+        """
+        记录任务完成了某个阶段，并保存该阶段的中间结果
+
+        Args:
+            platform: 平台名称
+            video_id: 视频ID
+            stage: 刚完成的阶段
+            **artifacts: 需要保存的中间结果，字段见 ARTIFACT_FIELDS
+        """
+        fields = {k: v for k, v in artifacts.items() if k in self.ARTIFACT_FIELDS}
+        fields['stage'] = stage
+        fields['updated_at'] = datetime.now().isoformat()
+
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._connection.execute(
+                f"UPDATE ingest_jobs SET {assignments} WHERE platform = ? AND video_id = ?",
+                (*fields.values(), platform, video_id)
+            )
+            self._connection.commit()
+
+    def record_upload(self, platform: str, video_id: str, title: str, batch: str = '') -> None:
+        """记录视频的一篇文档已上传成功"""
+        with self._lock:
+            self._connection.execute('''
+                INSERT OR REPLACE INTO ingest_uploads (platform, video_id, title, batch, uploaded_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (platform, video_id, title, batch, datetime.now().isoformat()))
+            self._connection.commit()
+
+    def uploaded_titles(self, platform: str, video_id: str) -> Set[str]:
+        """获取视频已上传成功的文档标题"""
+        with self._lock:
+            rows = self._connection.execute('''
+                SELECT title FROM ingest_uploads WHERE platform = ? AND video_id = ?
+            ''', (platform, video_id)).fetchall()
+        return {row['title'] for row in rows}
+
+    def list_unfinished(self, platform: str) -> List[Dict[str, Any]]:
+        """列出尚未完成清理阶段的任务"""
+        with self._lock:
+            rows = self._connection.execute('''
+                SELECT * FROM ingest_jobs
+                WHERE platform = ? AND stage != ?
+                ORDER BY updated_at ASC
+            ''', (platform, JobStage.CLEANED)).fetchall()
+        return [dict(row) for row in rows]
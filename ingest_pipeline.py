@@ -0,0 +1,154 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, Optional
+from logger_config import get_logger
+
+logger = get_logger('ingest_pipeline')
+
+
+class PipelineStage:
+    """
+    流水线阶段定义
+
+    Args:
+        name: 阶段名称（用于日志和线程名）
+        func: 处理函数，接收一个任务并返回任务；返回 None 表示任务在此阶段终止
+        workers: 该阶段的并发工作线程数
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Optional[Any]], workers: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers or 1))
+
+
+class IngestPipeline:
+    """
+    多阶段并发处理流水线
+
+    各阶段之间通过有界队列连接，下游处理较慢时上游会被阻塞，
+    从而限制同时驻留在磁盘和内存中的中间产物数量。
+    should_stop 返回 True 时，所有阶段都会尽快退出。
+    """
+
+    POLL_INTERVAL = 0.2
+
+    def __init__(self, stages: List[PipelineStage], should_stop: Callable[[], bool],
+                 log_callback: Optional[Callable[[str], None]] = None, queue_size: int = 4):
+        if not stages:
+            raise ValueError("流水线至少需要一个阶段")
+        self.stages = stages
+        self.should_stop = should_stop
+        self.log = log_callback or logger.info
+        self.queue_size = max(1, int(queue_size or 1))
+
+    def run(self, items: Iterable[Any]) -> int:
+        """
+        运行流水线，阻塞直到所有任务处理完毕或被停止
+
+        Args:
+            items: 输入任务序列（可以是惰性生成器）
+
+        Returns:
+            int: 成功走完全部阶段的任务数量
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        # upstream_done[i] 置位表示第 i 个队列不会再有新任务写入
+        upstream_done = [threading.Event() for _ in self.stages]
+        completed = [0]
+        completed_lock = threading.Lock()
+        threads = []
+
+        feeder = threading.Thread(
+            target=self._feed, args=(items, queues[0], upstream_done[0]),
+            name="pipeline-feeder", daemon=True
+        )
+        threads.append(feeder)
+
+        for index, stage in enumerate(self.stages):
+            in_queue = queues[index]
+            in_done = upstream_done[index]
+            is_last = index == len(self.stages) - 1
+            out_queue = None if is_last else queues[index + 1]
+            out_done = None if is_last else upstream_done[index + 1]
+
+            remaining = [stage.workers]
+            remaining_lock = threading.Lock()
+
+            def on_worker_exit(remaining=remaining, remaining_lock=remaining_lock, out_done=out_done):
+                with remaining_lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0 and out_done is not None:
+                        out_done.set()
+
+            def on_complete():
+                with completed_lock:
+                    completed[0] += 1
+
+            for worker_idx in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(stage, in_queue, in_done, out_queue, on_worker_exit,
+                          on_complete if is_last else None),
+                    name=f"pipeline-{stage.name}-{worker_idx}",
+                    daemon=True
+                )
+                threads.append(thread)
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return completed[0]
+
+    def _feed(self, items, out_queue, done_event):
+        """将输入任务依次写入第一个队列"""
+        try:
+            for item in items:
+                if self.should_stop():
+                    break
+                if not self._put(out_queue, item):
+                    break
+        except Exception as e:
+            self.log(f"[-] 生成任务列表失败: {e}")
+        finally:
+            done_event.set()
+
+    def _work(self, stage, in_queue, in_done, out_queue, on_exit, on_complete):
+        """单个阶段的工作线程"""
+        try:
+            while not self.should_stop():
+                try:
+                    item = in_queue.get(timeout=self.POLL_INTERVAL)
+                except queue.Empty:
+                    if in_done.is_set() and in_queue.empty():
+                        break
+                    continue
+
+                try:
+                    result = stage.func(item)
+                except Exception as e:
+                    self.log(f"[-] 阶段 {stage.name} 处理异常: {e}")
+                    continue
+
+                if result is None or self.should_stop():
+                    continue
+
+                if out_queue is not None:
+                    if not self._put(out_queue, result):
+                        break
+                elif on_complete:
+                    on_complete()
+        finally:
+            on_exit()
+
+    def _put(self, out_queue, item):
+        """写入有界队列，等待期间响应停止标志"""
+        while not self.should_stop():
+            try:
+                out_queue.put(item, timeout=self.POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -1,13 +1,23 @@
-import os
 import threading
 from pathlib import Path
 from PySide6.QtCore import QObject, Signal, Slot
 import subprocess
-import requests
+from concurrent.futures import wait
 import yt_dlp
-from faster_whisper import WhisperModel
+from ingest_pipeline import IngestPipeline, PipelineStage
+from video_archive import VideoArchive
+from whisper_service import decode_audio, get_whisper_service
+from transcript_cache import TranscriptCache, audio_fingerprint
+from ingest_jobs import JobStage, JobStore
+from http_pool import get_http_pool
+from dify_uploader import DifyBatchUploader
+from playlist_scanner import PlaylistScanner
+from local_index import open_local_index
+from summarizer import MapReduceSummarizer, SummaryCache
+from llm_cache import LLMCache
+from llm_client import LLMError, create_client
+from transcript_chunker import chunk_segments, chunk_text, parse_vtt, segments_from_whisper
 from config.platform_config import get_platform_config, is_type_supported
-from config.model_config import get_model_config
 from cookie_parser import detect_cookie_format, normalize_cookie, get_cookie_format_name
 from logger_config import get_logger
 
@@ -17,13 +27,22 @@ logger = get_logger('knowledge_updater')
 class BasePlatformHandler:
     """平台处理器基类"""
     
-    def __init__(self, config_manager, log_callback, temp_dir, archive_file, cookies_file, whisper_model):
+    def __init__(self, config_manager, log_callback, temp_dir, archive_file, cookies_file, whisper_service,
+                 transcript_cache=None, job_store=None, playlist_scanner=None, local_index=None,
+                 summary_cache=None, llm_cache=None):
         self.config_manager = config_manager
         self.log = log_callback
         self.temp_dir = temp_dir
         self.archive_file = archive_file
         self.cookies_file = cookies_file
-        self.whisper_model = whisper_model
+        self.whisper_service = whisper_service
+        self.transcript_cache = transcript_cache
+        self.job_store = job_store
+        self.playlist_scanner = playlist_scanner
+        self.local_index = local_index
+        self.summary_cache = summary_cache
+        self.llm_cache = llm_cache
+        self.cookie_text = ""
         self.should_stop = False
     
     def process(self, url, cookie_text):
@@ -35,9 +54,63 @@ class BasePlatformHandler:
         self.log(message)
 
 
+class VideoJob:
+    """流水线中单个视频的处理上下文"""
+    
+    def __init__(self, index, total, video_id, video_url):
+        self.index = index
+        self.total = total
+        self.video_id = video_id
+        self.video_url = video_url
+        self.stage = JobStage.SCANNED
+        self.title = None
+        self.media_file = None
+        self.has_video = False
+        self.frames_dir = None
+        self.transcript_cached = False
+        self.raw_text = ""
+        self.segments = []
+        self.final_data = ""
+    
+    @property
+    def tag(self):
+        return f"[{self.index}/{self.total}]"
+    
+    def reached(self, stage):
+        """是否已完成指定阶段"""
+        return JobStage.reached(self.stage, stage)
+    
+    def restore(self, state):
+        """从任务状态表恢复已完成阶段的中间结果"""
+        self.stage = state.get('stage') or JobStage.SCANNED
+        self.title = state.get('title') or self.title
+        self.raw_text = state.get('transcript') or ""
+        self.final_data = state.get('document') or ""
+        media_file = state.get('media_file')
+        if media_file and Path(media_file).exists():
+            self.media_file = Path(media_file)
+
+
 class BilibiliPlaylistHandler(BasePlatformHandler):
     """Bilibili收藏夹处理器"""
     
+    PLATFORM = "bilibili"
+    
+    # 下载格式：audio 只下载音轨，video 同时下载低清视频用于提取关键帧
+    DOWNLOAD_FORMATS = {
+        "audio": "bestaudio/worst",
+        "video": "worstvideo[height<=360]+bestaudio/worst",
+    }
+    FRAMES_FORMAT = "worstvideo[height<=360]/worst"
+    
+    DIFY_BASE_URL = "http://localhost/v1"
+    
+    TRANSCRIBE_OPTIONS = {"beam_size": 5}
+    SUBTITLE_KEY = "subtitle:vtt"
+    
+    VIDEO_EXTS = ['.mp4', '.mkv', '.webm', '.flv']
+    AUDIO_EXTS = ['.m4a', '.mp3', '.opus', '.aac', '.ogg', '.flac']
+    
     def process(self, url, cookie_text):
         """处理Bilibili收藏夹"""
         self._log("[*] 正在扫描播放列表...")
@@ -51,200 +124,397 @@ class BilibiliPlaylistHandler(BasePlatformHandler):
         if cookie_text:
             self._save_cookie(cookie_text, url)
         
+        self.cookie_text = cookie_text
+        self.archive = VideoArchive(self.archive_file)
+        
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                playlist_info = ydl.extract_info(url, download=False)
-                entries = playlist_info.get('entries', [])
+            entries = self._scan_playlist(url, ydl_opts)
             
             if not entries:
                 self._log("[-] 播放列表为空")
                 return
             
-            self._log(f"[√] 找到 {len(entries)} 个视频")
-            
-            total = len(entries)
-            for idx, entry in enumerate(entries, 1):
-                # 检查是否应该停止
+            self.uploader = self._create_uploader()
+            self.llm_client = self._create_llm_client()
+            self.summarizer = self._create_summarizer()
+            if self.llm_cache:
+                self.llm_cache.reset_stats()
+            try:
+                pipeline = self._build_pipeline()
+                finished = pipeline.run(self._iter_jobs(entries))
+                
                 if self.should_stop:
                     self._log("[!] 任务已停止")
-                    break
-                
-                if not entry:
-                    continue
-                
-                v_id = entry.get('id')
-                v_url = f"https://www.bilibili.com/video/{v_id}"
-                
-                if self._is_processed(v_id):
-                    self._log(f"[{idx}/{total}] 已处理过，跳过: {v_id}")
-                    continue
-                
-                self._log(f"\n[{idx}/{total}] 正在处理视频 ID: {v_id}")
-                self._process_single_video(v_url, v_id, cookie_text)
+                else:
+                    self._report_indexing()
+            finally:
+                self.summarizer.close()
+                self.uploader.close()
+                self._report_llm_cache()
+            
+            self._log(f"[√] 本次共完成 {finished} 个视频")
                 
         except Exception as e:
             self._log(f"[-] 扫描播放列表失败: {e}")
     
-    def _process_single_video(self, video_url, video_id, cookie_text):
-        """处理单个视频"""
+    def _scan_playlist(self, url, ydl_opts):
+        """扫描播放列表，启用增量扫描时只拉取新增部分"""
+        if not self.playlist_scanner:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                playlist_info = ydl.extract_info(url, download=False)
+                entries = playlist_info.get('entries', [])
+            self._log(f"[√] 找到 {len(entries)} 个视频")
+            return entries
+        
+        incremental = self.config_manager.get_incremental_scan() if self.config_manager else True
+        result = self.playlist_scanner.scan(url, ydl_opts, full=not incremental)
+        
+        if result.unchanged:
+            self._log(f"[√] 播放列表未变化，共 {len(result.ids)} 个视频")
+        elif result.incremental:
+            self._log(f"[√] 增量扫描：新增 {len(result.added)} 个视频，共 {len(result.ids)} 个视频")
+        else:
+            self._log(f"[√] 找到 {len(result.ids)} 个视频")
+        
+        # 之前扫描到但尚未处理完的视频也需要继续处理，由归档记录过滤已完成的
+        return [{'id': video_id} for video_id in result.ids]
+    
+    def _build_pipeline(self):
+        """按配置的并发数构建 下载 → 转录 → 分析 → 上传 流水线"""
+        cm = self.config_manager
+        stages = [
+            PipelineStage("download", self._stage_download, cm.get_download_workers() if cm else 1),
+            # 转录线程数不少于模型实例数，保证每个实例都有任务可做
+            PipelineStage("transcribe", self._stage_transcribe,
+                          max(cm.get_transcribe_workers() if cm else 1, self.whisper_service.instances)),
+            PipelineStage("analyze", self._stage_analyze, cm.get_analyze_workers() if cm else 1),
+            PipelineStage("upload", self._stage_upload, cm.get_upload_workers() if cm else 1),
+        ]
+        queue_size = cm.get_pipeline_queue_size() if cm else 4
+        return IngestPipeline(stages, lambda: self.should_stop, self._log, queue_size)
+    
+    def _iter_jobs(self, entries):
+        """将播放列表条目转换为待处理任务，跳过已处理的视频"""
+        total = len(entries)
+        for idx, entry in enumerate(entries, 1):
+            if not entry:
+                continue
+            
+            v_id = entry.get('id')
+            v_url = f"https://www.bilibili.com/video/{v_id}"
+            
+            if self._is_processed(v_id):
+                self._log(f"[{idx}/{total}] 已处理过，跳过: {v_id}")
+                continue
+            
+            job = VideoJob(idx, total, v_id, v_url)
+            if self.job_store:
+                job.restore(self.job_store.ensure(self.PLATFORM, v_id, v_url))
+                if job.stage != JobStage.SCANNED:
+                    self._log(f"[{idx}/{total}] 从 {job.stage} 阶段继续处理: {v_id}")
+            yield job
+    
+    def _checkpoint(self, job, stage, **artifacts):
+        """记录任务完成的阶段及其中间结果"""
+        job.stage = stage
+        if not self.job_store:
+            return
         try:
-            # 检查是否应该停止
-            if self.should_stop:
-                self._log("[!] 任务已停止")
-                return
+            self.job_store.advance(self.PLATFORM, job.video_id, stage, **artifacts)
+        except Exception as e:
+            self._log(f"[-] 保存任务状态失败: {e}")
+    
+    def _ingest_profile(self):
+        """获取下载配置档：audio 或 video"""
+        profile = self.config_manager.get_ingest_profile() if self.config_manager else "audio"
+        return profile if profile in self.DOWNLOAD_FORMATS else "audio"
+    
+    def _frames_required(self):
+        """后续阶段是否需要关键帧"""
+        if self._ingest_profile() == "video":
+            return True
+        return bool(self.config_manager and self.config_manager.get_extract_keyframes())
+    
+    def _stage_download(self, job):
+        """流水线阶段：下载视频（按配置档只下载音频或同时下载视频）"""
+        self._log(f"\n{job.tag} 正在处理视频 ID: {job.video_id}")
+        
+        # 已转录的任务不再需要媒体文件；已下载且文件仍在时也无需重新下载
+        if (job.reached(JobStage.TRANSCRIBED) and job.raw_text.strip()) or (job.reached(JobStage.DOWNLOADED) and job.media_file):
+            return job
+        
+        cached = self._get_cached_transcript(job.video_id)
+        if cached and cached.get('title') and cached.get('text', '').strip():
+            # 转录已缓存时跳过下载；若后续需要关键帧会单独按需下载
+            job.title = cached['title']
+            job.raw_text = cached.get('text', '')
+            job.segments = cached.get('segments', [])
+            job.transcript_cached = True
+            self._log(f"[√] {job.tag} 命中转录缓存，跳过下载: {job.title}")
+            self._checkpoint(job, JobStage.TRANSCRIBED, title=job.title, transcript=job.raw_text)
+            return job
+        
+        profile = self._ingest_profile()
+        dl_opts = {
+            'cookiefile': str(self.cookies_file) if self.cookie_text else None,
+            'format': self.DOWNLOAD_FORMATS[profile],
+            'outtmpl': f'{self.temp_dir}/{job.video_id}.%(ext)s',
+            'write_auto_subs': True,
+            'sub_langs': ['zh-Hans', 'zh-CN'],
+            'ignoreerrors': True
+        }
+        
+        with yt_dlp.YoutubeDL(dl_opts) as ydl_dl:
+            info_dict = ydl_dl.extract_info(job.video_url, download=True)
+            
+            if not info_dict:
+                self._log(f"[-] 无法获取视频信息，URL: {job.video_url}")
+                return None
             
+            job.title = info_dict.get('title', f"Video_{job.video_id}")
+            job.has_video = info_dict.get('vcodec') not in (None, 'none')
+        
+        self._log(f"[√] {job.tag} 成功获取标题: {job.title}")
+        
+        job.media_file = self._find_media_file(job.video_id)
+        if not job.media_file:
+            self._log(f"[-] 未找到媒体文件: {job.video_id}")
+            return None
+        
+        self._checkpoint(job, JobStage.DOWNLOADED, title=job.title, media_file=str(job.media_file))
+        return job
+    
+    def _request_frames(self, job):
+        """
+        按需获取关键帧
+
+        音频档下载的文件没有视频轨，此时单独下载一份低清视频流用于抽帧。
+        """
+        video_file = job.media_file if job.has_video else None
+        
+        if video_file is None:
+            self._log(f"[*] {job.tag} 单独下载视频流用于提取关键帧...")
             dl_opts = {
-                'cookiefile': str(self.cookies_file) if cookie_text else None,
-                'format': 'worstvideo[height<=360]+bestaudio/worst',
-                'outtmpl': f'{self.temp_dir}/{video_id}.%(ext)s',
-                'write_auto_subs': True,
-                'sub_langs': ['zh-Hans', 'zh-CN'],
+                'cookiefile': str(self.cookies_file) if self.cookie_text else None,
+                'format': self.FRAMES_FORMAT,
+                'outtmpl': f'{self.temp_dir}/{job.video_id}.frames.%(ext)s',
                 'ignoreerrors': True
             }
-            
             with yt_dlp.YoutubeDL(dl_opts) as ydl_dl:
-                info_dict = ydl_dl.extract_info(video_url, download=True)
-                
-                if not info_dict:
-                    self._log(f"[-] 无法获取视频信息，URL: {video_url}")
-                    return
-                
-                v_title = info_dict.get('title', f"Video_{video_id}")
-            
-            self._log(f"[√] 成功获取标题: {v_title}")
-            
-            # 检查是否应该停止
-            if self.should_stop:
-                self._log("[!] 任务已停止")
-                return
-            
-            v_file = self._find_video_file(video_id)
-            if not v_file:
-                self._log(f"[-] 未找到视频文件: {video_id}")
-                return
-            
-            # 检查是否应该停止
-            if self.should_stop:
-                self._log("[!] 任务已停止")
-                return
-            
-            raw_text = self._get_transcription(v_file, video_id)
-            
-            # 检查是否应该停止
-            if self.should_stop:
-                self._log("[!] 任务已停止")
-                return
-            
-            f_dir = self.temp_dir / f"f_{video_id}"
-            frames = self._extract_keyframes(v_file, f_dir)
-            
-            # 检查是否应该停止
-            if self.should_stop:
-                self._log("[!] 任务已停止")
-                return
-            
-            ai_summary = self._analyze_with_ollama(v_title, video_url, raw_text, frames)
-            
-            # 检查是否应该停止
-            if self.should_stop:
-                self._log("[!] 任务已停止")
-                return
+                ydl_dl.extract_info(job.video_url, download=True)
             
-            if ai_summary:
-                final_data = f"【视频标题】：{v_title} 。【视频链接】：{video_url} 。【详细分析总结】：{ai_summary}"
+            video_file = self._find_media_file(f"{job.video_id}.frames", self.VIDEO_EXTS)
+            if not video_file:
+                self._log(f"[-] 未找到视频流文件: {job.video_id}")
+                return []
+        
+        job.frames_dir = self.temp_dir / f"f_{job.video_id}"
+        return self._extract_keyframes(video_file, job.frames_dir)
+    
+    def _stage_transcribe(self, job):
+        """
+        流水线阶段：语音转文字
+
+        转录为空（识别失败或没有语音）时不记录阶段、不继续处理，
+        视频不会进入归档，下次更新时重新转录。
+        """
+        if job.raw_text.strip() and (job.transcript_cached or job.reached(JobStage.TRANSCRIBED)):
+            return job
+        job.raw_text, job.segments = self._get_transcription(job.media_file, job.video_id, job.title)
+        if self.should_stop:
+            return None
+        if not job.raw_text.strip():
+            self._log(f"[-] {job.tag} 转录结果为空，跳过该视频: {job.title or job.video_id}")
+            return None
+        self._checkpoint(job, JobStage.TRANSCRIBED, transcript=job.raw_text)
+        return job
+    
+    def _stage_analyze(self, job):
+        """流水线阶段：按需提取关键帧并请求 AI 分析"""
+        if job.reached(JobStage.ANALYZED) and job.final_data:
+            return job
+        
+        frames = self._request_frames(job) if self._frames_required() else []
+        
+        if self.should_stop:
+            return None
+        
+        ai_summary = self._analyze_with_ollama(job, frames)
+        
+        if ai_summary:
+            job.final_data = f"【视频标题】：{job.title} 。【视频链接】：{job.video_url} 。【详细分析总结】：{ai_summary}"
+        else:
+            self._log("[*] 使用 Whisper 识别的文本作为回退方案...")
+            job.final_data = f"【视频标题】：{job.title} 。【视频链接】：{job.video_url} 。【详细内容】：{self._smart_truncate(job.raw_text, 3000)}"
+        
+        self._checkpoint(job, JobStage.ANALYZED, document=job.final_data)
+        return job
+    
+    def _stage_upload(self, job):
+        """流水线阶段：写入本地索引、上传到 Dify 并清理临时文件"""
+        chunks = self._transcript_chunks(job)
+        self._index_locally(job, chunks)
+        
+        if not job.reached(JobStage.UPLOADED):
+            if not self._upload_to_dify(self._build_documents(job, chunks), job):
+                return None
+            self._checkpoint(job, JobStage.UPLOADED)
+        
+        if self.should_stop:
+            return None
+        
+        self._cleanup_video(job.video_id, job.media_file, job.frames_dir)
+        self._checkpoint(job, JobStage.CLEANED, media_file=None)
+        self.archive.add(self.PLATFORM, job.video_id)
+        return job
+    
+    def _transcript_chunks(self, job, max_tokens=None):
+        """
+        把转录按 token 预算切成带时间范围的片段
+
+        从任务状态表恢复的任务没有分段信息，此时从转录缓存中读取；
+        缓存中也没有时退回按纯文本切分。
+        """
+        if not job.segments and job.raw_text:
+            cached = self._get_cached_transcript(job.video_id)
+            if cached and cached.get('text') == job.raw_text:
+                job.segments = cached.get('segments', [])
+        
+        if max_tokens is None:
+            max_tokens = self.config_manager.get_chunk_tokens() if self.config_manager else 400
+        if job.segments:
+            return chunk_segments(job.segments, max_tokens)
+        return chunk_text(job.raw_text, max_tokens)
+    
+    def _build_documents(self, job, chunks):
+        """
+        生成上传到 Dify 的文档：一篇视频总结，加上每个转录片段各一篇
+
+        有时间信息的片段带时间范围和时间点链接，没有时只写原视频链接。
+        """
+        documents = [(job.title, job.final_data)]
+        for chunk in chunks:
+            if chunk.has_time:
+                content = (f"【视频标题】：{job.title} 。【片段时间】：{chunk.time_range} 。"
+                           f"【片段链接】：{chunk.link(job.video_url)} 。【内容】：{chunk.text}")
             else:
-                self._log("[*] 使用 Whisper 识别的文本作为回退方案...")
-                final_data = f"【视频标题】：{v_title} 。【视频链接】：{video_url} 。【详细内容】：{self._smart_truncate(raw_text, 3000)}"
-            
-            # 检查是否应该停止
-            if self.should_stop:
-                self._log("[!] 任务已停止")
-                return
-            
-            self._upload_to_dify(v_title, final_data)
-            
-            # 检查是否应该停止
-            if self.should_stop:
-                self._log("[!] 任务已停止")
-                return
-            
-            self._cleanup_video(video_id, v_file, f_dir)
-            
+                content = f"【视频标题】：{job.title} 。【视频链接】：{job.video_url} 。【内容】：{chunk.text}"
+            documents.append((f"{job.title} [{chunk.label}]", content))
+        return documents
+    
+    def _index_locally(self, job, chunks):
+        """把总结和转录片段写入本地检索索引，已索引过的视频不重复写入"""
+        if self.local_index is None:
+            return
+        
+        doc_id = f"{self.PLATFORM}:{job.video_id}"
+        if job.reached(JobStage.UPLOADED) and self.local_index.has_document(doc_id):
+            return
+        
+        try:
+            texts = [job.final_data] + [(chunk.text, chunk.link(job.video_url)) for chunk in chunks]
+            count = self.local_index.add_document(doc_id, job.title, texts, job.video_url)
+            self._log(f"[√] 已写入本地索引 {count} 个片段: {job.title}")
         except Exception as e:
-            self._log(f"[-] 处理视频异常: {e}")
+            self._log(f"[-] 写入本地索引失败: {e}")
     
-    def _find_video_file(self, video_id):
-        """查找视频文件"""
-        for ext in ['.mp4', '.mkv', '.webm']:
+    def _find_media_file(self, video_id, exts=None):
+        """查找下载的媒体文件"""
+        for ext in exts or self.VIDEO_EXTS + self.AUDIO_EXTS:
             v_file = self.temp_dir / f"{video_id}{ext}"
             if v_file.exists():
                 return v_file
         return None
     
-    def _get_transcription(self, video_path, video_id):
-        """获取视频转录文本"""
+    def _transcript_keys(self):
+        """可接受的转录缓存键：当前 Whisper 模型参数优先，其次是平台字幕"""
+        keys = []
+        if self.whisper_service:
+            keys.append(self.whisper_service.model_key(self.TRANSCRIBE_OPTIONS))
+        keys.append(self.SUBTITLE_KEY)
+        return keys
+    
+    def _get_cached_transcript(self, video_id, audio_hash=None):
+        """查询转录缓存"""
+        if not self.transcript_cache:
+            return None
+        try:
+            return self.transcript_cache.get(video_id, self._transcript_keys(), audio_hash)
+        except Exception as e:
+            self._log(f"[-] 读取转录缓存失败: {e}")
+            return None
+    
+    def _save_transcript(self, video_id, model_key, text, segments, title, audio_hash=''):
+        """写入转录缓存（文本和带时间的分段），空文本不缓存"""
+        if not self.transcript_cache or not text:
+            return
+        try:
+            payload = {'text': text, 'segments': segments}
+            self.transcript_cache.put(video_id, model_key, payload, audio_hash, title)
+        except Exception as e:
+            self._log(f"[-] 写入转录缓存失败: {e}")
+    
+    def _get_transcription(self, video_path, video_id, title=''):
+        """
+        获取视频转录
+
+        Returns:
+            tuple: (转录文本, 带时间的分段列表)
+        """
         for f in self.temp_dir.iterdir():
             if f.name.startswith(video_id) and f.name.endswith(".vtt"):
                 with open(f, 'r', encoding='utf-8') as file:
-                    return " ".join([
-                        l.strip() for l in file 
-                        if "-->" not in l and not l.strip().isdigit() and "WEBVTT" not in l
-                    ])
-        
-        audio_path = video_path.with_suffix('.mp3')
-        self._log("[*] Whisper 正在识别长音频内容...")
+                    segments = parse_vtt(file.read())
+                text = " ".join(s['text'] for s in segments)
+                if text.strip():
+                    self._save_transcript(video_id, self.SUBTITLE_KEY, text, segments, title)
+                    return text, segments
         
         try:
-            subprocess.run([
-                'ffmpeg', '-i', str(video_path), '-ar', '16000', '-ac', '1',
-                '-c:a', 'libmp3lame', '-y', str(audio_path)
-            ], stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+            audio = decode_audio(video_path)
             
             if self.should_stop:
                 self._log("[!] 任务已停止（Whisper调用前）")
-                return ""
+                return "", []
             
-            if self.whisper_model:
-                import threading
-                
-                segments_result = []
-                transcribe_complete = threading.Event()
-                
-                def transcribe_worker():
-                    try:
-                        segments, _ = self.whisper_model.transcribe(str(audio_path), beam_size=5)
-                        segments_result.extend(segments)
-                    except Exception as e:
-                        self._log(f"[-] Whisper transcribe 异常: {e}")
-                    finally:
-                        transcribe_complete.set()
-                
-                thread = threading.Thread(target=transcribe_worker)
-                thread.daemon = True
-                thread.start()
-                
-                while thread.is_alive():
-                    if self.should_stop:
-                        self._log("[!] 任务已停止（Whisper执行中）")
-                        break
-                    thread.join(timeout=0.5)
-                
-                if self.should_stop:
-                    transcribe_complete.set()
-                    return ""
-                
-                transcribe_complete.wait()
-                text = " ".join([s.text for s in segments_result])
-            else:
-                text = ""
+            if not self.whisper_service or audio.size == 0:
+                return "", []
             
-            if audio_path.exists():
-                audio_path.unlink()
+            audio_hash = audio_fingerprint(audio)
+            cached = self._get_cached_transcript(video_id, audio_hash)
+            if cached and cached.get('text', '').strip():
+                self._log("[√] 命中转录缓存，跳过 Whisper")
+                return cached.get('text', ''), cached.get('segments', [])
             
-            return text
+            self._log("[*] Whisper 正在识别长音频内容...")
+            future = self.whisper_service.submit(
+                audio, should_stop=lambda: self.should_stop, **self.TRANSCRIBE_OPTIONS
+            )
+            
+            while not future.done():
+                if self.should_stop:
+                    self._log("[!] 任务已停止（Whisper执行中）")
+                    return "", []
+                wait([future], timeout=0.5)
+            
+            try:
+                segments_result = future.result()
+            except Exception as e:
+                self._log(f"[-] Whisper transcribe 异常: {e}")
+                segments_result = []
+            
+            # 被停止时结果不完整、识别失败时结果为空，都不写入缓存
+            segments = segments_from_whisper(segments_result)
+            text = " ".join(s['text'] for s in segments)
+            if text.strip() and not self.should_stop:
+                self._save_transcript(
+                    video_id, self.whisper_service.model_key(self.TRANSCRIBE_OPTIONS),
+                    text, segments, title, audio_hash
+                )
+            return text, segments
         except Exception as e:
             self._log(f"[-] 语音转文字失败: {e}")
-            return ""
+            return "", []
     
     def _extract_keyframes(self, video_path, output_dir):
         """提取关键帧"""
@@ -267,52 +537,25 @@ class BilibiliPlaylistHandler(BasePlatformHandler):
             self._log(f"[-] 提取关键帧失败: {e}")
             return []
     
-    def _analyze_with_ollama(self, title, url, text_data, frames):
-        """使用AI模型进行分析"""
+    def _analyze_with_ollama(self, job, frames):
+        """
+        使用AI模型进行分析
+
+        map_reduce 模式下长转录先分段摘要再合并，single 模式下截断后一次生成。
+        """
         self._log("[*] 正在请求 AI 进行深度详细分析...")
         
         try:
-            prompt = f"""任务：请根据以下视频资料，写一份非常详细的中文笔记。
-要求：
-1. 包含详细的视频背景摘要（200字）。
-2. 列出视频中的关键知识点或核心情节。
-3. 总结视频的最终价值。
-
-视频信息：
-标题：{title}
-URL：{url}
-内容：{self._smart_truncate(text_data, 2000)}
-"""
-            
-            # 直接使用通义千问模型，不依赖配置
-            provider = "qwen"
-            model_config = get_model_config(provider)
-            
-            self._log(f"[*] 使用模型供应商: {provider}")
-            self._log(f"[*] 使用模型: {model_config['model_name']}")
-            
-            # 通义千问 API
-            qwen_url = f"{model_config['base_url']}/services/aigc/text-generation/generation"
-            payload = {
-                "model": model_config['model_name'],
-                "input": prompt,
-                "parameters": {
-                    "temperature": 0.7,
-                    "max_tokens": 2000
-                }
-            }
-            
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {model_config['api_key']}"
-            }
-            
-            res = requests.post(qwen_url, json=payload, headers=headers, timeout=300)
-            if res.status_code == 200:
-                response_json = res.json()
-                ai_res = response_json.get("output", {}).get("text", "").strip()
+            if self._summary_mode() == "map_reduce":
+                max_tokens = self.config_manager.get_summary_chunk_tokens() if self.config_manager else 2000
+                chunks = self._transcript_chunks(job, max_tokens)
+                ai_res = self.summarizer.summarize(job.title, job.video_url, chunks)
             else:
-                ai_res = ""
+                prompt = MapReduceSummarizer.NOTE_PROMPT.format(
+                    title=job.title, url=job.video_url, label="内容",
+                    content=self._smart_truncate(job.raw_text, 2000)
+                )
+                ai_res = self._generate(prompt)
             
             if not ai_res:
                 return ""
@@ -322,52 +565,133 @@ URL：{url}
             self._log(f"[-] AI 分析失败: {e}")
             return ""
     
-    def _upload_to_dify(self, title, content):
-        """上传到Dify知识库"""
-        if not content:
-            return
+    def _summary_mode(self):
+        return self.config_manager.get_summary_mode() if self.config_manager else "single"
+    
+    def _create_llm_client(self):
+        """按配置创建分析使用的模型客户端：本地 Ollama 吞吐量高，远程 API 质量更好"""
+        cm = self.config_manager
+        provider = cm.get_analysis_provider() if cm else "qwen"
+        model = cm.get_analysis_model() if cm else ""
+        return create_client(provider, cm, model)
+    
+    def _generate(self, prompt, max_tokens=2000):
+        """
+        请求模型生成文本
         
-        safe_content = content[:3500]
+        Returns:
+            str: 生成的文本，请求失败时返回空字符串
+        """
+        client = self.llm_client
+        params = {"temperature": 0.7, "max_tokens": max_tokens}
         
-        self._log(f"[*] 正在同步至 Dify... 长度: {len(safe_content)} 字符")
+        if self.llm_cache:
+            cached = self.llm_cache.get(client.name, client.model, prompt, params)
+            if cached:
+                return cached
         
-        dify_base_url = "http://localhost/v1"
-        dataset_api = self.config_manager.get_dataset_api()
-        dataset_id = self.config_manager.get_dataset_id()
+        try:
+            text = client.generate(prompt, **params)
+        except LLMError as e:
+            self._log(f"[-] 模型请求失败: {e}")
+            return ""
         
-        url = f"{dify_base_url}/datasets/{dataset_id}/document/create-by-text"
-        headers = {
-            "Authorization": f"Bearer {dataset_api}",
-            "Content-Type": "application/json"
-        }
+        if self.llm_cache and text:
+            self.llm_cache.put(client.name, client.model, prompt, text, params)
+        return text
+    
+    def _report_llm_cache(self):
+        """在更新日志中输出本次运行的模型响应缓存命中率"""
+        if not self.llm_cache:
+            return
+        stats = self.llm_cache.stats()
+        total = stats['hits'] + stats['misses']
+        if total:
+            self._log(f"[*] LLM 缓存命中 {stats['hits']}/{total}（{stats['hit_rate']:.0%}）")
+    
+    def _create_summarizer(self):
+        """创建本次运行共用的分层摘要器，分段摘要的并发上限对所有视频生效"""
+        self._log(f"[*] 使用模型供应商: {self.llm_client.name}")
+        self._log(f"[*] 使用模型: {self.llm_client.model}")
+        return MapReduceSummarizer(
+            self._generate,
+            model_key=f"{self.llm_client.name}:{self.llm_client.model}",
+            cache=self.summary_cache,
+            workers=self.config_manager.get_summary_workers() if self.config_manager else 2,
+            log_callback=self._log,
+            should_stop=lambda: self.should_stop
+        )
+    
+    def _create_uploader(self):
+        """创建本次运行使用的 Dify 批量上传器"""
+        cm = self.config_manager
+        return DifyBatchUploader(
+            self.DIFY_BASE_URL,
+            cm.get_dataset_id() if cm else "",
+            cm.get_dataset_api() if cm else "",
+            concurrency=cm.get_upload_workers() if cm else 2,
+            rate_per_second=cm.get_dify_rate_limit() if cm else 2.0,
+            log_callback=self._log,
+            should_stop=lambda: self.should_stop
+        )
+    
+    def _upload_to_dify(self, documents, job=None):
+        """
+        上传到Dify知识库
+
+        传入 job 时，任务状态表中记录过的文档会被跳过，本次上传成功的文档也会逐篇记录，
+        部分失败后继续处理不会在知识库中重复创建已上传的文档。
+
+        Args:
+            documents: [(标题, 内容)]，内容为空的文档会被跳过
+            job: 文档所属的视频任务
+
+        Returns:
+            bool: 全部文档都已成功提交时返回 True
+        """
+        documents = [(title, content[:3500]) for title, content in documents if content]
+        if not documents:
+            return False
         
-        data = {
-            "name": title,
-            "text": safe_content,
-            "indexing_technique": "high_quality",
-            "process_rule": {
-                "mode": "custom",
-                "rules": {
-                    "pre_processing_rules": [
-                        {"id": "remove_extra_spaces", "enabled": True},
-                        {"id": "remove_urls_emails", "enabled": False}
-                    ],
-                    "segmentation": {
-                        "separator": "\\n\\n",
-                        "max_tokens": 4000
-                    }
-                }
-            }
-        }
+        if job and self.job_store:
+            uploaded = self.job_store.uploaded_titles(self.PLATFORM, job.video_id)
+            remaining = [(title, content) for title, content in documents if title not in uploaded]
+            if len(remaining) < len(documents):
+                self._log(f"[*] 跳过已上传的 {len(documents) - len(remaining)} 个文档")
+                documents = remaining
+                if not documents:
+                    return True
         
-        try:
-            res = requests.post(url, headers=headers, json=data)
-            if res.status_code == 200:
-                self._log(f"[√] 已提交索引请求: {title}")
-            else:
-                self._log(f"[-] 上传失败，状态码: {res.status_code}, 原因: {res.text}")
-        except Exception as e:
-            self._log(f"[-] 连接 Dify 失败: {e}")
+        total_chars = sum(len(content) for _, content in documents)
+        self._log(f"[*] 正在同步至 Dify... {len(documents)} 个文档，共 {total_chars} 字符")
+        results = self.uploader.upload_many(documents)
+        
+        if job and self.job_store:
+            for (title, _), batch in zip(documents, results):
+                if batch is None:
+                    continue
+                try:
+                    self.job_store.record_upload(self.PLATFORM, job.video_id, title, batch)
+                except Exception as e:
+                    self._log(f"[-] 保存上传记录失败: {e}")
+        
+        failed = sum(1 for batch in results if batch is None)
+        if failed:
+            self._log(f"[-] {failed}/{len(documents)} 个文档上传失败")
+        return failed == 0
+    
+    def _report_indexing(self):
+        """统一轮询本次上传文档的索引状态并输出汇总"""
+        self._log("[*] 正在查询 Dify 索引状态...")
+        results = self.uploader.wait_indexed()
+        if not results:
+            return
+        
+        completed = [t for t, status in results.items() if status == "completed"]
+        self._log(f"[√] 索引完成 {len(completed)}/{len(results)} 个文档")
+        for title, status in results.items():
+            if status != "completed":
+                self._log(f"[-] 索引未完成（{status}）: {title}")
     
     def _cleanup_video(self, video_id, v_file, f_dir):
         """清理视频相关临时文件"""
@@ -375,7 +699,7 @@ URL：{url}
             if v_file and v_file.exists():
                 v_file.unlink()
             
-            if f_dir.exists():
+            if f_dir and f_dir.exists():
                 import shutil
                 shutil.rmtree(f_dir)
             
@@ -387,14 +711,7 @@ URL：{url}
     
     def _is_processed(self, video_id):
         """检查视频是否已处理"""
-        if not self.archive_file.exists():
-            return False
-        
-        try:
-            with open(self.archive_file, 'r', encoding='utf-8') as f:
-                return video_id in f.read()
-        except Exception:
-            return False
+        return self.archive.contains(self.PLATFORM, video_id)
     
     def _save_cookie(self, cookie_text, url=None):
         """保存Cookie到文件，支持多种格式自动识别和转换"""
@@ -466,7 +783,7 @@ class KnowledgeUpdater(QObject):
         self.is_running = False
         self.should_stop = False
         self.log_buffer = []
-        self.whisper_model = None
+        self.whisper_service = None
         
         self._init_paths()
     
@@ -480,26 +797,47 @@ class KnowledgeUpdater(QObject):
         
         self.archive_file = self.data_dir / "download_history.txt"
         self.cookies_file = self.data_dir / "cookies.txt"
+        self.transcript_cache = TranscriptCache(self.data_dir / "transcripts.db")
+        self.summary_cache = SummaryCache(self.data_dir / "summaries.db")
+        self.llm_cache = self._create_llm_cache()
+        self.job_store = JobStore(self.data_dir / "ingest_jobs.db")
+        self.playlist_scanner = PlaylistScanner(self.data_dir / "playlist_state.json", self.cookies_file, self._log)
         
         self.whisper_path = Path(__file__).parent / "utils" / "whisper"
     
+    def _create_llm_cache(self):
+        """按配置创建模型响应缓存（未启用时返回 None）"""
+        cm = self.config_manager
+        if cm and not cm.get_llm_cache_enabled():
+            return None
+        return LLMCache(
+            self.data_dir / "llm_cache.db",
+            max_bytes=(cm.get_llm_cache_max_mb() if cm else 64) * 1024 * 1024,
+            max_age_days=cm.get_llm_cache_max_age_days() if cm else 30
+        )
+    
     def _init_whisper(self):
-        """初始化Whisper模型"""
+        """获取常驻的Whisper服务，模型只在首次使用时加载"""
+        instances = self.config_manager.get_whisper_instances() if self.config_manager else 0
+        self.whisper_service = get_whisper_service(self.whisper_path, instances=instances)
+        
+        if self.whisper_service.is_loaded:
+            return True
+        
+        if self.whisper_service.ensure_loaded():
+            self._log(f"[√] Whisper 模型加载成功（{self.whisper_service.instances} 个实例）")
+            return True
+        
+        self._log("[-] Whisper 模型加载失败")
+        return False
+    
+    def _get_local_index(self):
+        """打开本地检索索引（未启用时返回 None）"""
         try:
-            os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
-            os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
-            
-            self.whisper_model = WhisperModel(
-                "small",
-                device="cpu",
-                compute_type="int8",
-                download_root=str(self.whisper_path),
-                local_files_only=True
-            )
-            self._log("[√] Whisper 模型加载成功")
+            return open_local_index(self.config_manager, self.data_dir / "local_index")
         except Exception as e:
-            self._log(f"[-] Whisper 模型加载失败: {e}")
-            self.whisper_model = None
+            self._log(f"[-] 打开本地索引失败: {e}")
+            return None
     
     def _log(self, message):
         """记录日志"""
@@ -529,7 +867,13 @@ class KnowledgeUpdater(QObject):
                 self.temp_dir,
                 self.archive_file,
                 self.cookies_file,
-                self.whisper_model
+                self.whisper_service,
+                self.transcript_cache,
+                self.job_store,
+                self.playlist_scanner,
+                self._get_local_index(),
+                self.summary_cache,
+                self.llm_cache
             )
         
         return None
@@ -541,10 +885,8 @@ class KnowledgeUpdater(QObject):
             self._log("[!] 更新任务已在运行中")
             return
         
-        # 初始化Whisper模型
-        self._init_whisper()
-        
-        if not self.whisper_model:
+        # 获取Whisper服务（已加载时不会重复加载）
+        if not self._init_whisper():
             self._log("[-] Whisper 模型未加载，无法启动更新")
             return
         
@@ -597,6 +939,7 @@ class KnowledgeUpdater(QObject):
                     import time
                     time.sleep(0.1)
                 thread.join()
+                self._log(f"[*] 连接池统计: {get_http_pool().format_stats()}")
             
         except Exception as e:
             self._log(f"[-] 更新过程发生错误: {e}")
@@ -623,6 +966,12 @@ class KnowledgeUpdater(QObject):
         """获取日志"""
         return "\n".join(self.log_buffer)
     
+    @Slot(result='QVariantMap')
+    def get_scan_diff(self):
+        """获取当前配置的播放列表最近一次扫描的变化"""
+        url = self.config_manager.get_knowledge_url() if self.config_manager else ""
+        return self.playlist_scanner.diff_since_last_scan(url)
+    
     @Slot(result=bool)
     def is_running_status(self):
         """检查是否正在运行"""
@@ -0,0 +1,214 @@
+from typing import Any, Dict, List, Optional
+from PySide6.QtCore import QAbstractListModel, QByteArray, QModelIndex, Qt, Property, Signal, Slot
+from markdown_formatter import FORMATTER_VERSION, MarkdownFormatter
+from logger_config import get_logger
+
+logger = get_logger('list_models')
+
+
+class DictListModel(QAbstractListModel):
+    """
+    以字典列表为数据源的列表模型
+
+    每个角色对应字典中的一个字段，子类通过 FIELDS 声明字段名。
+    增删改只通知受影响的行，QML 不需要重新构建整个列表。
+    """
+
+    FIELDS: tuple = ()
+    KEY = 'id'
+
+    countChanged = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[Dict[str, Any]] = []
+        self._roles = {Qt.UserRole + i + 1: field for i, field in enumerate(self.FIELDS)}
+        self._role_of = {field: role for role, field in self._roles.items()}
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._rows):
+            return None
+        field = self._roles.get(role)
+        if field is None:
+            return None
+        return self._rows[index.row()].get(field)
+
+    def roleNames(self):
+        return {role: QByteArray(field.encode('utf-8')) for role, field in self._roles.items()}
+
+    @Property(int, notify=countChanged)
+    def count(self):
+        return len(self._rows)
+
+    def row_of(self, key) -> int:
+        for row, item in enumerate(self._rows):
+            if item.get(self.KEY) == key:
+                return row
+        return -1
+
+    def reset(self, rows: List[Dict[str, Any]]):
+        """整体替换数据（切换对话等场景）"""
+        self.beginResetModel()
+        self._rows = list(rows)
+        self.endResetModel()
+        self.countChanged.emit()
+
+    def insert(self, row: int, items: List[Dict[str, Any]]):
+        if not items:
+            return
+        self.beginInsertRows(QModelIndex(), row, row + len(items) - 1)
+        self._rows[row:row] = items
+        self.endInsertRows()
+        self.countChanged.emit()
+
+    def remove(self, key) -> bool:
+        row = self.row_of(key)
+        if row < 0:
+            return False
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        self.endRemoveRows()
+        self.countChanged.emit()
+        return True
+
+    def update(self, row: int, changes: Dict[str, Any]):
+        """更新某一行的部分字段，只对发生变化的角色发出 dataChanged"""
+        item = self._rows[row]
+        roles = [self._role_of[k] for k, v in changes.items() if k in self._role_of and item.get(k) != v]
+        item.update(changes)
+        if roles:
+            index = self.index(row, 0)
+            self.dataChanged.emit(index, index, roles)
+
+    def move_to_top(self, row: int):
+        if row <= 0:
+            return
+        self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), 0)
+        self._rows.insert(0, self._rows.pop(row))
+        self.endMoveRows()
+
+
+class ConversationListModel(DictListModel):
+    """侧边栏对话列表，按更新时间倒序，只包含已有标题的对话"""
+
+    FIELDS = ('id', 'title', 'updated_at')
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+
+    def reload(self):
+        self.reset(self.db.get_conversation_list())
+
+    def upsert(self, conversation: Dict[str, Any]):
+        """
+        写入一条对话的最新元数据
+
+        对话更新时间总是最新的，因此插入或移动到列表顶部；
+        标题为空的对话不在列表中显示。
+        """
+        if not conversation.get('title'):
+            self.remove(conversation['id'])
+            return
+
+        item = {field: conversation.get(field) for field in self.FIELDS}
+        row = self.row_of(item['id'])
+        if row < 0:
+            self.insert(0, [item])
+            return
+        self.move_to_top(row)
+        self.update(0, item)
+
+
+class MessageListModel(DictListModel):
+    """
+    当前对话的消息列表
+
+    只加载最新一页消息，更早的消息通过 fetch_older 按页插入到列表开头。
+    助手消息的 HTML 通过 html 角色提供：优先使用消息表中与当前格式化器版本一致的缓存，
+    缺失或过期时渲染一次并写回，滚动和切换对话不会重复渲染。
+    """
+
+    FIELDS = ('id', 'role', 'content', 'timestamp', 'html')
+
+    hasOlderChanged = Signal()
+
+    def __init__(self, db, page_size: int = 50, formatter: Optional[MarkdownFormatter] = None, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.page_size = page_size
+        self.formatter = formatter or MarkdownFormatter()
+        self._conversation_id: Optional[str] = None
+        self._has_older = False
+
+    @Property(bool, notify=hasOlderChanged)
+    def has_older(self):
+        return self._has_older
+
+    def _set_has_older(self, value: bool):
+        if self._has_older != value:
+            self._has_older = value
+            self.hasOlderChanged.emit()
+
+    @property
+    def conversation_id(self) -> Optional[str]:
+        return self._conversation_id
+
+    def render_html(self, role: str, content: str) -> Optional[str]:
+        """渲染助手消息的 HTML，其他角色按纯文本显示，返回 None"""
+        if role != 'assistant':
+            return None
+        return self.formatter.format(content)
+
+    def _with_html(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """为消息填充 html 字段，渲染缓存缺失或过期的消息并批量写回"""
+        stale = []
+        for message in messages:
+            cached = message.pop('rendered_html', None)
+            version = message.pop('render_version', 0)
+            if message['role'] != 'assistant':
+                message['html'] = ''
+            elif cached is not None and version == FORMATTER_VERSION:
+                message['html'] = cached
+            else:
+                message['html'] = self.render_html(message['role'], message['content'])
+                stale.append((message['id'], message['html'], FORMATTER_VERSION))
+        if stale:
+            try:
+                self.db.save_rendered_html(stale)
+            except Exception as e:
+                logger.error(f"保存消息渲染缓存失败: {e}")
+        return messages
+
+    def load(self, conversation_id: Optional[str]):
+        """切换到指定对话，加载最新一页消息"""
+        self._conversation_id = conversation_id
+        messages = self.db.get_messages_page(conversation_id, None, self.page_size) if conversation_id else []
+        self.reset(self._with_html(messages))
+        self._set_has_older(len(messages) == self.page_size)
+
+    @Slot(result=int)
+    def fetch_older(self) -> int:
+        """
+        加载更早的一页消息并插入到列表开头
+
+        Returns:
+            int: 新插入的消息数
+        """
+        if not self._conversation_id or not self._has_older or not self._rows:
+            return 0
+        messages = self.db.get_messages_page(self._conversation_id, self._rows[0]['id'], self.page_size)
+        self.insert(0, self._with_html(messages))
+        self._set_has_older(len(messages) == self.page_size)
+        return len(messages)
+
+    def append_message(self, conversation_id: str, message: Dict[str, Any]):
+        """追加一条新消息，不属于当前对话时忽略"""
+        if conversation_id != self._conversation_id:
+            return
+        self.insert(len(self._rows), self._with_html([message]))
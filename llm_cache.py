@@ -0,0 +1,174 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+from logger_config import get_logger
+
+logger = get_logger('llm_cache')
+
+_TRAILING_SPACE = re.compile(r'[ \t]+\n')
+_BLANK_LINES = re.compile(r'\n{3,}')
+
+
+def normalize_prompt(prompt: str) -> str:
+    """统一换行、去掉行尾空白和多余空行，排版上的差异不影响缓存命中"""
+    text = prompt.replace('\r\n', '\n').replace('\r', '\n')
+    text = _TRAILING_SPACE.sub('\n', text + '\n')
+    return _BLANK_LINES.sub('\n\n', text).strip()
+
+
+def cache_key(provider: str, model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """由供应商、模型、规范化后的提示词和生成参数计算缓存键"""
+    data = json.dumps({
+        'provider': provider,
+        'model': model,
+        'prompt': normalize_prompt(prompt),
+        'params': params or {}
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class LLMCache:
+    """
+    大模型响应缓存
+
+    以 (供应商, 模型, 提示词, 参数) 为键，把生成结果压缩后存入 SQLite。
+    超过保存期限的条目会被删除；总大小超出上限时按最近使用时间淘汰。
+    """
+
+    EVICT_INTERVAL = 50
+
+    def __init__(self, db_path, max_bytes: int = 64 * 1024 * 1024, max_age_days: float = 30):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._hits = 0
+        self._misses = 0
+        self._puts = 0
+        self._initialize_database()
+        self.evict()
+
+    def _initialize_database(self):
+        with self._lock:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    cache_key TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    response BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses(last_used)"
+            )
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def get(self, provider: str, model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        查询缓存
+
+        Returns:
+            str: 缓存的生成结果，未命中或已过期返回 None
+        """
+        key = cache_key(provider, model, prompt, params)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created_at FROM llm_responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if not row or (self.max_age and now - row[1] > self.max_age):
+                self._misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE llm_responses SET last_used = ? WHERE cache_key = ?", (now, key)
+            )
+            self._connection.commit()
+            self._hits += 1
+
+        try:
+            return zlib.decompress(row[0]).decode('utf-8')
+        except Exception as e:
+            logger.error(f"LLM 缓存解析失败 {key}: {e}")
+            return None
+
+    def put(self, provider: str, model: str, prompt: str, response: str,
+            params: Optional[Dict[str, Any]] = None) -> None:
+        """写入缓存（同键覆盖），空结果不缓存"""
+        if not response:
+            return
+        key = cache_key(provider, model, prompt, params)
+        blob = zlib.compress(response.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            self._connection.execute('''
+                INSERT OR REPLACE INTO llm_responses
+                (cache_key, provider, model, response, size, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (key, provider, model, blob, len(blob), now, now))
+            self._connection.commit()
+            self._puts += 1
+            due = self._puts % self.EVICT_INTERVAL == 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        淘汰过期条目，并在总大小超出上限时删除最久未使用的条目
+
+        Returns:
+            int: 删除的条目数
+        """
+        with self._lock:
+            removed = 0
+            if self.max_age:
+                removed += self._connection.execute(
+                    "DELETE FROM llm_responses WHERE created_at < ?", (time.time() - self.max_age,)
+                ).rowcount
+
+            total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+            if self.max_bytes and total > self.max_bytes:
+                stale = []
+                for key, size in self._connection.execute(
+                    "SELECT cache_key, size FROM llm_responses ORDER BY last_used"
+                ):
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                self._connection.executemany("DELETE FROM llm_responses WHERE cache_key = ?", stale)
+                removed += len(stale)
+
+            self._connection.commit()
+        if removed:
+            logger.info(f"LLM 缓存淘汰 {removed} 条")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """返回自上次 reset_stats 以来的命中统计"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / total if total else 0.0
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
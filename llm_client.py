@@ -0,0 +1,289 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+import requests
+from config.model_config import get_model_config
+from http_pool import HttpPool, get_http_pool
+from logger_config import get_logger
+
+logger = get_logger('llm_client')
+
+
+class LLMError(Exception):
+    """模型请求失败（重试后仍失败或响应无法解析）"""
+
+
+class LLMProvider:
+    """
+    大模型供应商基类
+
+    所有请求都通过共享连接池发送。429/5xx 和连接失败按指数退避重试；
+    读取超时时服务端可能仍在生成，重试会重复一次生成，因此直接报错。
+    流式请求只在收到第一段内容之前重试。
+    异步接口在线程中执行同步请求，与同步接口共用连接池和重试逻辑。
+
+    子类实现 _build_request、_parse_response 和 _parse_stream_line。
+    """
+
+    name = ''
+    RETRY_STATUS = HttpPool.RETRY_STATUS
+
+    def __init__(self, base_url: str, model: str, api_key: str = '',
+                 timeout: Tuple[float, float] = (10, 300), retries: int = 2,
+                 backoff_factor: float = 1.0, pool: Optional[HttpPool] = None):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool = pool or get_http_pool()
+
+    def _build_request(self, prompt: str, params: Dict[str, Any], stream: bool) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """返回 (请求地址, 请求头, 请求体)"""
+        raise NotImplementedError
+
+    def _parse_response(self, data: Dict[str, Any]) -> str:
+        raise NotImplementedError
+
+    def _parse_stream_line(self, line: str) -> Optional[str]:
+        """解析流式响应的一行，返回新增文本，没有内容时返回 None"""
+        raise NotImplementedError
+
+    def _post(self, prompt: str, params: Dict[str, Any], stream: bool) -> requests.Response:
+        url, headers, payload = self._build_request(prompt, params, stream)
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff_factor * (2 ** (attempt - 1)))
+            try:
+                res = self.pool.post(url, json=payload, headers=headers, timeout=self.timeout, stream=stream)
+            except requests.ReadTimeout as e:
+                raise LLMError(f"{self.name} 响应超时: {e}")
+            except requests.ConnectionError as e:
+                # 包括 ConnectTimeout；连接池已先重试过连接失败，这里再按退避重试
+                last_error = e
+                logger.warning(f"{self.name} 请求失败（第 {attempt + 1} 次）: {e}")
+                continue
+
+            if res.status_code == 200:
+                return res
+            last_error = LLMError(f"{self.name} 返回 HTTP {res.status_code}: {res.text[:200]}")
+            res.close()
+            if res.status_code not in self.RETRY_STATUS:
+                break
+            logger.warning(f"{self.name} 返回 HTTP {res.status_code}（第 {attempt + 1} 次）")
+        raise last_error if isinstance(last_error, LLMError) else LLMError(f"{self.name} 请求失败: {last_error}")
+
+    def generate(self, prompt: str, **params: Any) -> str:
+        """
+        生成文本
+
+        Args:
+            prompt: 提示词
+            **params: temperature、max_tokens 等通用生成参数
+
+        Returns:
+            str: 生成的文本
+        """
+        res = self._post(prompt, params, stream=False)
+        try:
+            return (self._parse_response(res.json()) or '').strip()
+        except ValueError as e:
+            raise LLMError(f"{self.name} 响应解析失败: {e}")
+
+    def stream(self, prompt: str, **params: Any) -> Iterator[str]:
+        """流式生成文本，逐段返回新增内容"""
+        res = self._post(prompt, params, stream=True)
+        try:
+            for raw in res.iter_lines():
+                if not raw:
+                    continue
+                text = self._parse_stream_line(raw.decode('utf-8', errors='replace'))
+                if text:
+                    yield text
+        finally:
+            res.close()
+
+    async def agenerate(self, prompt: str, **params: Any) -> str:
+        return await asyncio.to_thread(self.generate, prompt, **params)
+
+    async def astream(self, prompt: str, **params: Any) -> AsyncIterator[str]:
+        """异步流式生成：在线程中读取流，通过队列交给事件循环"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for text in self.stream(prompt, **params):
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, text)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        worker = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+            await asyncio.shield(worker)
+
+    @staticmethod
+    def _sse_data(line: str) -> Optional[str]:
+        """取出 SSE 的 data 字段，其余行返回 None"""
+        if not line.startswith('data:'):
+            return None
+        data = line[5:].strip()
+        return None if data == '[DONE]' else data
+
+
+class OllamaProvider(LLMProvider):
+    """Ollama 本地模型（/api/generate）"""
+
+    name = 'ollama'
+
+    def _build_request(self, prompt, params, stream):
+        options = {}
+        if 'temperature' in params:
+            options['temperature'] = params['temperature']
+        if 'max_tokens' in params:
+            options['num_predict'] = params['max_tokens']
+        payload = {"model": self.model, "prompt": prompt, "stream": stream, "options": options}
+        return f"{self.base_url}/generate", {"Content-Type": "application/json"}, payload
+
+    def _parse_response(self, data):
+        return data.get("response", "")
+
+    def _parse_stream_line(self, line):
+        return json.loads(line).get("response")
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """OpenAI 兼容接口（/chat/completions），DeepSeek 等同样适用"""
+
+    name = 'openai'
+
+    def _build_request(self, prompt, params, stream):
+        payload = {"model": self.model, "messages": [{"role": "user", "content": prompt}], "stream": stream}
+        payload.update({k: v for k, v in params.items() if k in ('temperature', 'max_tokens')})
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return f"{self.base_url}/chat/completions", headers, payload
+
+    def _parse_response(self, data):
+        choices = data.get("choices") or [{}]
+        return choices[0].get("message", {}).get("content", "")
+
+    def _parse_stream_line(self, line):
+        data = self._sse_data(line)
+        if not data:
+            return None
+        choices = json.loads(data).get("choices") or [{}]
+        return choices[0].get("delta", {}).get("content")
+
+
+class AnthropicProvider(LLMProvider):
+    """Anthropic Messages API（/messages）"""
+
+    name = 'anthropic'
+    API_VERSION = '2023-06-01'
+
+    def _build_request(self, prompt, params, stream):
+        payload = {
+            "model": self.model,
+            "max_tokens": params.get('max_tokens', 2000),
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": stream
+        }
+        if 'temperature' in params:
+            payload['temperature'] = params['temperature']
+        headers = {
+            "Content-Type": "application/json",
+            "x-api-key": self.api_key,
+            "anthropic-version": self.API_VERSION
+        }
+        return f"{self.base_url}/messages", headers, payload
+
+    def _parse_response(self, data):
+        return "".join(block.get("text", "") for block in data.get("content", []) if block.get("type") == "text")
+
+    def _parse_stream_line(self, line):
+        data = self._sse_data(line)
+        if not data:
+            return None
+        event = json.loads(data)
+        if event.get("type") == "content_block_delta":
+            return event.get("delta", {}).get("text")
+        return None
+
+
+class DashScopeProvider(LLMProvider):
+    """通义千问 DashScope 文本生成接口"""
+
+    name = 'qwen'
+
+    def _build_request(self, prompt, params, stream):
+        parameters = {k: v for k, v in params.items() if k in ('temperature', 'max_tokens')}
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"}
+        if stream:
+            headers["X-DashScope-SSE"] = "enable"
+            parameters["incremental_output"] = True
+        payload = {"model": self.model, "input": {"prompt": prompt}, "parameters": parameters}
+        return f"{self.base_url}/services/aigc/text-generation/generation", headers, payload
+
+    def _parse_response(self, data):
+        return data.get("output", {}).get("text", "")
+
+    def _parse_stream_line(self, line):
+        data = self._sse_data(line)
+        if not data:
+            return None
+        return json.loads(data).get("output", {}).get("text")
+
+
+PROVIDERS = {
+    'ollama': OllamaProvider,
+    'openai': OpenAICompatibleProvider,
+    'deepseek': OpenAICompatibleProvider,
+    'anthropic': AnthropicProvider,
+    'qwen': DashScopeProvider,
+}
+
+
+def create_client(provider: str, config_manager=None, model: str = '', **kwargs: Any) -> LLMProvider:
+    """
+    按供应商名称创建客户端
+
+    地址、模型名和密钥优先读取设置页中的配置，未设置时使用 config/model_config.py 的默认值。
+
+    Args:
+        provider: 供应商名称，见 PROVIDERS
+        config_manager: 配置管理器
+        model: 指定模型名，为空时使用供应商配置的模型
+        **kwargs: 透传给 LLMProvider 的超时、重试等参数
+    """
+    if provider not in PROVIDERS:
+        raise ValueError(f"不支持的模型供应商: {provider}")
+
+    defaults = get_model_config(provider)
+    settings = {}
+    for key in ('base_url', 'model_name', 'api_key'):
+        getter = getattr(config_manager, f"get_{provider}_{key}", None) if config_manager else None
+        settings[key] = (getter() if getter else '') or defaults.get(key, '')
+
+    client = PROVIDERS[provider](settings['base_url'], model or settings['model_name'], settings['api_key'], **kwargs)
+    client.name = provider
+    return client
@@ -0,0 +1,622 @@
+import hashlib
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+from http_pool import get_http_pool
+from logger_config import get_logger
+
+logger = get_logger('local_index')
+
+_TOKEN_PATTERN = re.compile(r'[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+_SENTENCE_END = re.compile(r'(?<=[。！？!?；;\n])')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    检索分词：英文和数字按单词切分，中文按相邻两字（bigram）切分
+
+    中文不做词典分词，bigram 对标题、术语等短语的召回已经足够，
+    且不依赖额外的分词库。
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        word = match.group(0)
+        if word.isascii() or len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+def split_text(text: str, max_chars: int = 500) -> List[str]:
+    """按句子边界把文本切成不超过 max_chars 的片段"""
+    chunks, current = [], ""
+    for sentence in _SENTENCE_END.split(text):
+        if not sentence.strip():
+            continue
+        while len(sentence) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if len(current) + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ""
+        current += sentence
+    if current.strip():
+        chunks.append(current)
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+
+class HashingEmbedder:
+    """
+    哈希特征向量化（确定性的占位实现）
+
+    把检索分词的结果哈希到固定维度并做 L2 归一化，不需要模型即可得到
+    稳定的向量，用于测试和没有本地向量模型时的回退。
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                digest = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+                vectors[row, digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class OllamaEmbedder:
+    """通过本地 Ollama 的 /api/embed 接口生成向量（可在 CPU 上运行）"""
+
+    def __init__(self, url: str, model: str, batch_size: int = 16):
+        self.url = url
+        self.model = model
+        self.batch_size = batch_size
+        self.name = f"ollama:{model}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            res = get_http_pool().post(self.url, json={"model": self.model, "input": batch}, timeout=(10, 120))
+            res.raise_for_status()
+            vectors.extend(res.json().get("embeddings", []))
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+
+class BM25Index:
+    """内存中的 BM25 倒排索引，文档以整数ID标识"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._doc_terms: Dict[int, List[str]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._lengths
+
+    def add(self, doc_id: int, tokens: List[str]):
+        self.remove(doc_id)
+        counts = Counter(tokens)
+        for term, freq in counts.items():
+            self._postings[term][doc_id] = freq
+        self._doc_terms[doc_id] = list(counts)
+        self._lengths[doc_id] = len(tokens)
+        self._total_length += len(tokens)
+
+    def remove(self, doc_id: int):
+        length = self._lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._doc_terms.pop(doc_id, []):
+            del self._postings[term][doc_id]
+            if not self._postings[term]:
+                del self._postings[term]
+
+    def search(self, tokens: List[str], top_k: int) -> List[tuple]:
+        """
+        Returns:
+            list: [(文档ID, 分数)]，按分数降序
+        """
+        count = len(self._lengths)
+        if not count:
+            return []
+        avg_length = self._total_length / count
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokens):
+            docs = self._postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, freq in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * freq * (self.k1 + 1) / (freq + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+class VectorStore:
+    """
+    追加写入的向量文件，按内存映射读取
+
+    向量以 float32 连续存放在一个文件中，第 i 行对应 vector_row 为 i 的片段；
+    检索时用 numpy.memmap 映射整个文件计算余弦相似度，不需要把向量读入内存。
+    替换文档后旧向量留在文件中，由 compact 重写文件回收。
+    """
+
+    COMPACT_BLOCK = 4096
+
+    def __init__(self, path, dim: Optional[int] = None):
+        self.path = Path(path)
+        self.dim = dim
+        self._matrix = None
+        self._rows = 0
+        self._open()
+
+    def _open(self):
+        size = self.path.stat().st_size if self.path.exists() else 0
+        if not self.dim or not size:
+            self._matrix, self._rows = None, 0
+            return
+        self._rows = size // (4 * self.dim)
+        self._matrix = np.memmap(self.path, dtype=np.float32, mode='r', shape=(self._rows, self.dim))
+
+    def __len__(self):
+        return self._rows
+
+    def append(self, vectors: np.ndarray) -> int:
+        """追加一批向量，返回第一行的行号"""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        start = self._rows
+        self._matrix = None
+        with open(self.path, 'ab') as f:
+            f.write(vectors.tobytes())
+        self._open()
+        return start
+
+    def compact(self, rows: np.ndarray):
+        """
+        只保留指定的行并重写文件，rows[i] 成为新文件的第 i 行
+
+        先写入临时文件再替换，分块读取，不会把整个向量文件读入内存。
+        """
+        if self._matrix is None:
+            return
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            for start in range(0, len(rows), self.COMPACT_BLOCK):
+                f.write(np.ascontiguousarray(self._matrix[rows[start:start + self.COMPACT_BLOCK]]).tobytes())
+        # 替换前释放内存映射，否则 Windows 上无法覆盖文件
+        self._matrix = None
+        tmp_path.replace(self.path)
+        self._open()
+
+    def clear(self):
+        self._matrix, self._rows = None, 0
+        if self.path.exists():
+            self.path.unlink()
+
+    def search(self, query: np.ndarray, rows: np.ndarray, top_k: int) -> List[tuple]:
+        """
+        在指定行中按余弦相似度检索
+
+        Args:
+            query: 已归一化的查询向量
+            rows: 参与检索的有效行号
+            top_k: 返回条数
+
+        Returns:
+            list: [(行号, 相似度)]，按相似度降序
+        """
+        if self._matrix is None or not len(rows):
+            return []
+        scores = self._matrix[rows] @ query
+        k = min(top_k, len(rows))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(rows[i]), float(scores[i])) for i in best]
+
+
+class LocalIndex:
+    """
+    本地混合检索索引
+
+    视频的转录和总结文本切片后写入 SQLite，同时建立 BM25 倒排索引和向量索引；
+    查询时分别检索后用倒数排名融合（RRF）合并结果，不依赖 Dify 也能离线检索。
+
+    打开索引时在后台线程中加载，加载完成前检索返回空结果；向量化方式变化后
+    旧向量立即作废，新向量在后台分批生成，期间只使用关键词检索已生成向量的部分。
+    """
+
+    RRF_K = 60
+    EMBED_BATCH = 256
+
+    def __init__(self, index_dir, embedder=None):
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder or HashingEmbedder()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        # 每次重置向量加一，后台生成向量的线程据此判断自己是否已过期
+        self._generation = 0
+        self._connection = sqlite3.connect(str(self.index_dir / "chunks.db"), check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._bm25 = BM25Index()
+        self._chunk_rows: Dict[int, int] = {}
+        self._initialize_database()
+        self._vectors = VectorStore(self.index_dir / "vectors.f32", self._stored_dim())
+        threading.Thread(target=self._load, name="local-index-load", daemon=True).start()
+
+    def _initialize_database(self):
+        with self._lock:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    doc_id TEXT NOT NULL,
+                    title TEXT NOT NULL DEFAULT '',
+                    url TEXT NOT NULL DEFAULT '',
+                    text TEXT NOT NULL,
+                    vector_row INTEGER,
+                    created_at TEXT NOT NULL
+                )
+            ''')
+            self._connection.execute('''
+                CREATE INDEX IF NOT EXISTS idx_chunks_doc_id ON chunks(doc_id)
+            ''')
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS index_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            ''')
+            self._connection.commit()
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._connection.execute("SELECT value FROM index_meta WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._connection.execute("INSERT OR REPLACE INTO index_meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _stored_dim(self) -> Optional[int]:
+        with self._lock:
+            dim = self._get_meta('vector_dim')
+        return int(dim) if dim else None
+
+    def _load(self):
+        """
+        从 SQLite 重建 BM25 索引（后台线程）
+
+        向量文件中的废弃行过多时先压缩；向量化方式与生成向量时不同则作废旧向量并重新生成。
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT id, title, text, vector_row FROM chunks").fetchall()
+            for row in rows:
+                self._bm25.add(row['id'], tokenize(f"{row['title']} {row['text']}"))
+                if row['vector_row'] is not None:
+                    self._chunk_rows[row['id']] = row['vector_row']
+
+            rebuild = self._get_meta('embedder') != self.embedder.name
+            if rebuild:
+                if rows:
+                    logger.info(f"向量化方式变更为 {self.embedder.name}，重新生成 {len(rows)} 个片段的向量")
+                self._reset_vectors()
+            else:
+                self._compact_if_needed()
+            generation = self._generation
+            self._ready.set()
+        logger.info(f"本地索引加载完成，共 {len(rows)} 个片段")
+
+        if rebuild:
+            self._fill_vectors(generation)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待后台加载完成，返回是否已就绪"""
+        return self._ready.wait(timeout)
+
+    def set_embedder(self, embedder):
+        """
+        切换向量化方式：旧向量立即作废，新向量在后台线程中生成
+        """
+        with self._lock:
+            if embedder.name == self.embedder.name:
+                return
+            logger.info(f"向量化方式变更为 {embedder.name}，后台重新生成向量")
+            self.embedder = embedder
+            if not self._ready.is_set():
+                # 加载线程会按新的向量化方式检查并重建
+                return
+            self._reset_vectors()
+            generation = self._generation
+        threading.Thread(target=self._fill_vectors, args=(generation,),
+                         name="local-index-embed", daemon=True).start()
+
+    def _reset_vectors(self):
+        """作废全部向量（调用方持有锁）"""
+        self._generation += 1
+        self._vectors.clear()
+        self._vectors.dim = None
+        self._chunk_rows.clear()
+        self._connection.execute("UPDATE chunks SET vector_row = NULL")
+        self._set_meta('embedder', '')
+        self._set_meta('vector_dim', '')
+        self._connection.commit()
+
+    def _fill_vectors(self, generation: int):
+        """
+        为还没有向量的片段分批生成向量，全部完成后记录当前的向量化方式
+
+        向量在锁外生成，检索和写入不会被整个语料的向量化阻塞；
+        期间向量被再次重置（generation 变化）或索引关闭时放弃。
+        """
+        while True:
+            with self._lock:
+                if generation != self._generation:
+                    return
+                embedder = self.embedder
+                batch = self._connection.execute(
+                    "SELECT id, title, text FROM chunks WHERE vector_row IS NULL ORDER BY id LIMIT ?",
+                    (self.EMBED_BATCH,)
+                ).fetchall()
+                if not batch:
+                    self._set_meta('embedder', embedder.name)
+                    self._connection.commit()
+                    logger.info(f"向量生成完成（{embedder.name}）")
+                    return
+
+            chunks = [(row['id'], row['title'], row['text']) for row in batch]
+            vectors = self._embed(embedder, chunks)
+            if vectors is None:
+                return
+
+            with self._lock:
+                if generation != self._generation:
+                    return
+                # 生成期间被替换或删除的片段不再写入
+                live = [i for i, (chunk_id, _, _) in enumerate(chunks)
+                        if chunk_id in self._bm25 and chunk_id not in self._chunk_rows]
+                if not self._append_vectors([chunks[i] for i in live], vectors[live]):
+                    return
+                self._connection.commit()
+
+    def _embed(self, embedder, chunks: List[tuple]) -> Optional[np.ndarray]:
+        """为片段生成向量，失败时返回 None（只保留关键词索引）"""
+        try:
+            return embedder.embed([f"{title}\n{text}" for _, title, text in chunks])
+        except Exception as e:
+            logger.warning(f"生成向量失败，本次只建立关键词索引: {e}")
+            return None
+
+    def _append_vectors(self, chunks: List[tuple], vectors: np.ndarray) -> bool:
+        """把向量追加到向量文件并记录行号（调用方持有锁）"""
+        if not chunks:
+            return True
+        if self._vectors.dim and vectors.shape[1] != self._vectors.dim:
+            logger.warning(f"向量维度 {vectors.shape[1]} 与索引维度 {self._vectors.dim} 不一致，已跳过")
+            return False
+
+        start = self._vectors.append(vectors)
+        for offset, (chunk_id, _, _) in enumerate(chunks):
+            self._chunk_rows[chunk_id] = start + offset
+        self._connection.executemany(
+            "UPDATE chunks SET vector_row = ? WHERE id = ?",
+            [(start + offset, chunk_id) for offset, (chunk_id, _, _) in enumerate(chunks)]
+        )
+        self._set_meta('vector_dim', str(self._vectors.dim))
+        return True
+
+    def _compact_if_needed(self):
+        """
+        废弃行达到向量文件的四分之一时压缩（调用方持有锁）
+
+        替换文档只追加新向量，旧行留在文件中；按比例触发使压缩的总开销
+        与写入量成正比，又不会在每次替换时都重写整个文件。
+        """
+        total = len(self._vectors)
+        orphaned = total - len(self._chunk_rows)
+        if not total or orphaned * 4 < total:
+            return
+        items = sorted(self._chunk_rows.items(), key=lambda item: item[1])
+        self._vectors.compact(np.fromiter((row for _, row in items), dtype=np.int64, count=len(items)))
+        self._chunk_rows = {chunk_id: row for row, (chunk_id, _) in enumerate(items)}
+        self._connection.executemany(
+            "UPDATE chunks SET vector_row = ? WHERE id = ?",
+            [(row, chunk_id) for chunk_id, row in self._chunk_rows.items()]
+        )
+        self._connection.commit()
+        logger.info(f"向量文件压缩完成，回收 {orphaned} 行")
+
+    def close(self):
+        with self._lock:
+            self._generation += 1
+            self._connection.close()
+
+    def __len__(self):
+        return len(self._bm25)
+
+    def has_document(self, doc_id: str) -> bool:
+        with self._lock:
+            row = self._connection.execute("SELECT 1 FROM chunks WHERE doc_id = ? LIMIT 1", (doc_id,)).fetchone()
+        return row is not None
+
+    def add_document(self, doc_id: str, title: str, texts: Iterable[Union[str, Tuple[str, str]]],
+                     url: str = '') -> int:
+        """
+        写入（或替换）一个文档的全部片段
+
+        Args:
+            doc_id: 文档ID，同一ID再次写入时替换旧片段
+            title: 文档标题，参与检索
+            texts: 需要索引的文本（转录、总结等），会按句子切片；
+                元素也可以是 (文本, 链接)，用于带时间点链接的转录片段
+            url: 文档链接，未单独指定链接的文本使用该链接
+
+        Returns:
+            int: 写入的片段数
+        """
+        pieces = []
+        for item in texts:
+            text, link = item if isinstance(item, tuple) else (item, url)
+            if text:
+                pieces.extend((chunk, link) for chunk in split_text(text))
+        now = datetime.now().isoformat()
+
+        # 向量在锁外生成，不阻塞其他线程的检索
+        embedder = self.embedder
+        vectors = self._embed(embedder, [(None, title or '', text) for text, _ in pieces]) if pieces else None
+        self._ready.wait()
+
+        with self._lock:
+            for row in self._connection.execute("SELECT id FROM chunks WHERE doc_id = ?", (doc_id,)).fetchall():
+                self._bm25.remove(row['id'])
+                self._chunk_rows.pop(row['id'], None)
+            self._connection.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+
+            chunks = []
+            for text, link in pieces:
+                cursor = self._connection.execute('''
+                    INSERT INTO chunks (doc_id, title, url, text, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (doc_id, title or '', link or '', text, now))
+                chunks.append((cursor.lastrowid, title or '', text))
+                self._bm25.add(cursor.lastrowid, tokenize(f"{title} {text}"))
+
+            # 生成期间切换了向量化方式时不写入旧向量，由后台重建补齐
+            if vectors is not None and embedder is self.embedder:
+                self._append_vectors(chunks, vectors)
+            self._compact_if_needed()
+            self._connection.commit()
+        return len(pieces)
+
+    def search(self, query: str, top_k: int = 5, mode: str = "hybrid") -> List[Dict[str, Any]]:
+        """
+        检索与问题最相关的片段
+
+        Args:
+            query: 查询文本
+            top_k: 返回条数
+            mode: hybrid（BM25 + 向量，RRF 融合）、bm25 或 vector
+
+        Returns:
+            list: 片段字典，包含 doc_id、title、url、text、score；索引仍在加载时为空
+        """
+        if not query.strip():
+            return []
+        if not self._ready.is_set():
+            logger.info("本地索引仍在加载，暂不检索")
+            return []
+        candidates = max(top_k * 4, 20)
+
+        embedder = self.embedder
+        query_vector = None
+        if mode in ("hybrid", "vector") and self._chunk_rows:
+            try:
+                query_vector = embedder.embed([query])[0]
+            except Exception as e:
+                logger.warning(f"查询向量生成失败，只使用关键词检索: {e}")
+
+        with self._lock:
+            ranked: List[List[int]] = []
+            if mode in ("hybrid", "bm25"):
+                ranked.append([chunk_id for chunk_id, _ in self._bm25.search(tokenize(query), candidates)])
+
+            if (query_vector is not None and embedder is self.embedder and self._chunk_rows
+                    and len(query_vector) == self._vectors.dim):
+                row_to_chunk = {row: chunk_id for chunk_id, row in self._chunk_rows.items()}
+                rows = np.fromiter(row_to_chunk.keys(), dtype=np.int64)
+                hits = self._vectors.search(query_vector, rows, candidates)
+                ranked.append([row_to_chunk[row] for row, _ in hits])
+
+            scores: Dict[int, float] = defaultdict(float)
+            for ranking in ranked:
+                for rank, chunk_id in enumerate(ranking):
+                    scores[chunk_id] += 1.0 / (self.RRF_K + rank + 1)
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+            if not best:
+                return []
+
+            placeholders = ', '.join('?' for _ in best)
+            rows = {
+                row['id']: row for row in self._connection.execute(
+                    f"SELECT id, doc_id, title, url, text FROM chunks WHERE id IN ({placeholders})",
+                    [chunk_id for chunk_id, _ in best]
+                ).fetchall()
+            }
+
+        return [
+            {
+                'chunk_id': chunk_id,
+                'doc_id': rows[chunk_id]['doc_id'],
+                'title': rows[chunk_id]['title'],
+                'url': rows[chunk_id]['url'],
+                'text': rows[chunk_id]['text'],
+                'score': score
+            }
+            for chunk_id, score in best if chunk_id in rows
+        ]
+
+
+def create_embedder(model: str = '', url: str = ''):
+    """根据配置创建向量化器：指定了 Ollama 向量模型时使用该模型，否则使用哈希向量"""
+    if model and url:
+        return OllamaEmbedder(url, model)
+    return HashingEmbedder()
+
+
+_index_lock = threading.Lock()
+_indexes: Dict[str, LocalIndex] = {}
+
+
+def get_local_index(index_dir=None, embedder=None) -> LocalIndex:
+    """
+    获取进程内共享的本地索引（同一目录只打开一次）
+
+    已打开的索引与传入的向量化方式不同时切换过去，避免用新模型查询旧模型的向量。
+    """
+    index_dir = Path(index_dir) if index_dir else Path(__file__).parent / "data" / "local_index"
+    key = str(index_dir.resolve())
+    with _index_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = LocalIndex(index_dir, embedder)
+            _indexes[key] = index
+        elif embedder is not None and embedder.name != index.embedder.name:
+            index.set_embedder(embedder)
+        return index
+
+
+def open_local_index(config_manager=None, index_dir=None) -> Optional[LocalIndex]:
+    """
+    按配置打开共享的本地索引
+
+    Returns:
+        LocalIndex: 未启用本地索引时返回 None
+    """
+    embedder = None
+    if config_manager:
+        if not config_manager.get_local_index_enabled():
+            return None
+        embedder = create_embedder(config_manager.get_embedding_model(), config_manager.get_embedding_url())
+    return get_local_index(index_dir, embedder)
@@ -1,6 +1,7 @@
 import sys
 import time
 import threading
+import uuid
 from pathlib import Path
 from PySide6.QtGui import QGuiApplication
 from PySide6.QtQml import QQmlApplicationEngine
@@ -8,9 +9,11 @@ from PySide6.QtCore import QObject, Slot, Signal
 from PySide6.QtQuickControls2 import QQuickStyle
 from conversation_manager import ConversationManager
 from config_manager import ConfigManager
-from markdown_formatter import MarkdownFormatter
+from markdown_formatter import MarkdownFormatter, StreamingMarkdownRenderer
 from knowledge_updater import KnowledgeUpdater
 from dify_client import DifyClient
+from chunk_coalescer import ChunkCoalescer
+from local_index import open_local_index
 from logger_config import setup_logger, get_logger
 
 logger = setup_logger('digital_garden', Path(__file__).parent / 'logs' / 'app.log')
@@ -26,22 +29,86 @@ class ChatController(QObject):
     generationStopped = Signal()
     loadingStateChanged = Signal(bool)
     messageAdded = Signal()
-    messageChunkReceived = Signal(str)
+    # 原始片段、新定稿的 HTML、末尾未完成部分的 HTML
+    messageChunkReceived = Signal(str, str, str)
+    # 服务端替换了已输出的回答，界面清空流式内容后重新接收
+    messageReplaced = Signal()
+    # 本地知识索引中与问题相关的片段（标题、链接、得分），在发送到 Dify 之前给出
+    localSourcesFound = Signal(list)
+
+    # 随问题一起发给 Dify 的本地检索片段数
+    LOCAL_CONTEXT_TOP_K = 3
 
     def __init__(self, conversation_manager=None, config_manager=None):
         super().__init__()
         self.conversation_manager = conversation_manager or ConversationManager()
         self.config_manager = config_manager
         self.markdown_formatter = MarkdownFormatter()
+        self.stream_renderer = StreamingMarkdownRenderer(self.markdown_formatter)
         self.is_generating = False
         self.should_stop = False
         self.dify_client = None
         self.current_answer = ""
+        self.local_index = None
+
+    def _create_coalescer(self, stream_id):
+        """按配置的间隔和字节数合并片段，渲染后再一次性发给界面"""
+        def flush(text):
+            html, tail = self.stream_renderer.append(stream_id, text)
+            self.messageChunkReceived.emit(text, html, tail)
+        
+        cm = self.config_manager
+        return ChunkCoalescer(
+            flush,
+            interval_ms=cm.get_stream_flush_interval_ms() if cm else 33,
+            max_bytes=cm.get_stream_flush_bytes() if cm else 1024
+        )
 
     @Slot(str, result=str)
     def format_markdown(self, text):
         return self.markdown_formatter.format(text)
 
+    def _get_local_index(self):
+        """每次按当前配置获取共享索引，向量模型变更后由 get_local_index 切换"""
+        try:
+            self.local_index = open_local_index(self.config_manager)
+        except Exception as e:
+            logger.error(f"打开本地索引失败: {e}")
+        return self.local_index
+
+    def search_knowledge(self, query, top_k=5):
+        """在本地知识索引中检索与问题相关的片段（在生成线程中调用，不阻塞界面）"""
+        index = self._get_local_index()
+        if index is None:
+            return []
+        try:
+            return index.search(query, top_k or 5)
+        except Exception as e:
+            logger.error(f"本地检索失败: {e}")
+            return []
+
+    @staticmethod
+    def _local_context(results):
+        """把本地检索结果整理成随问题发给 Dify 的参考资料"""
+        return "\n\n".join(
+            f"【{item['title']}】{item['url']}\n{item['text']}" if item['url'] else f"【{item['title']}】\n{item['text']}"
+            for item in results
+        )
+
+    def _local_answer(self, query, results=None):
+        """Dify 不可用时，用本地索引的检索结果组织一个离线回答"""
+        if results is None:
+            results = self.search_knowledge(query, self.LOCAL_CONTEXT_TOP_K)
+        if not results:
+            return ""
+        
+        lines = ["以下是本地知识库中与问题最相关的内容（离线检索）：", ""]
+        for i, item in enumerate(results, 1):
+            title = f"[{item['title']}]({item['url']})" if item['url'] else item['title']
+            lines.append(f"{i}. **{title}**")
+            lines.append(f"   {item['text']}")
+        return "\n".join(lines)
+
     @Slot(str)
     def send_message(self, text):
         logger.info(f"开始发送消息: {text[:100]}...")
@@ -68,6 +135,20 @@ class ChatController(QObject):
         self.current_answer = ""
         self.generationStarted.emit()
         self.loadingStateChanged.emit(True)
+        stream_id = uuid.uuid4().hex
+        coalescer = self._create_coalescer(stream_id)
+        finish_lock = threading.Lock()
+        finished = threading.Event()
+        
+        def claim_finish():
+            """本次生成只处理第一个结束事件（完成、出错或异常），返回本次是否生效"""
+            with finish_lock:
+                if finished.is_set():
+                    return False
+                finished.set()
+                return True
+        
+        local_results = []
         
         def generate_response():
             try:
@@ -77,6 +158,16 @@ class ChatController(QObject):
                     logger.info("用户请求停止生成")
                     return
                 
+                # 先在本地索引中检索：结果展示给用户，并作为参考资料随问题发给 Dify；
+                # Dify 不可用时直接用它组织离线回答
+                local_results.extend(self.search_knowledge(text, self.LOCAL_CONTEXT_TOP_K))
+                if local_results:
+                    logger.info(f"本地索引命中 {len(local_results)} 个片段")
+                    self.localSourcesFound.emit([
+                        {'title': item['title'], 'url': item['url'], 'score': item['score']}
+                        for item in local_results
+                    ])
+                
                 if not self.config_manager:
                     logger.error("ConfigManager未初始化")
                     raise Exception("ConfigManager未初始化")
@@ -112,10 +203,22 @@ class ChatController(QObject):
                 def on_message_chunk(chunk):
                     logger.debug(f"收到消息片段: {chunk[:50]}...")
                     self.current_answer += chunk
-                    self.messageChunkReceived.emit(chunk)
+                    coalescer.push(chunk)
+                
+                def on_replace(answer):
+                    logger.info("回答内容被服务端替换")
+                    coalescer.flush()
+                    self.stream_renderer.discard(stream_id)
+                    self.current_answer = answer
+                    self.messageReplaced.emit()
+                    coalescer.push(answer)
                 
                 def on_finished():
+                    if not claim_finish():
+                        logger.warning("生成已结束，忽略重复的完成事件")
+                        return
                     logger.info("响应生成完成")
+                    coalescer.close()
                     logger.debug(f"完整答案: {self.current_answer[:100]}...")
                     
                     dify_conversation_id = self.dify_client.get_conversation_id({})
@@ -134,9 +237,16 @@ class ChatController(QObject):
                     self.current_answer = ""
                 
                 def on_error(error_msg):
+                    if not claim_finish():
+                        logger.warning(f"生成已结束，忽略之后的错误事件: {error_msg}")
+                        return
                     logger.error(f"生成响应失败: {error_msg}")
+                    coalescer.close()
                     
                     error_message = f"抱歉，发生了错误：{error_msg}"
+                    fallback = self._local_answer(text, local_results or None)
+                    if fallback:
+                        error_message += f"\n\n{fallback}"
                     self.messageReceived.emit(error_message)
                     self.conversation_manager.add_message(conversation_id, "assistant", error_message)
                     self.messageAdded.emit()
@@ -146,14 +256,19 @@ class ChatController(QObject):
                     self.loadingStateChanged.emit(False)
                     self.current_answer = ""
                 
+                # Dify 应用可以在提示词中引用 {{local_context}} 变量，未定义该变量时会被忽略
+                inputs = {"local_context": self._local_context(local_results)} if local_results else None
+                
                 response = self.dify_client.send_message(
                     query=text,
                     user=user_id,
                     conversation_id=dify_conversation_id,
+                    inputs=inputs,
                     response_mode="streaming",
                     on_message=on_message_chunk,
                     on_finished=on_finished,
-                    on_error=on_error
+                    on_error=on_error,
+                    on_replace=on_replace
                 )
                 
                 if self.should_stop:
@@ -161,11 +276,17 @@ class ChatController(QObject):
                     return
                 
             except Exception as e:
+                coalescer.close()
                 logger.error(f"生成响应失败: {type(e).__name__}: {str(e)}")
                 import traceback
                 logger.debug(f"堆栈跟踪:\n{traceback.format_exc()}")
+                if not claim_finish():
+                    return
                 
                 error_message = f"抱歉，发生了错误：{str(e)}"
+                fallback = self._local_answer(text, local_results or None)
+                if fallback:
+                    error_message += f"\n\n{fallback}"
                 self.messageReceived.emit(error_message)
                 self.conversation_manager.add_message(conversation_id, "assistant", error_message)
                 self.messageAdded.emit()
@@ -173,6 +294,9 @@ class ChatController(QObject):
                 self.generationStopped.emit()
                 self.loadingStateChanged.emit(False)
                 self.current_answer = ""
+            finally:
+                coalescer.close()
+                self.stream_renderer.discard(stream_id)
         
         logger.debug("启动生成线程...")
         thread = threading.Thread(target=generate_response)
@@ -20,39 +20,23 @@ ApplicationWindow {
     property string activeView: "chat"
     property string conversationToDelete: ""
     property bool isRefreshingModelList: false
+    property bool loadingOlderMessages: false
 
-    function loadConversations() {
-        console.log("Loading conversations...")
-        conversationModel.clear()
-        var list = conversationManager.get_conversation_list()
-        console.log("Conversation list:", list.length, "items")
-        for (var i = 0; i < list.length; i++) {
-            console.log("Adding conversation:", list[i].title)
-            conversationModel.append(list[i])
-        }
+    function loadMessages() {
+        // 消息模型由 Python 端在切换对话时加载最新一页，这里只负责滚动到底部
+        chatList.positionViewAtEnd()
     }
 
-    function loadMessages() {
-        console.log("=== loadMessages called ===")
-        console.log("Current activeView:", window.activeView)
-        console.log("Current conversation ID:", conversationManager.current_conversation_id)
-        
-        var currentId = conversationManager.current_conversation_id
-        if (!currentId) {
-            console.log("No current conversation, skipping message load")
-            return
-        }
-        
-        console.log("Loading messages for conversation:", currentId)
-        messageModel.clear()
-        var messages = conversationManager.get_current_messages()
-        console.log("Messages count:", messages.length)
-        for (var i = 0; i < messages.length; i++) {
-            console.log("Adding message:", messages[i].role, messages[i].content.substring(0, 20))
-            messageModel.append(messages[i])
+    function loadOlderMessages() {
+        var messageModel = conversationManager.message_model
+        if (!messageModel.has_older || window.loadingOlderMessages) return
+        window.loadingOlderMessages = true
+        var inserted = messageModel.fetch_older()
+        if (inserted > 0) {
+            // 保持当前阅读位置不跳动
+            chatList.positionViewAtIndex(inserted, ListView.Beginning)
         }
-        chatList.positionViewAtEnd()
-        console.log("=== loadMessages finished ===")
+        window.loadingOlderMessages = false
     }
 
     function refreshModelList() {
@@ -337,7 +321,6 @@ ApplicationWindow {
                     console.log("=== New conversation button clicked ===")
                     console.log("Current activeView:", window.activeView)
                     console.log("Has empty title conversation:", conversationManager.has_empty_title_conversation())
-                    console.log("Conversation model count:", conversationModel.count)
                     
                     if (!conversationManager.has_empty_title_conversation()) {
                         console.log("Creating new conversation...")
@@ -366,18 +349,7 @@ ApplicationWindow {
                 Layout.fillWidth: true
                 Layout.fillHeight: true
                 clip: true
-                model: ListModel { id: conversationModel }
-                
-                Component.onCompleted: {
-                    loadConversations()
-                }
-                
-                Connections {
-                    target: conversationManager
-                    function onConversationListChanged() {
-                        loadConversations()
-                    }
-                }
+                model: conversationManager.conversation_model
                 
                 delegate: ItemDelegate {
                     id: listDel
@@ -700,8 +672,6 @@ ApplicationWindow {
         anchors.right: parent.right
         anchors.top: titleBar.bottom
         anchors.bottom: parent.bottom
-        
-        ListModel { id: messageModel }
 
         // ================== 视图 1: 聊天界面 ==================
         Item {
@@ -712,12 +682,52 @@ ApplicationWindow {
             property bool isGenerating: false
             property string currentTitle: ""
             property string streamingResponse: ""
+            // 流式回答中已定稿部分在 streamingResponseText 中的长度，之后是可被替换的末尾
+            property int streamingStableLength: 0
+            // 本次提问在本地知识索引中命中的视频（标题、链接、得分）
+            property var localSources: []
+
+            function localSourcesHtml() {
+                var links = []
+                for (var i = 0; i < localSources.length; i++) {
+                    var item = localSources[i]
+                    var title = item.title.replace(/&/g, "&amp;").replace(/</g, "&lt;")
+                    links.push(item.url ? "<a href=\"" + item.url + "\" style=\"color:#60a5fa\">" + title + "</a>" : title)
+                }
+                return "本地知识库：" + links.join("、")
+            }
+
+            function resetStreaming() {
+                streamingResponse = ""
+                streamingStableLength = 0
+                streamingResponseText.clear()
+            }
+
+            // 追加定稿的 HTML，并替换末尾未完成的部分，不重新渲染整段回答
+            function appendStreamingHtml(html, tail) {
+                var edit = streamingResponseText
+                if (edit.length > streamingStableLength) {
+                    edit.remove(streamingStableLength, edit.length)
+                }
+                if (html !== "") {
+                    edit.insert(edit.length, html)
+                }
+                streamingStableLength = edit.length
+                if (tail !== "") {
+                    edit.insert(edit.length, tail)
+                }
+            }
 
             Connections {
                 target: chatController
                 function onGenerationStarted() {
                     console.log("=== Generation started ===")
                     chatView.isGenerating = true
+                    chatView.localSources = []
+                    chatView.resetStreaming()
+                }
+                function onLocalSourcesFound(sources) {
+                    chatView.localSources = sources
                 }
                 function onGenerationStopped() {
                     console.log("=== Generation stopped ===")
@@ -735,15 +745,17 @@ ApplicationWindow {
             Connections {
                 target: chatController
                 function onMessageAdded() {
-                    loadMessages()
+                    chatList.positionViewAtEnd()
                 }
                 function onMessageReceived(msg) {
-                    console.log("Message received:", msg)
-                    chatView.streamingResponse = ""
+                    chatView.resetStreaming()
                 }
-                function onMessageChunkReceived(chunk) {
-                    console.log("Message chunk received:", chunk)
+                function onMessageChunkReceived(chunk, html, tail) {
                     chatView.streamingResponse += chunk
+                    chatView.appendStreamingHtml(html, tail)
+                }
+                function onMessageReplaced() {
+                    chatView.resetStreaming()
                 }
                 function onGenerationStopped() {
                     console.log("=== Generation stopped ===")
@@ -753,9 +765,9 @@ ApplicationWindow {
                         var currentId = conversationManager.current_conversation_id
                         if (currentId) {
                             conversationManager.add_message(currentId, "assistant", chatView.streamingResponse + "\n\n*已手动终止输出*")
-                            loadMessages()
+                            chatList.positionViewAtEnd()
                         }
-                        chatView.streamingResponse = ""
+                        chatView.resetStreaming()
                     }
                 }
             }
@@ -764,11 +776,20 @@ ApplicationWindow {
                 id: chatList
                 anchors.fill: parent
                 anchors.margins: 50
-                anchors.bottomMargin: chatView.isGenerating && chatView.streamingResponse !== "" ? 240 : 140
+                anchors.bottomMargin: (chatView.isGenerating && chatView.streamingResponse !== "" ? 240 : 140)
+                                     + (localSourcesText.visible ? localSourcesText.height + 8 : 0)
                 spacing: 32
-                model: messageModel
+                model: conversationManager.message_model
                 clip: true
 
+                // 用户滚动到顶部时加载更早的消息
+                onAtYBeginningChanged: {
+                    if (atYBeginning && (moving || flicking)) loadOlderMessages()
+                }
+                onMovementEnded: {
+                    if (atYBeginning) loadOlderMessages()
+                }
+
                 delegate: Item {
                     width: chatList.width - 20
                     height: messageColumn.implicitHeight
@@ -814,13 +835,7 @@ ApplicationWindow {
                                     id: messageText
                                     anchors.fill: parent
                                     anchors.margins: 10
-                                    text: {
-                                        if (role === "assistant" && markdownFormatter) {
-                                            var formatted = markdownFormatter.format(content)
-                                            return formatted || content
-                                        }
-                                        return content
-                                    }
+                                    text: role === "assistant" ? (html || content) : content
                                     textFormat: role === "assistant" ? TextEdit.RichText : TextEdit.PlainText
                                     color: "#e4e4e7"
                                     font.pixelSize: 15
@@ -832,15 +847,6 @@ ApplicationWindow {
                                         console.log("Link URL:", link)
                                         Qt.openUrlExternally(link)
                                     }
-                                    
-                                    Component.onCompleted: {
-                                        console.log("=== Message text loaded ===")
-                                        console.log("Role:", role)
-                                        console.log("Content length:", content.length)
-                                        console.log("Content preview:", content.substring(0, 100))
-                                        console.log("Formatted text length:", text.length)
-                                        console.log("MarkdownFormatter available:", markdownFormatter !== null)
-                                    }
                                 }
                             }
                         }
@@ -848,6 +854,23 @@ ApplicationWindow {
                 }
             }
 
+            Text {
+                id: localSourcesText
+                width: Math.min(parent.width - 120, 800)
+                anchors.bottom: streamingResponseContainer.visible ? streamingResponseContainer.top : inputContainer.top
+                anchors.horizontalCenter: parent.horizontalCenter
+                anchors.bottomMargin: 8
+                visible: chatView.isGenerating && chatView.localSources.length > 0
+                text: visible ? chatView.localSourcesHtml() : ""
+                textFormat: Text.RichText
+                color: "#71717a"
+                font.pixelSize: 12
+                wrapMode: Text.WordWrap
+                onLinkActivated: function(link) {
+                    Qt.openUrlExternally(link)
+                }
+            }
+
             Rectangle {
                 id: streamingResponseContainer
                 width: Math.min(parent.width - 120, 800)
@@ -867,13 +890,6 @@ ApplicationWindow {
                         id: streamingResponseText
                         anchors.fill: parent
                         anchors.margins: 10
-                        text: {
-                            if (markdownFormatter) {
-                                var formatted = markdownFormatter.format(chatView.streamingResponse)
-                                return formatted || chatView.streamingResponse
-                            }
-                            return chatView.streamingResponse
-                        }
                         textFormat: TextEdit.RichText
                         color: "#e4e4e7"
                         font.pixelSize: 15
@@ -885,13 +901,6 @@ ApplicationWindow {
                             console.log("Link URL:", link)
                             Qt.openUrlExternally(link)
                         }
-                        
-                        Component.onCompleted: {
-                            console.log("=== Streaming response text loaded ===")
-                            console.log("Content length:", chatView.streamingResponse.length)
-                            console.log("Content preview:", chatView.streamingResponse.substring(0, 100))
-                            console.log("MarkdownFormatter available:", markdownFormatter !== null)
-                        }
                     }
                 }
             }
@@ -1009,6 +1018,7 @@ ApplicationWindow {
                     appUrlField.fieldText = configManager.get_app_url()
                     appApiField.fieldText = configManager.get_app_api()
                     languageCombo.currentIndex = languageCombo.find(configManager.get_language(), Qt.MatchExactly)
+                    summaryModeCombo.currentIndex = Math.max(0, summaryModeCombo.modes.indexOf(configManager.get_summary_mode()))
                     
                     // 初始化模型配置
                     var provider = configManager.get_model_provider()
@@ -1044,6 +1054,7 @@ ApplicationWindow {
                         appUrlField.fieldText = configManager.get_app_url()
                         appApiField.fieldText = configManager.get_app_api()
                         languageCombo.currentIndex = languageCombo.find(configManager.get_language(), Qt.MatchExactly)
+                        summaryModeCombo.currentIndex = Math.max(0, summaryModeCombo.modes.indexOf(configManager.get_summary_mode()))
                         
                         // 更新模型配置
                         var provider = configManager.get_model_provider()
@@ -1255,6 +1266,33 @@ ApplicationWindow {
                                 background: Rectangle { color: "#09090b"; radius: 8; border.color: "#27272a" }
                             }
                         }
+
+                        // 3. 视频总结方式（与 configManager 中的 summary_mode 一一对应）
+                        RowLayout {
+                            Layout.fillWidth: true
+                            Text { text: "视频总结方式"; color: "#a1a1aa"; Layout.fillWidth: true }
+                            ComboBox {
+                                id: summaryModeCombo
+                                property var modes: ["single", "map_reduce"]
+                                model: ["单次生成", "分段汇总"]
+                                Layout.preferredWidth: 200
+                                onActivated: configManager.set_summary_mode(modes[currentIndex])
+                                delegate: ItemDelegate {
+                                    width: summaryModeCombo.width
+                                    contentItem: Text { text: modelData; color: "white"; verticalAlignment: Text.AlignVCenter }
+                                    background: Rectangle { color: hovered ? "#27272a" : "#18181b" }
+                                }
+                                contentItem: Text { text: summaryModeCombo.displayText; color: "white"; leftPadding: 12; verticalAlignment: Text.AlignVCenter }
+                                background: Rectangle { color: "#09090b"; radius: 8; border.color: "#27272a" }
+                            }
+                        }
+                        Text {
+                            Layout.fillWidth: true
+                            text: "单次生成只截取转录开头，每个视频调用一次模型。分段汇总覆盖完整转录，但每段调用一次模型并逐级合并，长视频的调用次数和费用会成倍增加。"
+                            color: "#71717a"
+                            font.pixelSize: 12
+                            wrapMode: Text.WordWrap
+                        }
                     }
                 }
             }
@@ -1,8 +1,49 @@
+import html
 import re
+import threading
 from PySide6.QtCore import QObject, Slot
 
+# 格式化规则或样式变化时递增，消息表中缓存的 HTML 随之失效
+FORMATTER_VERSION = 1
+
+# 块级元素：代码块；以及水平线、标题、列表（连同前面紧挨着的空行，这些元素自带边距）
+_BLOCK = re.compile(r"""
+    ^[ \t]*(?P<fence>```[^\n`]*\n(?P<code>.*?)(?:```|\Z))
+  | ^(?:[ \t]*\n)*[ \t]*(?:
+        (?P<hr>[-*_]{3,})[ \t]*$
+      | (?P<hashes>\#{1,6})[ ](?P<heading>[^\n]*?)[ \t]*$
+      | [-*+][ ](?P<item>[^\n]*?)[ \t]*$
+      | (?P<number>\d+\.)[ ](?P<ordered>[^\n]*?)[ \t]*$
+    )
+""", re.MULTILINE | re.DOTALL | re.VERBOSE)
+
+# 行内元素按出现位置一次匹配：行内代码优先，其内容不再参与其他格式化；行内元素不跨行
+_INLINE_CODE = r'`(?P<code>[^`\n]+)`'
+_EMPHASIS = r'\*\*(?P<bold>[^*\n]+)\*\*|\*(?P<italic>[^*\n]+)\*'
+# 每个分支都以固定字符开头，re 可以据此跳过不可能匹配的位置
+_LINKS = r'\[(?P<label>[^\]\n]+)\]\((?P<href>[^)\s]+)\)|http(?P<url>s?://[^\s<>"{}|\\^`\[\]]+)'
+_INLINE = re.compile('|'.join((_INLINE_CODE, _EMPHASIS, _LINKS)))
+_INLINE_NO_LINKS = re.compile('|'.join((_INLINE_CODE, _EMPHASIS)))
+
+_CODE_BLOCK_HTML = '<div style="background-color: #1d1d20; border-radius: 8px; padding: 12px; margin: 8px 0;"><pre style="font-family: Consolas, Monospace; font-size: 13px; color: #e4e4e7; margin: 0; white-space: pre-wrap; overflow-x: auto;"><code>{}</code></pre></div>'
+_HR_HTML = '<hr style="border: none; border-top: 1px solid #27272a; margin: 16px 0;">'
+_HEADING_HTML = '<div style="font-size: {}px; font-weight: bold; color: #e4e4e7; margin: 16px 0 8px 0;">{}</div>'
+_LIST_HTML = '<div style="margin: 4px 0; padding-left: 24px;">{} {}</div>'
+_INLINE_CODE_HTML = '<span style="background-color: #27272a; color: #e4e4e7; font-family: Consolas, Monospace; font-size: 13px; padding: 2px 6px; border-radius: 4px;">{}</span>'
+_BOLD_HTML = '<span style="font-weight: bold;">{}</span>'
+_ITALIC_HTML = '<span style="font-style: italic;">{}</span>'
+_LINK_HTML = '<a href="{}" style="color: #3b82f6; text-decoration: underline;">{}</a>'
+
 
 class MarkdownFormatter(QObject):
+    """
+    Markdown 转 RichText HTML
+
+    用预编译的块级正则扫描一遍全文，识别代码块、水平线、标题和列表，
+    其余文本用一个行内正则一次匹配行内代码、加粗、斜体和链接。
+    代码内容会转义，且不会再被加粗、链接等规则改写。
+    """
+
     def __init__(self):
         super().__init__()
 
@@ -10,128 +51,138 @@ class MarkdownFormatter(QObject):
     def format(self, text):
         if not text:
             return ""
-        
-        formatted = text
-        
-        # 格式化顺序很重要，先处理复杂的，再处理简单的
-        formatted = self._format_code_blocks(formatted)
-        formatted = self._format_horizontal_rules(formatted)
-        formatted = self._format_inline_code(formatted)
-        formatted = self._format_bold(formatted)
-        formatted = self._format_italic(formatted)
-        formatted = self._format_headings(formatted)
-        formatted = self._format_lists(formatted)
-        formatted = self._format_links(formatted)
-        formatted = self._format_auto_links(formatted)
-        formatted = self._format_newlines(formatted)
-        
-        return formatted
-
-    def _format_italic(self, text):
-        pattern = r'\*([^*]+)\*'
-        
-        def replace_italic(match):
-            content = match.group(1)
-            return f'<span style="font-style: italic;">{content}</span>'
-        
-        return re.sub(pattern, replace_italic, text)
-
-    def _format_headings(self, text):
-        # 支持 # 到 ###### 的标题，处理标题前可能的空格
-        for i in range(6, 0, -1):
-            pattern = rf'^\s*{"#" * i} (.*)$'
-            
-            def replace_heading(match):
-                content = match.group(1)
-                font_size = 24 - (i - 1) * 3  # 标题1: 24px, 标题2: 21px, ..., 标题6: 9px
-                return f'<div style="font-size: {font_size}px; font-weight: bold; color: #e4e4e7; margin: 16px 0 8px 0;">{content}</div>'
-            
-            text = re.sub(pattern, replace_heading, text, flags=re.MULTILINE)
-        
-        return text
-
-    def _format_lists(self, text):
-        # 无序列表 - 支持 -, *, + 作为列表标记
-        pattern = r'^\s*[-*+] (.*)$'
-        
-        def replace_unordered_list(match):
-            content = match.group(1)
-            return f'<div style="margin: 4px 0; padding-left: 24px;">• {content}</div>'
-        
-        text = re.sub(pattern, replace_unordered_list, text, flags=re.MULTILINE)
-        
-        # 有序列表 - 支持数字. 格式
-        pattern = r'^\s*\d+\. (.*)$'
-        
-        def replace_ordered_list(match):
-            content = match.group(1)
-            return f'<div style="margin: 4px 0; padding-left: 24px;">{match.group(0).split(" ")[0]} {content}</div>'
-        
-        text = re.sub(pattern, replace_ordered_list, text, flags=re.MULTILINE)
-        
-        return text
-
-    def _format_newlines(self, text):
-        # 替换换行符为<br>标签
-        return text.replace('\n', '<br>')
-
-    def _format_code_blocks(self, text):
-        pattern = r'```([\s\S]*?)\n([\s\S]*?)```'
-        
-        def replace_code_block(match):
-            language = match.group(1) or ''
-            code = match.group(2)
-            return f'<div style="background-color: #1d1d20; border-radius: 8px; padding: 12px; margin: 8px 0;"><pre style="font-family: Consolas, Monospace; font-size: 13px; color: #e4e4e7; margin: 0; white-space: pre-wrap; overflow-x: auto;"><code>{code}</code></pre></div>'
-        
-        return re.sub(pattern, replace_code_block, text, flags=re.MULTILINE | re.DOTALL)
-    
-    def _format_horizontal_rules(self, text):
-        # 支持 ---, ***, ___ 三种水平线格式
-        # 匹配单独一行的 ---, ***, 或 ___（前后可以有空白）
-        pattern = r'^\s*([-*_]{3,})\s*$'
-        
-        def replace_hr(match):
-            return '<hr style="border: none; border-top: 1px solid #27272a; margin: 16px 0;">'
-        
-        return re.sub(pattern, replace_hr, text, flags=re.MULTILINE)
-
-    def _format_inline_code(self, text):
-        pattern = r'`([^`]+)`'
-        
-        def replace_inline_code(match):
-            code = match.group(1)
-            return f'<span style="background-color: #27272a; color: #e4e4e7; font-family: Consolas, Monospace; font-size: 13px; padding: 2px 6px; border-radius: 4px;">{code}</span>'
-        
-        return re.sub(pattern, replace_inline_code, text)
-
-    def _format_bold(self, text):
-        pattern = r'\*\*([^*]+)\*\*'
-        
-        def replace_bold(match):
-            content = match.group(1)
-            return f'<span style="font-weight: bold;">{content}</span>'
-        
-        return re.sub(pattern, replace_bold, text)
-
-    def _format_links(self, text):
-        pattern = r'\[([^\]]+)\]\(([^)]+)\)'
-        
-        def replace_link(match):
-            link_text = match.group(1)
-            url = match.group(2)
-            return f'<a href="{url}" style="color: #3b82f6; text-decoration: underline;">{link_text}</a>'
-        
-        return re.sub(pattern, replace_link, text)
-    
-    def _format_auto_links(self, text):
-        # 自动检测并格式化裸露的 URL（不在 Markdown 链接语法中的 URL）
-        # 匹配 http:// 或 https:// 开头的 URL
-        pattern = r'(?<!\])(https?://[^\s<>"{}|\\^`\[\]]+)'
-        
-        def replace_auto_link(match):
-            url = match.group(1)
-            # 限制显示的 URL 长度，避免太长
-            display_url = url if len(url) <= 50 else url[:47] + "..."
-            return f'<a href="{url}" style="color: #3b82f6; text-decoration: underline;">{display_url}</a>'
-        
-        return re.sub(pattern, replace_auto_link, text)
\ No newline at end of file
+
+        out = []
+        pos = 0
+        for match in _BLOCK.finditer(text):
+            if match.start() > pos:
+                out.append(self._format_text(text[pos:match.start()]))
+            out.append(self._format_block(match))
+            pos = match.end()
+        if pos < len(text):
+            out.append(self._format_text(text[pos:]))
+        return "".join(out)
+
+    def _format_text(self, text):
+        return self._format_inline(text).replace('\n', '<br>')
+
+    def _format_block(self, match):
+        kind = match.lastgroup
+        if kind == 'fence':
+            return _CODE_BLOCK_HTML.format(html.escape(match.group('code'), quote=False).replace('\n', '<br>'))
+        if kind == 'hr':
+            return _HR_HTML
+        if kind == 'heading':
+            font_size = 24 - (len(match.group('hashes')) - 1) * 3  # 标题1: 24px, 标题2: 21px, ..., 标题6: 9px
+            return _HEADING_HTML.format(font_size, self._format_inline(match.group('heading')))
+        if kind == 'item':
+            return _LIST_HTML.format('•', self._format_inline(match.group('item')))
+        return _LIST_HTML.format(match.group('number'), self._format_inline(match.group('ordered')))
+
+    def _format_inline(self, text, pattern=_INLINE):
+        if '`' not in text and '*' not in text and '[' not in text and '://' not in text:
+            return text
+        return pattern.sub(self._replace_inline, text)
+
+    def _replace_inline(self, match):
+        kind = match.lastgroup
+        if kind == 'code':
+            return _INLINE_CODE_HTML.format(html.escape(match.group('code'), quote=False))
+        if kind == 'bold':
+            return _BOLD_HTML.format(self._format_inline(match.group('bold')))
+        if kind == 'italic':
+            return _ITALIC_HTML.format(self._format_inline(match.group('italic')))
+        if kind == 'href':
+            label = self._format_inline(match.group('label'), _INLINE_NO_LINKS)
+            return _LINK_HTML.format(html.escape(match.group('href')), label)
+        url = match.group(0)
+        # 限制显示的 URL 长度，避免太长
+        display_url = url if len(url) <= 50 else url[:47] + "..."
+        return _LINK_HTML.format(html.escape(url), display_url)
+
+
+class _StreamState:
+    def __init__(self):
+        self.pending = ""      # 尚未定稿的文本：当前行及其前面的空行，或未闭合的代码块
+        self.line_start = 0    # 当前行在 pending 中的起始位置
+        self.in_fence = False
+
+
+class StreamingMarkdownRenderer:
+    """
+    流式回答的增量渲染器
+
+    按消息ID保存渲染状态。完整的行（代码块内则是整个代码块）只渲染一次并定稿，
+    每次追加片段只重新渲染末尾未完成的部分，调用方把定稿的 HTML 追加到已有内容后面，
+    再用末尾的 HTML 替换上一次的末尾，单个片段的开销与回答总长度无关。
+    """
+
+    FENCE = '```'
+
+    def __init__(self, formatter=None):
+        self.formatter = formatter or MarkdownFormatter()
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def append(self, message_id, chunk):
+        """
+        追加一个片段
+
+        Returns:
+            tuple: (新定稿的 HTML，需要追加到已有内容之后；末尾未完成部分的 HTML，替换上一次的末尾)
+        """
+        with self._lock:
+            state = self._states.setdefault(message_id, _StreamState())
+
+        state.pending += chunk
+        finalized = []
+        while True:
+            newline = state.pending.find('\n', state.line_start)
+            if newline < 0:
+                break
+            raw = state.pending[state.line_start:newline]
+            line = raw.strip()
+
+            if state.in_fence:
+                if self.FENCE in line:
+                    finalized.append(self._take(state, newline + 1))
+                else:
+                    state.line_start = newline + 1
+            elif line.startswith(self.FENCE) and '`' not in line[len(self.FENCE):]:
+                state.in_fence = True
+                state.line_start = newline + 1
+            elif not raw.strip(' \t'):
+                # 空行暂不定稿：后面是标题、列表或水平线时空行会被块元素吸收，由下一行决定
+                state.line_start = newline + 1
+            else:
+                finalized.append(self._take(state, newline + 1))
+
+        return "".join(finalized), self._render_tail(state)
+
+    def finish(self, message_id):
+        """结束一条消息，返回剩余未定稿部分的 HTML"""
+        with self._lock:
+            state = self._states.pop(message_id, None)
+        if not state or not state.pending:
+            return ""
+        return self.formatter.format(state.pending)
+
+    def discard(self, message_id):
+        with self._lock:
+            self._states.pop(message_id, None)
+
+    def _take(self, state, end):
+        html = self.formatter.format(state.pending[:end])
+        state.pending = state.pending[end:]
+        state.line_start = 0
+        state.in_fence = False
+        return html
+
+    def _render_tail(self, state):
+        if not state.pending:
+            return ""
+        if state.in_fence:
+            # 未闭合的代码块按已闭合渲染，避免代码内容被当作普通文本格式化
+            closing = self.FENCE if state.pending.endswith('\n') else '\n' + self.FENCE
+            return self.formatter.format(state.pending + closing)
+        return self.formatter.format(state.pending)
@@ -0,0 +1,231 @@
+import json
+import re
+import threading
+from datetime import datetime
+from http.cookiejar import MozillaCookieJar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import yt_dlp
+from http_pool import get_http_pool
+from logger_config import get_logger
+
+logger = get_logger('playlist_scanner')
+
+
+class ScanResult:
+    """
+    一次播放列表扫描的结果
+
+    Attributes:
+        ids: 当前已知的全部视频ID（最新收藏在前）
+        added: 相比上次扫描新增的视频ID
+        removed: 相比上次扫描移除的视频ID（仅完整扫描时可知）
+        incremental: 是否为增量扫描
+        unchanged: 指纹未变化，未拉取任何条目
+    """
+
+    def __init__(self, ids, added, removed=None, incremental=False, unchanged=False):
+        self.ids = ids
+        self.added = added
+        self.removed = removed or []
+        self.incremental = incremental
+        self.unchanged = unchanged
+
+
+class PlaylistScanner:
+    """
+    增量播放列表扫描器
+
+    按播放列表URL保存上次扫描到的视频ID顺序和指纹。新收藏的视频排在最前面，
+    因此增量扫描从头开始翻页，遇到连续若干个已知视频即可停止。
+    Bilibili 收藏夹先比较收藏夹的修改时间和视频数量，未变化时不再翻页。
+    """
+
+    FAVLIST_PATTERN = re.compile(r'(?:favlist/?\?fid=|medialist/detail/ml)(\d+)')
+    FAVLIST_API = "https://api.bilibili.com/x/v3/fav/resource/list"
+    PAGE_SIZE = 20
+
+    def __init__(self, state_file, cookies_file=None,
+                 log_callback: Optional[Callable[[str], None]] = None, known_streak: int = 5):
+        self.state_file = Path(state_file)
+        self.cookies_file = Path(cookies_file) if cookies_file else None
+        self.log = log_callback or logger.info
+        self.known_streak = max(1, known_streak)
+        self._lock = threading.Lock()
+        self._state = self._load_state()
+
+    def _load_state(self) -> Dict[str, Any]:
+        if not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"读取扫描状态失败: {e}")
+            return {}
+
+    def _save_state(self):
+        tmp_file = self.state_file.with_suffix('.tmp')
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f, ensure_ascii=False)
+            tmp_file.replace(self.state_file)
+        except Exception as e:
+            logger.error(f"保存扫描状态失败: {e}")
+
+    def diff_since_last_scan(self, url: str) -> Dict[str, Any]:
+        """
+        获取最近一次扫描相对于之前一次的变化
+
+        Returns:
+            dict: {"added": [...], "removed": [...], "scanned_at": 时间, "total": 总数}
+        """
+        with self._lock:
+            entry = self._state.get(url)
+            if not entry:
+                return {"added": [], "removed": [], "scanned_at": None, "total": 0}
+            diff = dict(entry.get("last_diff", {"added": [], "removed": []}))
+            diff["scanned_at"] = entry.get("scanned_at")
+            diff["total"] = len(entry.get("ids", []))
+            return diff
+
+    def scan(self, url: str, ydl_opts: Dict[str, Any], full: bool = False) -> ScanResult:
+        """
+        扫描播放列表
+
+        Args:
+            url: 播放列表地址
+            ydl_opts: yt-dlp 参数（完整扫描和通用增量扫描时使用）
+            full: 强制完整扫描
+        """
+        with self._lock:
+            previous = self._state.get(url)
+
+        if previous and not full:
+            try:
+                result = self._scan_incremental(url, ydl_opts, previous)
+                if result is not None:
+                    return result
+            except Exception as e:
+                self.log(f"[-] 增量扫描失败，改为完整扫描: {e}")
+
+        return self._scan_full(url, ydl_opts, previous)
+
+    def _record(self, url, ids, added, removed, fingerprint):
+        with self._lock:
+            self._state[url] = {
+                "ids": ids,
+                "fingerprint": fingerprint,
+                "scanned_at": datetime.now().isoformat(),
+                "last_diff": {"added": added, "removed": removed}
+            }
+            self._save_state()
+
+    def _scan_full(self, url, ydl_opts, previous) -> ScanResult:
+        opts = dict(ydl_opts, extract_flat=True)
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            info = ydl.extract_info(url, download=False) or {}
+
+        ids = [entry.get('id') for entry in info.get('entries') or [] if entry and entry.get('id')]
+        old_ids = previous.get("ids", []) if previous else []
+        old_set, new_set = set(old_ids), set(ids)
+        added = [i for i in ids if i not in old_set]
+        removed = [i for i in old_ids if i not in new_set]
+
+        fingerprint = self._fingerprint(info.get('modified_timestamp'), len(ids))
+        self._record(url, ids, added, removed, fingerprint)
+        return ScanResult(ids, added, removed)
+
+    def _scan_incremental(self, url, ydl_opts, previous) -> Optional[ScanResult]:
+        fav_match = self.FAVLIST_PATTERN.search(url)
+        if fav_match:
+            return self._scan_favlist(url, fav_match.group(1), previous)
+        return self._scan_generic(url, ydl_opts, previous)
+
+    @staticmethod
+    def _fingerprint(modified, count) -> str:
+        return f"{modified or ''}:{count}"
+
+    def _merge(self, url, previous, new_ids, fingerprint) -> ScanResult:
+        old_ids = previous.get("ids", [])
+        known = set(new_ids)
+        ids = new_ids + [i for i in old_ids if i not in known]
+        old_set = set(old_ids)
+        added = [i for i in new_ids if i not in old_set]
+        self._record(url, ids, added, [], fingerprint)
+        return ScanResult(ids, added, incremental=True)
+
+    def _scan_generic(self, url, ydl_opts, previous) -> ScanResult:
+        """通用增量扫描：不展开播放列表，逐条读取直到遇到连续的已知条目"""
+        known = set(previous.get("ids", []))
+        new_ids: List[str] = []
+        streak = 0
+
+        opts = dict(ydl_opts, extract_flat=True, lazy_playlist=True)
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            info = ydl.extract_info(url, download=False, process=False) or {}
+            for entry in info.get('entries') or []:
+                video_id = entry.get('id') if entry else None
+                if not video_id:
+                    continue
+                new_ids.append(video_id)
+                streak = streak + 1 if video_id in known else 0
+                if streak >= self.known_streak:
+                    break
+
+        return self._merge(url, previous, new_ids, previous.get("fingerprint", ""))
+
+    def _favlist_page(self, fid, page):
+        params = {"media_id": fid, "pn": page, "ps": self.PAGE_SIZE, "order": "mtime"}
+        headers = {
+            "User-Agent": "Mozilla/5.0",
+            "Referer": "https://www.bilibili.com/"
+        }
+        cookies = None
+        if self.cookies_file and self.cookies_file.exists():
+            cookies = MozillaCookieJar(str(self.cookies_file))
+            cookies.load(ignore_discard=True, ignore_expires=True)
+
+        res = get_http_pool().get(self.FAVLIST_API, params=params, headers=headers, cookies=cookies)
+        res.raise_for_status()
+        body = res.json()
+        if body.get("code") != 0:
+            raise RuntimeError(f"收藏夹接口返回错误: {body.get('code')} {body.get('message')}")
+        return body.get("data") or {}
+
+    def _scan_favlist(self, url, fid, previous) -> Optional[ScanResult]:
+        """Bilibili 收藏夹增量扫描：先比较指纹，变化时按收藏时间倒序翻页"""
+        data = self._favlist_page(fid, 1)
+        info = data.get("info") or {}
+        count = info.get("media_count", 0)
+        fingerprint = self._fingerprint(info.get("mtime"), count)
+
+        old_ids = previous.get("ids", [])
+        if fingerprint == previous.get("fingerprint"):
+            self._record(url, old_ids, [], [], fingerprint)
+            return ScanResult(old_ids, [], incremental=True, unchanged=True)
+
+        known = set(old_ids)
+        new_ids: List[str] = []
+        streak = 0
+        page = 1
+        while True:
+            for media in data.get("medias") or []:
+                video_id = media.get("bvid")
+                if not video_id:
+                    continue
+                new_ids.append(video_id)
+                streak = streak + 1 if video_id in known else 0
+                if streak >= self.known_streak:
+                    break
+            if streak >= self.known_streak or not data.get("has_more"):
+                break
+            page += 1
+            data = self._favlist_page(fid, page)
+
+        # 数量对不上说明有视频被移除，需要完整扫描才能得到准确列表
+        merged = len(set(new_ids) | known)
+        if merged != count:
+            return None
+
+        return self._merge(url, previous, new_ids, fingerprint)
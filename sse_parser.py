@@ -0,0 +1,164 @@
+import codecs
+import json
+from typing import Any, Iterable, Iterator, List, Optional
+
+_utf_8_decode = codecs.utf_8_decode
+
+
+class SSEEvent:
+    """一个 Server-Sent Events 事件"""
+
+    __slots__ = ('event', 'data', 'id', 'retry')
+
+    def __init__(self, event: str = 'message', data: str = '', id: Optional[str] = None,
+                 retry: Optional[int] = None):
+        self.event = event
+        self.data = data
+        self.id = id
+        self.retry = retry
+
+    def json(self) -> Any:
+        return json.loads(self.data)
+
+    def __repr__(self):
+        return f"SSEEvent(event={self.event!r}, data={self.data[:50]!r})"
+
+
+class SSEParser:
+    """
+    增量 SSE 解析器
+
+    按任意大小的字节块喂入数据：字节先经增量 UTF-8 解码器解码，
+    被切断在两个块之间的多字节字符会等到下一块补齐后再输出。
+    文本按空行切成事件块，未结束的块暂存起来，等空行到达后才拼接解析，
+    小块数据只是追加到暂存列表，不会反复拼接缓冲区。
+    解码直接使用 codecs.utf_8_decode(final=False)，块末尾不完整的字节留到下一块，
+    省去 IncrementalDecoder 每次调用的包装开销。
+
+    支持 event、多行 data、id、retry 字段，以冒号开头的注释行（保活）被忽略，
+    行尾可以是 LF、CRLF 或 CR。
+    """
+
+    def __init__(self):
+        self._undecoded = b''
+        self._pending: List[str] = []
+        self._held_cr = False
+        self._event = ''
+        self._data: List[str] = []
+        self._id: Optional[str] = None
+        self._retry: Optional[int] = None
+        self.comments = 0
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """喂入一块字节，返回其中已完整的事件"""
+        if self._undecoded:
+            chunk = self._undecoded + chunk
+        text, consumed = _utf_8_decode(chunk, 'replace', False)
+        self._undecoded = chunk[consumed:] if consumed < len(chunk) else b''
+        return self._parse(text)
+
+    def close(self) -> List[SSEEvent]:
+        """数据结束：输出解码器中剩余的内容，末尾缺少空行的事件也一并返回"""
+        events = self._parse(_utf_8_decode(self._undecoded, 'replace', True)[0])
+        self._undecoded = b''
+        if self._held_cr:
+            self._held_cr = False
+            self._pending.append('\n')
+        if self._pending:
+            self._process_block(''.join(self._pending), events)
+            self._pending = []
+        return events
+
+    def _normalize(self, text: str) -> str:
+        """把 CRLF 和 CR 统一为 LF；末尾的 CR 可能与下一块开头的 LF 组成 CRLF，留到下一块再处理"""
+        if self._held_cr:
+            text = '\r' + text
+            self._held_cr = False
+        if text.endswith('\r'):
+            self._held_cr = True
+            text = text[:-1]
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    def _parse(self, text: str) -> List[SSEEvent]:
+        events: List[SSEEvent] = []
+        if '\r' in text or self._held_cr:
+            text = self._normalize(text)
+        if not text:
+            return events
+
+        pending = self._pending
+        if pending:
+            if '\n\n' not in text and not (text[0] == '\n' and pending[-1][-1] == '\n'):
+                pending.append(text)
+                return events
+            pending.append(text)
+            text = ''.join(pending)
+
+        blocks = text.split('\n\n')
+        tail = blocks.pop()
+        self._pending = [tail] if tail else []
+        if not blocks:
+            return events
+        for block in blocks:
+            # 常见情况：单行 data 或保活注释，不必逐行解析
+            if block[:6] == 'data: ' and '\n' not in block:
+                events.append(SSEEvent('message', block[6:], self._id))
+            elif not block:
+                continue
+            elif block[0] == ':' and '\n' not in block:
+                self.comments += 1
+            else:
+                self._process_block(block, events)
+        return events
+
+    def _process_block(self, block: str, events: List[SSEEvent]):
+        for line in block.split('\n'):
+            self._process_line(line, events)
+        self._dispatch(events)
+
+    def _process_line(self, line: str, events: List[SSEEvent]):
+        if not line:
+            self._dispatch(events)
+            return
+        if line[0] == ':':
+            self.comments += 1
+            return
+
+        field, sep, value = line.partition(':')
+        if sep and value[:1] == ' ':
+            value = value[1:]
+
+        if field == 'data':
+            self._data.append(value)
+        elif field == 'event':
+            self._event = value
+        elif field == 'id':
+            if '\0' not in value:
+                self._id = value
+        elif field == 'retry':
+            if value.isdigit():
+                self._retry = int(value)
+
+    def _dispatch(self, events: List[SSEEvent]):
+        if self._data:
+            events.append(SSEEvent(self._event or 'message', '\n'.join(self._data), self._id, self._retry))
+        self._event = ''
+        self._data = []
+        self._retry = None
+
+
+def iter_sse(chunks: Iterable[bytes]) -> Iterator[SSEEvent]:
+    """从字节块序列中逐个产出事件"""
+    parser = SSEParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def iter_response_events(response) -> Iterator[SSEEvent]:
+    """
+    从 requests 的流式响应中读取事件
+
+    iter_content(None) 按数据到达的实际大小读取，而不是 iter_lines 默认的 512 字节一块。
+    """
+    return iter_sse(response.iter_content(chunk_size=None))
@@ -0,0 +1,210 @@
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional
+from logger_config import get_logger
+
+logger = get_logger('summarizer')
+
+
+class SummaryCache:
+    """
+    分段摘要缓存
+
+    以 (分段文本, 分段提示词, 模型) 的摘要为键保存 map 阶段的结果，
+    只修改 reduce 阶段的提示词时不需要重新生成分段摘要。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._initialize_database()
+
+    def _initialize_database(self):
+        with self._lock:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS chunk_summaries (
+                    chunk_hash TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            ''')
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def get(self, chunk_hash: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT summary FROM chunk_summaries WHERE chunk_hash = ?", (chunk_hash,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, chunk_hash: str, summary: str) -> None:
+        with self._lock:
+            self._connection.execute('''
+                INSERT OR REPLACE INTO chunk_summaries (chunk_hash, summary, created_at)
+                VALUES (?, ?, ?)
+            ''', (chunk_hash, summary, datetime.now().isoformat()))
+            self._connection.commit()
+
+
+class MapReduceSummarizer:
+    """
+    长转录的分层摘要
+
+    map：每个转录片段单独生成摘要，并发数受线程池限制，结果按片段哈希缓存；
+    reduce：分段摘要合并为最终笔记，合并后仍超出长度预算时先分组合并，逐层归约。
+    只有一个片段的短视频直接生成笔记。
+    """
+
+    NOTE_PROMPT = """任务：请根据以下视频资料，写一份非常详细的中文笔记。
+要求：
+1. 包含详细的视频背景摘要（200字）。
+2. 列出视频中的关键知识点或核心情节。
+3. 总结视频的最终价值。
+
+视频信息：
+标题：{title}
+URL：{url}
+{label}：{content}
+"""
+
+    MAP_PROMPT = """任务：以下是视频《{title}》中 {time_range} 的转录内容，请用中文概括这一段的要点。
+要求：保留具体的概念、数据、结论和例子，不要添加转录中没有的信息，300字以内。
+
+转录内容：
+{content}
+"""
+
+    GROUP_PROMPT = """任务：以下是视频《{title}》连续几个部分的摘要，请合并为一段连贯的中文摘要。
+要求：保留各部分的关键知识点和对应时间，去掉重复内容，500字以内。
+
+分段摘要：
+{content}
+"""
+
+    def __init__(self, generate: Callable[[str], str], model_key: str = '', cache: Optional[SummaryCache] = None,
+                 workers: int = 2, reduce_budget: int = 6000,
+                 log_callback: Optional[Callable[[str], None]] = None,
+                 should_stop: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            generate: 调用模型的函数，输入提示词，返回生成文本（失败时返回空字符串）
+            model_key: 模型标识，参与分段摘要的缓存键
+            cache: 分段摘要缓存
+            workers: map 阶段的最大并发请求数
+            reduce_budget: 合并时一次送入模型的分段摘要总字数上限
+        """
+        self.generate = generate
+        self.model_key = model_key
+        self.cache = cache
+        self.reduce_budget = reduce_budget
+        self.log = log_callback or logger.info
+        self.should_stop = should_stop or (lambda: False)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="summary-map")
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def _chunk_hash(self, title: str, chunk) -> str:
+        key = "\x00".join([self.MAP_PROMPT, self.model_key, title or '', chunk.text])
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+    def summarize(self, title: str, url: str, chunks: List) -> str:
+        """
+        生成视频笔记
+
+        Args:
+            chunks: transcript_chunker.TranscriptChunk 列表
+
+        Returns:
+            str: 笔记文本，失败或被停止时返回空字符串
+        """
+        if not chunks:
+            return ""
+        if len(chunks) == 1:
+            return self.generate(self.NOTE_PROMPT.format(
+                title=title, url=url, label="内容", content=chunks[0].text
+            ))
+
+        partials = self._map(title, chunks)
+        if partials is None:
+            return ""
+        return self._reduce(title, url, partials)
+
+    def _summarize_chunk(self, title: str, chunk) -> str:
+        if self.should_stop():
+            return ""
+        chunk_hash = self._chunk_hash(title, chunk)
+        if self.cache:
+            cached = self.cache.get(chunk_hash)
+            if cached:
+                return cached
+
+        summary = self.generate(self.MAP_PROMPT.format(
+            title=title, time_range=chunk.label, content=chunk.text
+        ))
+        if summary and self.cache:
+            self.cache.put(chunk_hash, summary)
+        return summary
+
+    def _map(self, title: str, chunks: List) -> Optional[List[str]]:
+        """并发生成分段摘要，任何一段失败都返回 None"""
+        self.log(f"[*] 分段摘要：共 {len(chunks)} 段")
+        futures = [self._executor.submit(self._summarize_chunk, title, chunk) for chunk in chunks]
+        while not all(future.done() for future in futures):
+            if self.should_stop():
+                for future in futures:
+                    future.cancel()
+                return None
+            wait(futures, timeout=0.5)
+
+        partials = []
+        for chunk, future in zip(chunks, futures):
+            try:
+                summary = future.result()
+            except Exception as e:
+                self.log(f"[-] 分段摘要失败 {chunk.label}: {e}")
+                return None
+            if not summary:
+                self.log(f"[-] 分段摘要为空 {chunk.label}")
+                return None
+            partials.append(f"[{chunk.label}] {summary}")
+        return partials
+
+    def _reduce(self, title: str, url: str, partials: List[str]) -> str:
+        """把分段摘要逐层合并，直到能一次送入模型生成最终笔记"""
+        while sum(len(p) for p in partials) > self.reduce_budget and len(partials) > 1:
+            if self.should_stop():
+                return ""
+            groups, current = [], []
+            for partial in partials:
+                if current and sum(len(p) for p in current) + len(partial) > self.reduce_budget:
+                    groups.append(current)
+                    current = []
+                current.append(partial)
+            groups.append(current)
+            if len(groups) == len(partials):
+                # 单个摘要已超出预算，无法继续分组
+                break
+
+            self.log(f"[*] 合并分段摘要：{len(partials)} 段 -> {len(groups)} 组")
+            merged = list(self._executor.map(
+                lambda group: self.generate(self.GROUP_PROMPT.format(title=title, content="\n".join(group))),
+                groups
+            ))
+            if not all(merged):
+                return ""
+            partials = merged
+
+        return self.generate(self.NOTE_PROMPT.format(
+            title=title, url=url, label="分段摘要", content="\n".join(partials)
+        ))
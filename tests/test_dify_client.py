@@ -0,0 +1,80 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from dify_client import DifyClient
+
+
+def sse(events):
+    return "".join(f"data: {json.dumps(e, ensure_ascii=False)}\n\n" for e in events).encode("utf-8")
+
+
+@pytest.fixture
+def chat_server():
+    """按顺序返回 responses 中的流式响应，每个响应是一组 Dify 事件"""
+    responses = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            payload = sse(responses.pop(0))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1", responses
+    server.shutdown()
+    server.server_close()
+
+
+def test_streaming_collects_answer_and_ids(chat_server):
+    url, responses = chat_server
+    responses.append([
+        {"event": "message", "task_id": "t-1", "conversation_id": "c-1", "answer": "你好"},
+        {"event": "message", "task_id": "t-1", "conversation_id": "c-1", "answer": "，世界"},
+        {"event": "message_end", "task_id": "t-1", "conversation_id": "c-1"},
+    ])
+    client = DifyClient("key", url)
+    chunks, seen = [], []
+    result = client.send_message(
+        "问题", "user", response_mode="streaming", on_message=chunks.append,
+        on_finished=lambda: seen.append(client.get_conversation_id({}))
+    )
+    assert chunks == ["你好", "，世界"]
+    assert result == {"answer": "你好，世界", "conversation_id": "c-1", "task_id": "t-1"}
+    assert seen == ["c-1"]
+
+
+def test_conversation_id_does_not_leak_into_next_request(chat_server):
+    url, responses = chat_server
+    responses.append([
+        {"event": "message", "task_id": "t-1", "conversation_id": "c-1", "answer": "第一次"},
+        {"event": "message_end", "task_id": "t-1", "conversation_id": "c-1"},
+    ])
+    responses.append([
+        {"event": "message", "task_id": "t-2", "answer": "第二次"},
+        {"event": "message_end", "task_id": "t-2"},
+    ])
+    client = DifyClient("key", url)
+    assert client.get_conversation_id(client.send_message("一", "user", response_mode="streaming")) == "c-1"
+
+    seen = []
+    result = client.send_message(
+        "二", "user", response_mode="streaming",
+        on_finished=lambda: seen.append(client.get_conversation_id({}))
+    )
+    assert seen == [None]
+    assert client.get_conversation_id(result) is None
+    assert client.current_task_id == "t-2"
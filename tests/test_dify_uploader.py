@@ -0,0 +1,157 @@
+import threading
+import time
+
+import pytest
+
+import dify_uploader
+from dify_uploader import DifyBatchUploader, TokenBucket
+from fake_dify_server import FakeDifyServer
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    """把退避等待缩短到毫秒级，抖动系数固定为 0.01"""
+    monkeypatch.setattr(dify_uploader.random, "uniform", lambda a, b: 0.01)
+
+
+def make_uploader(server, **kwargs):
+    kwargs.setdefault("rate_per_second", 100)
+    kwargs.setdefault("log_callback", lambda message: None)
+    return DifyBatchUploader(server.url(), "dataset", "key", **kwargs)
+
+
+def test_backoff_is_exponential_with_jitter():
+    uploader = DifyBatchUploader("http://127.0.0.1:1/v1", "dataset", "key")
+    try:
+        for attempt in range(4):
+            delays = {uploader._backoff(attempt) for _ in range(20)}
+            base = 2 ** attempt
+            assert all(0.5 * base <= d <= 1.5 * base for d in delays)
+            assert len(delays) > 1
+        assert uploader._backoff(10) <= 45
+    finally:
+        uploader.close()
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retries_rate_limit_and_server_errors(fast_backoff, status):
+    with FakeDifyServer(upload_failures=[status, status]) as server:
+        uploader = make_uploader(server)
+        try:
+            assert uploader.upload("文档", "内容")
+        finally:
+            uploader.close()
+        assert [s for _, _, s in server.upload_log] == [status, status, 200]
+
+
+def test_retries_dropped_connection(fast_backoff):
+    with FakeDifyServer(upload_failures=["drop"]) as server:
+        uploader = make_uploader(server)
+        try:
+            assert uploader.upload("文档", "内容")
+        finally:
+            uploader.close()
+        assert server.uploaded_titles == ["文档"]
+
+
+def test_gives_up_after_max_retries(fast_backoff):
+    with FakeDifyServer(upload_failures=[503] * 5) as server:
+        uploader = make_uploader(server, max_retries=2)
+        try:
+            assert uploader.upload("文档", "内容") is None
+        finally:
+            uploader.close()
+        assert len(server.upload_log) == 3
+
+
+def test_honours_retry_after():
+    with FakeDifyServer(upload_failures=[429], retry_after="0.4") as server:
+        uploader = make_uploader(server)
+        try:
+            assert uploader.upload("文档", "内容")
+        finally:
+            uploader.close()
+        (first, _, _), (second, _, _) = server.upload_log
+        assert second - first >= 0.4
+
+
+def test_does_not_retry_read_timeout(fast_backoff):
+    with FakeDifyServer(latency=0.5) as server:
+        uploader = make_uploader(server)
+        uploader.UPLOAD_TIMEOUT = (5, 0.1)
+        try:
+            assert uploader.upload("文档", "内容") is None
+        finally:
+            uploader.close()
+        time.sleep(0.6)
+        # 请求已到达服务端（文档可能已创建），不能再发第二次
+        assert [title for _, title, _ in server.upload_log] == ["文档"]
+
+
+@pytest.mark.parametrize("status", [400, 401, 403, 404, 413])
+def test_does_not_retry_client_errors(fast_backoff, status):
+    with FakeDifyServer(upload_failures=[status]) as server:
+        uploader = make_uploader(server)
+        try:
+            assert uploader.upload("文档", "内容") is None
+        finally:
+            uploader.close()
+        assert len(server.upload_log) == 1
+
+
+def test_token_bucket_paces_requests():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    for _ in range(12):
+        assert bucket.acquire()
+    # 前 2 个令牌立即可用，其余 10 个按每秒 20 个补充
+    assert time.monotonic() - start >= 10 / 20 * 0.9
+
+
+def test_token_bucket_stops_waiting():
+    bucket = TokenBucket(rate=0.1, capacity=1)
+    assert bucket.acquire()
+    start = time.monotonic()
+    assert not bucket.acquire(should_stop=lambda: True)
+    assert time.monotonic() - start < 0.5
+
+
+def test_uploads_are_rate_limited():
+    with FakeDifyServer() as server:
+        uploader = make_uploader(server, concurrency=4, rate_per_second=10)
+        try:
+            results = uploader.upload_many([(f"文档{i}", "内容") for i in range(15)])
+        finally:
+            uploader.close()
+        assert all(results)
+        times = sorted(t for t, _, _ in server.upload_log)
+        # 桶容量为 10，之后的 5 个请求按每秒 10 个放行
+        assert times[-1] - times[0] >= 5 / 10 * 0.9
+
+
+def test_wait_indexed_reports_completed_error_and_timeout():
+    statuses = {"完成": ["indexing", "completed"], "出错": "error", "卡住": "indexing"}
+    with FakeDifyServer(index_statuses=statuses) as server:
+        uploader = make_uploader(server)
+        try:
+            assert all(uploader.upload_many([(title, "内容") for title in statuses]))
+            results = uploader.wait_indexed(timeout=1, poll_interval=0.1)
+        finally:
+            uploader.close()
+    assert results == {"完成": "completed", "出错": "error", "卡住": "timeout"}
+
+
+def test_wait_indexed_returns_promptly_when_stopped():
+    stop = threading.Event()
+    with FakeDifyServer(index_statuses={"卡住": "indexing"}) as server:
+        uploader = make_uploader(server, should_stop=stop.is_set)
+        try:
+            assert uploader.upload("卡住", "内容")
+            threading.Timer(0.3, stop.set).start()
+            start = time.monotonic()
+            results = uploader.wait_indexed(timeout=600, poll_interval=5)
+            elapsed = time.monotonic() - start
+        finally:
+            uploader.close()
+    assert results == {"卡住": "stopped"}
+    assert elapsed < 2
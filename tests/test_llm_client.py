@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+
+from fake_llm_server import FakeLLMServer
+from llm_client import (AnthropicProvider, DashScopeProvider, LLMError, OllamaProvider,
+                        OpenAICompatibleProvider, create_client)
+
+PROVIDERS = {
+    "ollama": OllamaProvider,
+    "openai": OpenAICompatibleProvider,
+    "anthropic": AnthropicProvider,
+    "qwen": DashScopeProvider,
+}
+PROMPT = "请总结这段视频中关于检索增强生成的讨论"
+EXPECTED = f"ECHO: {PROMPT}"
+
+
+def make_client(server, provider, **kwargs):
+    kwargs.setdefault("backoff_factor", 0.01)
+    return PROVIDERS[provider](server.url(provider), "fake-model", "key", **kwargs)
+
+
+@pytest.fixture
+def server():
+    with FakeLLMServer(chunk_size=4) as fake:
+        yield fake
+
+
+@pytest.mark.parametrize("provider", PROVIDERS)
+def test_generate(server, provider):
+    assert make_client(server, provider).generate(PROMPT, temperature=0.2, max_tokens=100) == EXPECTED
+
+
+@pytest.mark.parametrize("provider", PROVIDERS)
+def test_stream_yields_chunks(server, provider):
+    chunks = list(make_client(server, provider).stream(PROMPT))
+    assert len(chunks) > 1
+    assert "".join(chunks) == EXPECTED
+
+
+@pytest.mark.parametrize("provider", PROVIDERS)
+def test_agenerate(server, provider):
+    assert asyncio.run(make_client(server, provider).agenerate(PROMPT)) == EXPECTED
+
+
+@pytest.mark.parametrize("provider", PROVIDERS)
+def test_astream_yields_chunks(server, provider):
+    async def collect():
+        return [chunk async for chunk in make_client(server, provider).astream(PROMPT)]
+
+    chunks = asyncio.run(collect())
+    assert len(chunks) > 1
+    assert "".join(chunks) == EXPECTED
+
+
+@pytest.mark.parametrize("provider", PROVIDERS)
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retries_rate_limit_and_server_errors(provider, status):
+    with FakeLLMServer(fail_first=2, fail_status=status) as server:
+        assert make_client(server, provider, retries=2).generate(PROMPT) == EXPECTED
+        assert server.requests == 3
+
+
+@pytest.mark.parametrize("provider", PROVIDERS)
+def test_stream_retries_before_first_chunk(provider):
+    with FakeLLMServer(fail_first=1) as server:
+        assert "".join(make_client(server, provider).stream(PROMPT)) == EXPECTED
+        assert server.requests == 2
+
+
+@pytest.mark.parametrize("provider", PROVIDERS)
+@pytest.mark.parametrize("status", [400, 401, 404])
+def test_does_not_retry_client_errors(provider, status):
+    with FakeLLMServer(fail_first=1, fail_status=status) as server:
+        with pytest.raises(LLMError, match=str(status)):
+            make_client(server, provider).generate(PROMPT)
+        assert server.requests == 1
+
+
+def test_gives_up_after_retries():
+    with FakeLLMServer(fail_first=5) as server:
+        with pytest.raises(LLMError, match="503"):
+            make_client(server, "openai", retries=2).generate(PROMPT)
+        assert server.requests == 3
+
+
+def test_does_not_retry_read_timeout():
+    with FakeLLMServer(latency=0.5) as server:
+        with pytest.raises(LLMError, match="超时"):
+            make_client(server, "ollama", timeout=(5, 0.1)).generate(PROMPT)
+        time.sleep(0.6)
+        assert server.requests == 1
+
+
+def test_create_client_uses_provider_defaults(server):
+    client = create_client("openai", model="fake-model")
+    assert isinstance(client, OpenAICompatibleProvider)
+    assert client.model == "fake-model"
+    with pytest.raises(ValueError):
+        create_client("unknown")
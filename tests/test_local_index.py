@@ -0,0 +1,125 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from local_index import HashingEmbedder, LocalIndex, get_local_index
+
+DOCS = {
+    "a": ("检索增强生成", ["检索增强生成会先从知识库召回相关片段。", "再把片段交给模型组织回答。"]),
+    "b": ("向量数据库", ["向量数据库按余弦相似度查找最近的片段。"]),
+    "c": ("语音识别", ["Whisper 把视频音频转录成带时间戳的文本。"]),
+}
+
+
+class SlowEmbedder(HashingEmbedder):
+    """embed 在 release 之前一直阻塞，用来确认加载和向量化不占用检索"""
+
+    def __init__(self, dim=64):
+        super().__init__(dim)
+        self.release = threading.Event()
+
+    def embed(self, texts):
+        assert self.release.wait(5)
+        return super().embed(texts)
+
+
+def open_index(path, embedder=None):
+    index = LocalIndex(path, embedder or HashingEmbedder(64))
+    assert index.wait_ready(5)
+    return index
+
+
+def fill(index):
+    for doc_id, (title, texts) in DOCS.items():
+        index.add_document(doc_id, title, texts)
+
+
+def wait_vectors(index, name, timeout=5):
+    """等待后台向量生成完成"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with index._lock:
+            if index._get_meta('embedder') == name:
+                return
+        time.sleep(0.05)
+    pytest.fail("向量生成未完成")
+
+
+def test_hybrid_search_finds_document(tmp_path):
+    index = open_index(tmp_path)
+    fill(index)
+    wait_vectors(index, "hashing-64")
+    assert index.search("余弦相似度", top_k=1)[0]["doc_id"] == "b"
+    assert index.search("余弦相似度", top_k=1, mode="vector")[0]["doc_id"] == "b"
+    index.close()
+
+
+def test_switching_embedder_rebuilds_vectors(tmp_path):
+    index = open_index(tmp_path)
+    fill(index)
+    wait_vectors(index, "hashing-64")
+
+    index.set_embedder(HashingEmbedder(32))
+    wait_vectors(index, "hashing-32")
+    assert index._vectors.dim == 32
+    assert len(index._chunk_rows) == len(index) == len(index._vectors)
+    assert index.search("余弦相似度", top_k=1, mode="vector")[0]["doc_id"] == "b"
+    index.close()
+
+    reopened = open_index(tmp_path, HashingEmbedder(32))
+    assert reopened._vectors.dim == 32
+    assert len(reopened._chunk_rows) == len(reopened)
+    reopened.close()
+
+
+def test_shared_index_follows_embedder(tmp_path):
+    first = get_local_index(tmp_path, HashingEmbedder(64))
+    assert first.wait_ready(5)
+    fill(first)
+    second = get_local_index(tmp_path, HashingEmbedder(16))
+    assert second is first
+    assert first.embedder.name == "hashing-16"
+    wait_vectors(first, "hashing-16")
+    assert first._vectors.dim == 16
+
+
+def test_replacing_documents_compacts_vectors(tmp_path):
+    index = open_index(tmp_path)
+    fill(index)
+    for round_ in range(10):
+        index.add_document("a", "检索增强生成", [f"第 {round_} 次替换后的内容。", "召回相关片段再组织回答。"])
+    assert len(index._vectors) < 2 * len(index)
+    assert sorted(index._chunk_rows.values()) == sorted(set(index._chunk_rows.values()))
+    assert max(index._chunk_rows.values()) < len(index._vectors)
+    results = index.search("第 9 次替换", top_k=1)
+    assert results[0]["doc_id"] == "a" and "第 9 次" in results[0]["text"]
+
+    # 压缩后的行号写回 SQLite，重新打开后向量仍能对上
+    query = index.embedder.embed(["向量数据库按余弦相似度查找最近的片段"])[0]
+    index.close()
+    reopened = open_index(tmp_path)
+    rows = np.fromiter(reopened._chunk_rows.values(), dtype=np.int64)
+    row, score = reopened._vectors.search(query, rows, 1)[0]
+    chunk_id = next(c for c, r in reopened._chunk_rows.items() if r == row)
+    assert reopened.search("余弦相似度", top_k=1)[0]["chunk_id"] == chunk_id
+    assert score > 0.9
+    reopened.close()
+
+
+def test_embedding_does_not_block_search(tmp_path):
+    index = open_index(tmp_path)
+    fill(index)
+    wait_vectors(index, "hashing-64")
+    index.close()
+
+    slow = SlowEmbedder(32)
+    reopened = LocalIndex(tmp_path, slow)
+    assert reopened.wait_ready(5)
+    # 向量在后台重建，关键词检索不受影响
+    assert reopened.search("余弦相似度", top_k=1)[0]["doc_id"] == "b"
+    slow.release.set()
+    wait_vectors(reopened, "hashing-32")
+    assert len(reopened._chunk_rows) == len(reopened)
+    reopened.close()
@@ -0,0 +1,40 @@
+import pytest
+
+from markdown_formatter import MarkdownFormatter, StreamingMarkdownRenderer
+
+SAMPLES = [
+    "段落\n\n# 标题\n正文\n",
+    "第一段\n\n\n## 二级标题\n\n- 项目一\n- 项目二\n\n1. 第一\n2. 第二\n",
+    "文字\n   \n\t\n- 带空白的空行之后的列表\n",
+    "# 标题一\n\n# 标题二\n\n---\n\n结尾**加粗**\n",
+    "说明\n\n```python\ndef f():\n\n    return 1\n```\n\n- 代码块之后的列表\n",
+    "末尾的空行\n\n\n",
+    "普通段落\n\n另一段 `代码` 和 https://example.com/path\n",
+]
+
+
+def stream(text, size):
+    renderer = StreamingMarkdownRenderer(MarkdownFormatter())
+    parts = []
+    for i in range(0, len(text), size):
+        html, _tail = renderer.append("m", text[i:i + size])
+        parts.append(html)
+    parts.append(renderer.finish("m"))
+    return "".join(parts)
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_streamed_html_matches_full_render(text, size):
+    assert stream(text, size) == MarkdownFormatter().format(text)
+
+
+@pytest.mark.parametrize("text", [t for t in SAMPLES if "```" not in t])
+def test_every_prefix_renders_like_full_format(text):
+    formatter = MarkdownFormatter()
+    renderer = StreamingMarkdownRenderer(formatter)
+    finalized = ""
+    for i, char in enumerate(text):
+        html, tail = renderer.append("m", char)
+        finalized += html
+        assert finalized + tail == formatter.format(text[:i + 1])
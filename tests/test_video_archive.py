@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from video_archive import VideoArchive, split_video_id
+
+HISTORY = Path(__file__).resolve().parent.parent / "data" / "download_history.txt"
+
+
+def write_archive(path, lines):
+    path.write_text("".join(f"{line}\n" for line in lines), encoding="utf-8")
+    return VideoArchive(path)
+
+
+def test_split_video_id():
+    assert split_video_id("BV1zuHizBE8B_p3") == ("BV1zuHizBE8B", 3)
+    assert split_video_id("BV1zuHizBE8B") == ("BV1zuHizBE8B", 0)
+
+
+def test_base_id_matches_any_archived_part(tmp_path):
+    archive = write_archive(tmp_path / "history.txt", ["bilibili BV1zuHizBE8B_p1", "bilibili BV1zuHizBE8B_p2"])
+    assert archive.contains("bilibili", "BV1zuHizBE8B")
+    assert archive.contains("BiliBili", "BV1zuHizBE8B")
+    assert archive.contains("bilibili", "BV1zuHizBE8B_p2")
+    assert not archive.contains("bilibili", "BV1zuHizBE8B_p3")
+    assert not archive.contains("bilibili", "BV1zuHizBE8B", part=3)
+    assert not archive.contains("youtube", "BV1zuHizBE8B")
+    assert not archive.contains("bilibili", "BV1zuHizBE8")
+
+
+def test_added_parts_are_found_after_reload(tmp_path):
+    path = tmp_path / "history.txt"
+    path.write_text("bilibili BV1Yv4y1S713", encoding="utf-8")
+    archive = VideoArchive(path)
+    assert archive.add("bilibili", "BV1zuHizBE8B", part=2)
+    assert not archive.add("bilibili", "BV1zuHizBE8B_p2")
+    assert archive.contains("bilibili", "BV1zuHizBE8B")
+
+    reloaded = VideoArchive(path)
+    assert len(reloaded) == 2
+    assert reloaded.contains("bilibili", "BV1Yv4y1S713")
+    assert reloaded.contains("bilibili", "BV1zuHizBE8B")
+    assert reloaded.contains("bilibili", "BV1zuHizBE8B_p2")
+
+
+def test_shipped_history_keeps_multi_part_videos_processed():
+    archive = VideoArchive(HISTORY)
+    part_ids = [line.split()[1] for line in HISTORY.read_text(encoding="utf-8").splitlines()
+                if len(line.split()) == 2 and "_p" in line.split()[1]]
+    assert part_ids
+    for video_id in part_ids:
+        assert archive.contains("bilibili", video_id)
+        assert archive.contains("bilibili", split_video_id(video_id)[0])
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+from logger_config import get_logger
+
+logger = get_logger('transcript_cache')
+
+# 计算音频指纹时每块的采样数
+FINGERPRINT_BLOCK = 1 << 20
+
+
+def audio_fingerprint(audio) -> str:
+    """
+    计算音频内容指纹
+
+    Args:
+        audio: 解码后的音频数组（numpy）或原始字节
+
+    Returns:
+        str: 十六进制摘要
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if hasattr(audio, 'tobytes'):
+        # 分块计算，避免为长音频复制出一份完整的字节串；结果与整段计算相同
+        samples = audio.reshape(-1)
+        for start in range(0, samples.size, FINGERPRINT_BLOCK):
+            digest.update(samples[start:start + FINGERPRINT_BLOCK].tobytes())
+    else:
+        digest.update(bytes(audio))
+    return digest.hexdigest()
+
+
+class TranscriptCache:
+    """
+    转录结果缓存
+
+    以 (视频ID, 音频指纹, 转录模型及参数) 为键，把转录结果压缩后存入 SQLite。
+    下载或转录之后的阶段失败时，重新处理同一视频可以直接复用转录文本。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._initialize_database()
+
+    def _initialize_database(self):
+        with self._lock:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    video_id TEXT NOT NULL,
+                    audio_hash TEXT NOT NULL DEFAULT '',
+                    model_key TEXT NOT NULL,
+                    title TEXT NOT NULL DEFAULT '',
+                    payload BLOB NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (video_id, audio_hash, model_key)
+                )
+            ''')
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def get(self, video_id: str, model_keys: Iterable[str],
+            audio_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        查询转录缓存
+
+        Args:
+            video_id: 视频ID
+            model_keys: 可接受的转录模型键，按优先级排列
+            audio_hash: 音频指纹；为 None 时匹配该视频最近一次的结果
+
+        Returns:
+            dict: 包含 text、title 等字段，未命中返回 None
+        """
+        with self._lock:
+            for model_key in model_keys:
+                if audio_hash is None:
+                    row = self._connection.execute('''
+                        SELECT title, payload FROM transcripts
+                        WHERE video_id = ? AND model_key = ?
+                        ORDER BY created_at DESC LIMIT 1
+                    ''', (video_id, model_key)).fetchone()
+                else:
+                    row = self._connection.execute('''
+                        SELECT title, payload FROM transcripts
+                        WHERE video_id = ? AND model_key = ? AND audio_hash = ?
+                    ''', (video_id, model_key, audio_hash)).fetchone()
+
+                if row:
+                    try:
+                        payload = json.loads(zlib.decompress(row['payload']).decode('utf-8'))
+                    except Exception as e:
+                        logger.error(f"转录缓存解析失败 {video_id}: {e}")
+                        continue
+                    payload.setdefault('title', row['title'])
+                    return payload
+        return None
+
+    def put(self, video_id: str, model_key: str, payload: Dict[str, Any],
+            audio_hash: str = '', title: str = '') -> None:
+        """写入转录缓存（同键覆盖）"""
+        blob = zlib.compress(json.dumps(payload, ensure_ascii=False).encode('utf-8'))
+        with self._lock:
+            self._connection.execute('''
+                INSERT OR REPLACE INTO transcripts
+                (video_id, audio_hash, model_key, title, payload, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (video_id, audio_hash or '', model_key, title or '', blob, datetime.now().isoformat()))
+            self._connection.commit()
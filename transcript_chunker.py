@@ -0,0 +1,206 @@
+import re
+from typing import Any, Dict, List, Optional
+
+_VTT_TIME = re.compile(r'(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{3})')
+_VTT_TAG = re.compile(r'<[^>]+>')
+_SENTENCE_END = re.compile(r'[。！？!?；;…]\s*$|[.]\s*$')
+_SENTENCE_SPLIT = re.compile(r'(?<=[。！？!?；;])')
+_CJK_CHAR = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+_ASCII_WORD = re.compile(r'[A-Za-z0-9]+')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数：中文按字计，英文和数字按单词计"""
+    return len(_CJK_CHAR.findall(text)) + len(_ASCII_WORD.findall(text))
+
+
+def format_timestamp(seconds: float) -> str:
+    """把秒数格式化为 mm:ss 或 h:mm:ss"""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def deep_link(url: str, seconds: float) -> str:
+    """生成跳转到指定时间点的视频链接"""
+    separator = '&' if '?' in url else '?'
+    return f"{url}{separator}t={int(seconds)}"
+
+
+def _parse_vtt_time(value: str) -> float:
+    match = _VTT_TIME.search(value)
+    if not match:
+        return 0.0
+    hours, minutes, secs, millis = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(secs) + int(millis) / 1000
+
+
+def parse_vtt(text: str) -> List[Dict[str, Any]]:
+    """
+    解析 WebVTT 字幕
+
+    自动字幕常把上一条的文字重复到下一条开头，连续重复的文本只保留一次。
+
+    Returns:
+        list: [{"start": 秒, "end": 秒, "text": 文本}]
+    """
+    segments: List[Dict[str, Any]] = []
+    for block in re.split(r'\n\s*\n', text.replace('\r\n', '\n')):
+        lines = [line.strip() for line in block.split('\n') if line.strip()]
+        timing = next((i for i, line in enumerate(lines) if '-->' in line), None)
+        if timing is None:
+            continue
+
+        start_text, _, end_text = lines[timing].partition('-->')
+        content = " ".join(_VTT_TAG.sub('', line) for line in lines[timing + 1:]).strip()
+        if not content:
+            continue
+        if segments and segments[-1]['text'] == content:
+            segments[-1]['end'] = _parse_vtt_time(end_text)
+            continue
+        segments.append({
+            'start': _parse_vtt_time(start_text),
+            'end': _parse_vtt_time(end_text),
+            'text': content
+        })
+    return segments
+
+
+def segments_from_whisper(result) -> List[Dict[str, Any]]:
+    """把 Whisper 返回的分段转换为可序列化的字典"""
+    return [
+        {'start': float(s.start), 'end': float(s.end), 'text': s.text.strip()}
+        for s in result if s.text and s.text.strip()
+    ]
+
+
+class TranscriptChunk:
+    """
+    带时间范围的转录片段
+
+    start/end 为 None 表示没有时间信息，此时 time_range 为空，link 返回原视频链接。
+    """
+
+    def __init__(self, index: int, start: Optional[float], end: Optional[float], text: str):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.text = text
+
+    @property
+    def has_time(self) -> bool:
+        return self.start is not None
+
+    @property
+    def time_range(self) -> str:
+        if not self.has_time:
+            return ""
+        return f"{format_timestamp(self.start)}-{format_timestamp(self.end)}"
+
+    @property
+    def label(self) -> str:
+        """片段的显示名：有时间信息时为时间范围，否则为序号"""
+        return self.time_range or f"第 {self.index + 1} 段"
+
+    def link(self, url: str) -> str:
+        return deep_link(url, self.start) if self.has_time else url
+
+
+def _split_long_segment(segment: Dict[str, Any], max_tokens: int) -> List[Dict[str, Any]]:
+    """
+    把超出预算的单个分段按句子拆开，时间按字数比例分配
+
+    没有句子边界可用时按字符数硬切。
+    """
+    pieces: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_SPLIT.split(segment['text']):
+        if current and estimate_tokens(current + sentence) > max_tokens:
+            pieces.append(current)
+            current = ""
+        while estimate_tokens(sentence) > max_tokens:
+            pieces.append(sentence[:max_tokens])
+            sentence = sentence[max_tokens:]
+        current += sentence
+    if current:
+        pieces.append(current)
+
+    total = sum(len(p) for p in pieces) or 1
+    duration = segment['end'] - segment['start']
+    result, offset = [], segment['start']
+    for piece in pieces:
+        length = duration * len(piece) / total
+        result.append({'start': offset, 'end': offset + length, 'text': piece})
+        offset += length
+    return result
+
+
+def chunk_segments(segments: List[Dict[str, Any]], max_tokens: int = 400,
+                   min_tokens: Optional[int] = None) -> List[TranscriptChunk]:
+    """
+    按 token 预算把转录分段合并成片段，尽量在句末切分
+
+    Args:
+        segments: [{"start", "end", "text"}]，按时间排列
+        max_tokens: 每个片段的 token 上限
+        min_tokens: 片段达到该长度后遇到句末即可切分，默认为上限的一半
+
+    Returns:
+        list: TranscriptChunk 列表
+    """
+    min_tokens = max_tokens // 2 if min_tokens is None else min_tokens
+    units: List[Dict[str, Any]] = []
+    for segment in segments:
+        if estimate_tokens(segment['text']) > max_tokens:
+            units.extend(_split_long_segment(segment, max_tokens))
+        else:
+            units.append(segment)
+
+    chunks: List[TranscriptChunk] = []
+    current: List[Dict[str, Any]] = []
+    tokens = 0
+    for unit in units:
+        unit_tokens = estimate_tokens(unit['text'])
+        if current and tokens + unit_tokens > max_tokens:
+            # 优先在句末切分，剩余的分段留给下一个片段
+            cut = _sentence_cut(current, min_tokens)
+            chunks.append(_make_chunk(len(chunks), current[:cut]))
+            current = current[cut:]
+            tokens = sum(estimate_tokens(u['text']) for u in current)
+            if current and tokens + unit_tokens > max_tokens:
+                chunks.append(_make_chunk(len(chunks), current))
+                current, tokens = [], 0
+        current.append(unit)
+        tokens += unit_tokens
+
+    if current:
+        chunks.append(_make_chunk(len(chunks), current))
+    return chunks
+
+
+def _sentence_cut(units: List[Dict[str, Any]], min_tokens: int) -> int:
+    """返回片段的切分位置：累计达到 min_tokens 后的最后一个句末，没有时整体切分"""
+    cut, tokens = len(units), 0
+    for i, unit in enumerate(units):
+        tokens += estimate_tokens(unit['text'])
+        if tokens >= min_tokens and _SENTENCE_END.search(unit['text']):
+            cut = i + 1
+    return cut
+
+
+def _make_chunk(index: int, units: List[Dict[str, Any]]) -> TranscriptChunk:
+    text = " ".join(unit['text'] for unit in units)
+    return TranscriptChunk(index, units[0]['start'], units[-1]['end'], text)
+
+
+def chunk_text(text: str, max_tokens: int = 400) -> List[TranscriptChunk]:
+    """没有时间信息的纯文本按相同规则切分，片段不带时间范围"""
+    if not text.strip():
+        return []
+    chunks = chunk_segments([{'start': 0.0, 'end': 0.0, 'text': text}], max_tokens)
+    for chunk in chunks:
+        chunk.start = chunk.end = None
+    return chunks
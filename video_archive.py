@@ -0,0 +1,114 @@
+import re
+import threading
+from pathlib import Path
+from typing import Optional, Set, Tuple
+from logger_config import get_logger
+
+logger = get_logger('video_archive')
+
+# yt-dlp 多P视频的ID形如 BV1xxxxxxx_p3
+_PART_PATTERN = re.compile(r'^(?P<id>.+?)_p(?P<part>\d+)$')
+
+
+def split_video_id(video_id: str) -> Tuple[str, int]:
+    """
+    拆分视频ID与分P序号
+
+    Args:
+        video_id: 视频ID，可能带有 _pN 后缀
+
+    Returns:
+        (基础视频ID, 分P序号)，没有分P后缀时序号为 0
+    """
+    match = _PART_PATTERN.match(video_id)
+    if match:
+        return match.group('id'), int(match.group('part'))
+    return video_id, 0
+
+
+class VideoArchive:
+    """
+    已处理视频归档
+
+    文件格式与 yt-dlp 的 download_archive 一致，每行一条 "平台 视频ID"。
+    文件在构造时一次性载入内存集合，之后查询为 O(1)，新记录以追加方式写入。
+    """
+
+    def __init__(self, archive_file):
+        self.archive_file = Path(archive_file)
+        self._entries: Set[Tuple[str, str, int]] = set()
+        # 已归档任意分P的 (平台, 基础视频ID)，用于不带分P的查询
+        self._base_ids: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self._needs_newline = False
+        self._load()
+
+    def _load(self):
+        if not self.archive_file.exists():
+            return
+
+        try:
+            with open(self.archive_file, 'r', encoding='utf-8') as f:
+                line = ''
+                for line in f:
+                    parts = line.split()
+                    if len(parts) != 2:
+                        continue
+                    self._remember(self._make_key(parts[0], parts[1]))
+                # 文件末尾缺少换行时，追加前需要先补上
+                self._needs_newline = bool(line) and not line.endswith('\n')
+            logger.info(f"已载入归档记录 {len(self._entries)} 条: {self.archive_file}")
+        except Exception as e:
+            logger.error(f"读取归档文件失败: {e}")
+
+    @staticmethod
+    def _make_key(platform: str, video_id: str, part: Optional[int] = None) -> Tuple[str, str, int]:
+        base_id, parsed_part = split_video_id(video_id)
+        return platform.lower(), base_id, parsed_part if part is None else part
+
+    def _remember(self, key: Tuple[str, str, int]):
+        self._entries.add(key)
+        self._base_ids.add(key[:2])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def contains(self, platform: str, video_id: str, part: Optional[int] = None) -> bool:
+        """
+        检查视频是否已归档
+
+        video_id 带 _pN 后缀或指定了 part 时精确匹配该分P；
+        否则只要该视频的任意分P已归档即视为已处理（与旧版按子串匹配的行为一致，
+        播放列表中的多P视频条目不带后缀）。
+        """
+        if part is None and split_video_id(video_id)[0] == video_id:
+            return (platform.lower(), video_id) in self._base_ids
+        return self._make_key(platform, video_id, part) in self._entries
+
+    def add(self, platform: str, video_id: str, part: Optional[int] = None) -> bool:
+        """
+        追加一条归档记录
+
+        Returns:
+            bool: 新增返回 True，已存在返回 False
+        """
+        key = self._make_key(platform, video_id, part)
+        with self._lock:
+            if key in self._entries:
+                return False
+
+            platform_name, base_id, part_no = key
+            line_id = f"{base_id}_p{part_no}" if part_no else base_id
+            try:
+                self.archive_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.archive_file, 'a', encoding='utf-8') as f:
+                    if self._needs_newline:
+                        f.write("\n")
+                        self._needs_newline = False
+                    f.write(f"{platform_name} {line_id}\n")
+            except Exception as e:
+                logger.error(f"写入归档文件失败: {e}")
+                return False
+
+            self._remember(key)
+            return True
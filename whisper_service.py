@@ -0,0 +1,228 @@
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+import numpy as np
+from logger_config import get_logger
+
+logger = get_logger('whisper_service')
+
+# Whisper 模型要求的采样率
+SAMPLE_RATE = 16000
+# 每次从 ffmpeg 管道读取的字节数（16kHz 16 位 PCM 约 32 秒）
+PCM_BLOCK_BYTES = 1 << 20
+
+
+def decode_audio(media_path, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    使用 ffmpeg 将媒体文件解码为 Whisper 可直接使用的音频数组
+
+    ffmpeg 通过管道输出 16 位单声道 PCM，不产生中间音频文件。
+    管道按块读取并转换后写入匿名临时文件，返回该文件的内存映射，
+    长视频（2 小时约 460 MB float32）不会整段驻留内存。
+
+    Args:
+        media_path: 视频或音频文件路径
+        sample_rate: 目标采样率
+
+    Returns:
+        np.ndarray: 取值范围 [-1, 1] 的 float32 数组
+    """
+    command = [
+        'ffmpeg', '-nostdin', '-i', str(media_path),
+        '-vn', '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ac', '1', '-ar', str(sample_rate), '-'
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    # 临时文件关闭后即删除，内存映射持有自己的句柄，映射释放前数据一直可用
+    with process, tempfile.TemporaryFile(prefix='audio-', suffix='.f32') as buffer:
+        samples = 0
+        try:
+            while True:
+                block = process.stdout.read(PCM_BLOCK_BYTES)
+                if not block:
+                    break
+                pcm = np.frombuffer(block, dtype=np.int16, count=len(block) // 2)
+                buffer.write((pcm.astype(np.float32) / 32768.0).tobytes())
+                samples += len(pcm)
+        except BaseException:
+            process.kill()
+            raise
+        if process.wait():
+            raise subprocess.CalledProcessError(process.returncode, command)
+
+        if not samples:
+            return np.zeros(0, dtype=np.float32)
+        buffer.flush()
+        # 写时复制映射：调用方即使原地修改也不会写回文件
+        return np.memmap(buffer, dtype=np.float32, mode='c', shape=(samples,))
+
+
+class _TranscriptionTask:
+    """提交到转录服务的单个任务"""
+
+    def __init__(self, audio, options, should_stop):
+        self.audio = audio
+        self.options = options
+        self.should_stop = should_stop or (lambda: False)
+        self.future = Future()
+
+
+class WhisperService:
+    """
+    常驻的 Whisper 转录服务
+
+    模型在首次使用时加载一次并保持常驻，之后的更新任务不再重复加载。
+    服务持有 N 个模型实例，每个实例对应一个工作线程，从同一个任务队列中取任务，
+    因此多个视频可以同时转录。
+    """
+
+    def __init__(self, model_dir, model_size="small", instances=0, device="cpu", compute_type="int8"):
+        self.model_dir = str(model_dir)
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.instances, self.cpu_threads = self._plan_instances(instances)
+
+        self._tasks = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._load_lock = threading.Lock()
+        self._loaded = False
+
+    @staticmethod
+    def _plan_instances(instances):
+        """根据CPU核心数确定模型实例数和每个实例的线程数"""
+        cpu_count = os.cpu_count() or 1
+        if not instances or instances <= 0:
+            # 每个实例至少分配 4 个线程，过多实例会互相争抢CPU
+            instances = max(1, min(4, cpu_count // 4))
+        cpu_threads = max(1, cpu_count // instances)
+        return instances, cpu_threads
+
+    def model_key(self, options=None) -> str:
+        """返回标识模型和转录参数的键，用于缓存转录结果"""
+        params = ",".join(f"{k}={v}" for k, v in sorted((options or {}).items()))
+        return f"faster-whisper:{self.model_size}:{self.compute_type}:{params}"
+
+    @property
+    def is_loaded(self):
+        return self._loaded
+
+    def ensure_loaded(self) -> bool:
+        """
+        加载模型实例并启动工作线程，已加载时直接返回
+
+        Returns:
+            bool: 服务是否可用
+        """
+        with self._load_lock:
+            if self._loaded:
+                return True
+
+            try:
+                from faster_whisper import WhisperModel
+
+                os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+                os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
+
+                models = [
+                    WhisperModel(
+                        self.model_size,
+                        device=self.device,
+                        compute_type=self.compute_type,
+                        cpu_threads=self.cpu_threads,
+                        download_root=self.model_dir,
+                        local_files_only=True
+                    )
+                    for _ in range(self.instances)
+                ]
+            except Exception as e:
+                logger.error(f"Whisper 模型加载失败: {e}")
+                return False
+
+            for index, model in enumerate(models):
+                worker = threading.Thread(
+                    target=self._work, args=(model,),
+                    name=f"whisper-{index}", daemon=True
+                )
+                worker.start()
+                self._workers.append(worker)
+
+            self._loaded = True
+            logger.info(f"Whisper 服务已启动: {self.instances} 个实例，每实例 {self.cpu_threads} 线程")
+            return True
+
+    def submit(self, audio, should_stop: Optional[Callable[[], bool]] = None, **options) -> Future:
+        """
+        提交转录任务
+
+        Args:
+            audio: 音频文件路径或 16kHz 单声道 float32 数组
+            should_stop: 返回 True 时提前结束转录
+            **options: 透传给 WhisperModel.transcribe 的参数
+
+        Returns:
+            Future: 结果为 Segment 列表
+        """
+        if not self.ensure_loaded():
+            raise RuntimeError("Whisper 模型未加载")
+
+        task = _TranscriptionTask(audio, options, should_stop)
+        self._tasks.put(task)
+        return task.future
+
+    def shutdown(self):
+        """停止所有工作线程并释放模型实例"""
+        with self._load_lock:
+            for _ in self._workers:
+                self._tasks.put(None)
+            self._workers = []
+            self._loaded = False
+
+    def _work(self, model):
+        """工作线程：持有一个模型实例，循环处理任务"""
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+            if not task.future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                if task.should_stop():
+                    task.future.set_result([])
+                    continue
+
+                segments, _ = model.transcribe(task.audio, **task.options)
+                result = []
+                # segments 是惰性生成器，逐段解码，每段之间检查停止标志
+                for segment in segments:
+                    result.append(segment)
+                    if task.should_stop():
+                        break
+                task.future.set_result(result)
+            except Exception as e:
+                task.future.set_exception(e)
+
+
+_service_lock = threading.Lock()
+_service: Optional[WhisperService] = None
+
+
+def get_whisper_service(model_dir, instances=0, **kwargs: Any) -> WhisperService:
+    """
+    获取进程内共享的 Whisper 服务实例
+
+    模型目录或实例数变化时会创建新服务，否则复用已加载的服务。
+    """
+    global _service
+    with _service_lock:
+        if _service is None or _service.model_dir != str(model_dir) or (
+                instances and _service.instances != instances):
+            if _service is not None:
+                _service.shutdown()
+            _service = WhisperService(model_dir, instances=instances, **kwargs)
+        return _service